@@ -0,0 +1,68 @@
+"""Recurring tasks and occurrence overrides
+
+Revision ID: 2fcfc52a98d8
+Revises: 7f788b821e53
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2fcfc52a98d8'
+down_revision = '7f788b821e53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('tasks', sa.Column('recurrence', sa.String(), nullable=True))
+    op.add_column('tasks', sa.Column('recurrence_freq', sa.String(), nullable=True))
+    op.add_column('tasks', sa.Column('recurrence_interval', sa.Integer(), nullable=True))
+    op.add_column('tasks', sa.Column('recurrence_weekdays', sa.Integer(), nullable=True))
+    op.add_column('tasks', sa.Column('recurrence_end', sa.Date(), nullable=True))
+
+    # recurrence_freq в INCLUDE: статистика периода отделяет разовые задачи
+    # от серий без чтения строк таблицы
+    op.drop_index('ix_tasks_user_start_date', table_name='tasks')
+    op.create_index(
+        'ix_tasks_user_start_date', 'tasks',
+        ['user_id', 'start_date'],
+        unique=False,
+        postgresql_include=['end_date', 'completed', 'id', 'recurrence_freq']
+    )
+    op.create_index(
+        'ix_tasks_user_series', 'tasks',
+        ['user_id', 'start_date'],
+        unique=False,
+        postgresql_where=sa.text('recurrence_freq IS NOT NULL')
+    )
+
+    op.create_table(
+        'task_occurrences',
+        sa.Column('task_id', sa.Integer(), nullable=False),
+        sa.Column('occurrence_date', sa.Date(), nullable=False),
+        sa.Column('completed', sa.Boolean(), server_default=sa.text('false'), nullable=False),
+        sa.Column('cancelled', sa.Boolean(), server_default=sa.text('false'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['task_id'], ['tasks.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('task_id', 'occurrence_date')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('task_occurrences')
+    op.drop_index('ix_tasks_user_series', table_name='tasks')
+    op.drop_index('ix_tasks_user_start_date', table_name='tasks')
+    op.create_index(
+        'ix_tasks_user_start_date', 'tasks',
+        ['user_id', 'start_date'],
+        unique=False,
+        postgresql_include=['end_date', 'completed', 'id']
+    )
+    op.drop_column('tasks', 'recurrence_end')
+    op.drop_column('tasks', 'recurrence_weekdays')
+    op.drop_column('tasks', 'recurrence_interval')
+    op.drop_column('tasks', 'recurrence_freq')
+    op.drop_column('tasks', 'recurrence')
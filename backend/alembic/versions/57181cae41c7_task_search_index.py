@@ -0,0 +1,35 @@
+"""Task full-text search index
+
+Revision ID: 57181cae41c7
+Revises: ba98108e46c7
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '57181cae41c7'
+down_revision = 'ba98108e46c7'
+branch_labels = None
+depends_on = None
+
+# Должно совпадать с TASK_SEARCH_VECTOR_SQL в src/models/models.py
+TASK_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_tasks_search', 'tasks',
+        [sa.text(f"({TASK_SEARCH_VECTOR_SQL})")],
+        unique=False,
+        postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_search', table_name='tasks')
@@ -0,0 +1,110 @@
+"""Task per-day counters rollup
+
+Revision ID: 7f788b821e53
+Revises: dfea7bb3dae6
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f788b821e53'
+down_revision = 'dfea7bb3dae6'
+branch_labels = None
+depends_on = None
+
+# Вклад строк задач в счетчики: total/completed - по дню начала,
+# due_pending - незавершенные по дню окончания. {rows} - выборка задач
+# с колонкой sign (+1 новая версия строки, -1 старая)
+DELTAS_SQL = """
+    SELECT user_id, day, category,
+           sum(total) AS total, sum(completed) AS completed, sum(due_pending) AS due_pending
+    FROM (
+        SELECT user_id, start_date AS day, category, sign AS total,
+               CASE WHEN coalesce(completed, false) THEN sign ELSE 0 END AS completed,
+               0 AS due_pending
+        FROM ({rows}) AS r
+        UNION ALL
+        SELECT user_id, end_date, category, 0, 0, sign
+        FROM ({rows}) AS r
+        WHERE end_date IS NOT NULL AND NOT coalesce(completed, false)
+    ) AS deltas
+    GROUP BY user_id, day, category
+"""
+
+APPLY_SQL = """
+    INSERT INTO task_day_counts AS c (user_id, day, category, total, completed, due_pending)
+    SELECT * FROM ({deltas}) AS d
+    WHERE d.total <> 0 OR d.completed <> 0 OR d.due_pending <> 0
+    -- Одинаковый порядок строк счетчиков снижает риск взаимоблокировок
+    ORDER BY user_id, day, category
+    ON CONFLICT (user_id, day, category) DO UPDATE SET
+        total = c.total + EXCLUDED.total,
+        completed = c.completed + EXCLUDED.completed,
+        due_pending = c.due_pending + EXCLUDED.due_pending
+"""
+
+TRIGGER_ROWS = {
+    'insert': "SELECT *, 1 AS sign FROM new_rows",
+    'delete': "SELECT *, -1 AS sign FROM old_rows",
+    'update': "SELECT *, 1 AS sign FROM new_rows UNION ALL SELECT *, -1 AS sign FROM old_rows",
+}
+
+TRIGGER_REFERENCING = {
+    'insert': "NEW TABLE AS new_rows",
+    'delete': "OLD TABLE AS old_rows",
+    'update': "OLD TABLE AS old_rows NEW TABLE AS new_rows",
+}
+
+
+def upgrade() -> None:
+    op.create_table(
+        'task_day_counts',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=True),
+        sa.Column('category', sa.String(), nullable=True),
+        sa.Column('total', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('completed', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('due_pending', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ux_task_day_counts_key', 'task_day_counts',
+        ['user_id', 'day', 'category'],
+        unique=True,
+        postgresql_nulls_not_distinct=True
+    )
+
+    # Триггеры уровня оператора с таблицами переходов: пакетные изменения
+    # и COPY обновляют счетчики одним запросом на оператор
+    for operation, rows in TRIGGER_ROWS.items():
+        op.execute(f"""
+            CREATE FUNCTION task_day_counts_{operation}() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            BEGIN
+                {APPLY_SQL.format(deltas=DELTAS_SQL.format(rows=rows))};
+                RETURN NULL;
+            END
+            $$
+        """)
+        op.execute(f"""
+            CREATE TRIGGER task_day_counts_{operation}
+            AFTER {operation.upper()} ON tasks
+            REFERENCING {TRIGGER_REFERENCING[operation]}
+            FOR EACH STATEMENT EXECUTE FUNCTION task_day_counts_{operation}()
+        """)
+
+    # Заполнение по существующим задачам
+    op.execute(APPLY_SQL.format(deltas=DELTAS_SQL.format(rows="SELECT *, 1 AS sign FROM tasks")))
+
+
+def downgrade() -> None:
+    for operation in TRIGGER_ROWS:
+        op.execute(f"DROP TRIGGER task_day_counts_{operation} ON tasks")
+        op.execute(f"DROP FUNCTION task_day_counts_{operation}()")
+    op.drop_index('ux_task_day_counts_key', table_name='task_day_counts')
+    op.drop_table('task_day_counts')
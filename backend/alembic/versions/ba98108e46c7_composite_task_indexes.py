@@ -0,0 +1,67 @@
+"""Composite task indexes
+
+Revision ID: ba98108e46c7
+Revises: 2abc1656bd6e
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ba98108e46c7'
+down_revision = '2abc1656bd6e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Составные индексы под запросы task_service (все начинаются с user_id)
+    op.create_index(
+        'ix_tasks_user_listing', 'tasks',
+        ['user_id', 'completed', 'start_date', sa.text('created_at DESC'), sa.text('id DESC')],
+        unique=False
+    )
+    op.create_index(
+        'ix_tasks_user_category_listing', 'tasks',
+        ['user_id', 'category', 'completed', 'start_date', sa.text('created_at DESC'), sa.text('id DESC')],
+        unique=False
+    )
+    op.create_index(
+        'ix_tasks_user_start_date', 'tasks',
+        ['user_id', 'start_date'],
+        unique=False,
+        postgresql_include=['end_date', 'completed', 'id']
+    )
+    op.create_index(
+        'ix_tasks_user_created', 'tasks',
+        ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+        unique=False
+    )
+
+    # Одноколоночные индексы перекрыты составными или дублируют первичный ключ
+    op.drop_index('ix_tasks_user_id', table_name='tasks')
+    op.drop_index('ix_tasks_title', table_name='tasks')
+    op.drop_index('ix_tasks_start_date', table_name='tasks')
+    op.drop_index('ix_tasks_id', table_name='tasks')
+    op.drop_index('ix_tasks_end_date', table_name='tasks')
+    op.drop_index('ix_tasks_completed', table_name='tasks')
+    op.drop_index('ix_tasks_category', table_name='tasks')
+    op.drop_index('ix_users_id', table_name='users')
+
+
+def downgrade() -> None:
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+    op.create_index('ix_tasks_category', 'tasks', ['category'], unique=False)
+    op.create_index('ix_tasks_completed', 'tasks', ['completed'], unique=False)
+    op.create_index('ix_tasks_end_date', 'tasks', ['end_date'], unique=False)
+    op.create_index('ix_tasks_id', 'tasks', ['id'], unique=False)
+    op.create_index('ix_tasks_start_date', 'tasks', ['start_date'], unique=False)
+    op.create_index('ix_tasks_title', 'tasks', ['title'], unique=False)
+    op.create_index('ix_tasks_user_id', 'tasks', ['user_id'], unique=False)
+
+    op.drop_index('ix_tasks_user_created', table_name='tasks')
+    op.drop_index('ix_tasks_user_start_date', table_name='tasks')
+    op.drop_index('ix_tasks_user_category_listing', table_name='tasks')
+    op.drop_index('ix_tasks_user_listing', table_name='tasks')
@@ -0,0 +1,57 @@
+"""Task time range with GiST index
+
+Revision ID: c3d9a0e5f6b1
+Revises: 2fcfc52a98d8
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3d9a0e5f6b1'
+down_revision = '2fcfc52a98d8'
+branch_labels = None
+depends_on = None
+
+# Должно совпадать с TASK_TIME_RANGE_SQL в src/models/models.py
+TASK_START_SQL = "start_date + coalesce(start_time, time '00:00')"
+TASK_END_SQL = (
+    "CASE WHEN end_time IS NOT NULL THEN coalesce(end_date, start_date) + end_time "
+    "WHEN start_time IS NOT NULL AND end_date IS NULL THEN start_date + start_time "
+    "ELSE coalesce(end_date, start_date) + 1 + time '00:00' END"
+)
+TASK_TIME_RANGE_SQL = (
+    f"CASE WHEN start_date IS NOT NULL THEN tsrange("
+    f"{TASK_START_SQL}, greatest({TASK_START_SQL}, {TASK_END_SQL}), "
+    f"CASE WHEN ({TASK_END_SQL}) > ({TASK_START_SQL}) THEN '[)' ELSE '[]' END) END"
+)
+
+
+def upgrade() -> None:
+    # Составной GiST индекс (user_id, time_range): операторы btree для integer
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    # STORED колонка вычисляется для существующих строк при добавлении
+    op.add_column(
+        'tasks',
+        sa.Column(
+            'time_range',
+            postgresql.TSRANGE(),
+            sa.Computed(TASK_TIME_RANGE_SQL, persisted=True),
+            nullable=True
+        )
+    )
+    op.create_index(
+        'ix_tasks_user_time_range', 'tasks',
+        ['user_id', 'time_range'],
+        unique=False,
+        postgresql_using='gist'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_user_time_range', table_name='tasks')
+    op.drop_column('tasks', 'time_range')
+    # Расширение не удаляется: его могут использовать другие объекты БД
@@ -0,0 +1,50 @@
+"""Task change sequence and tombstones
+
+Revision ID: dfea7bb3dae6
+Revises: 57181cae41c7
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'dfea7bb3dae6'
+down_revision = '57181cae41c7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(sa.schema.CreateSequence(sa.Sequence('task_change_seq')))
+    # Значение по умолчанию вычисляется для каждой существующей строки,
+    # поэтому все задачи сразу получают номера изменений
+    op.add_column('tasks', sa.Column(
+        'change_seq', sa.BigInteger(), nullable=False,
+        server_default=sa.text("nextval('task_change_seq')")
+    ))
+    op.create_index('ix_tasks_user_change_seq', 'tasks', ['user_id', 'change_seq'], unique=False)
+
+    op.create_table(
+        'task_tombstones',
+        sa.Column('task_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('change_seq', sa.BigInteger(), nullable=False,
+                  server_default=sa.text("nextval('task_change_seq')")),
+        sa.Column('deleted_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('task_id')
+    )
+    op.create_index(
+        'ix_task_tombstones_user_change_seq', 'task_tombstones',
+        ['user_id', 'change_seq'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_task_tombstones_user_change_seq', table_name='task_tombstones')
+    op.drop_table('task_tombstones')
+    op.drop_index('ix_tasks_user_change_seq', table_name='tasks')
+    op.drop_column('tasks', 'change_seq')
+    op.execute(sa.schema.DropSequence(sa.Sequence('task_change_seq')))
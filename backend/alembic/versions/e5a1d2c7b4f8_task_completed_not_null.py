@@ -0,0 +1,33 @@
+"""Task completed NOT NULL
+
+Revision ID: e5a1d2c7b4f8
+Revises: c3d9a0e5f6b1
+Create Date: 2026-10-17 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a1d2c7b4f8'
+down_revision = 'c3d9a0e5f6b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # NULL сортировался после true и выпадал из условий курсора списка задач.
+    # Счетчики по дням уже считают NULL незавершенной задачей - триггер их не меняет
+    op.execute("UPDATE tasks SET completed = false WHERE completed IS NULL")
+    op.alter_column(
+        'tasks', 'completed',
+        existing_type=sa.Boolean(), nullable=False, server_default=sa.text('false')
+    )
+
+
+def downgrade() -> None:
+    op.alter_column(
+        'tasks', 'completed',
+        existing_type=sa.Boolean(), nullable=True, server_default=None
+    )
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный прогон API задач с проверкой по базовой линии.
+
+Скрипт наполняет БД пользователями load-N@example.com и их задачами
+(повторный запуск досоздает только недостающее), затем гоняет сценарии
+через настоящее приложение FastAPI: в процессе (httpx.ASGITransport) или
+по сети (--url). Для каждого сценария выводятся p50/p95/p99, пропускная
+способность, ошибки и число SQL запросов на HTTP запрос (из заголовка
+Server-Timing, нужен TELEMETRY_SERVER_TIMING=true).
+
+С --baseline результаты сравниваются с JSON файлом: регрессия - рост
+числа запросов к БД, новые ошибки или рост p50 больше допуска (хвосты
+p95/p99 на сотнях запросов слишком шумные для порога). Задержки зависят
+от машины, поэтому базовую линию стоит снимать на той же машине
+(--save-baseline); число запросов к БД от машины не зависит.
+Код выхода 1 - найдена регрессия.
+
+Запуск из каталога backend (нужен httpx):
+    python -m benchmarks.load --users 10000 --tasks 1000 --seed-only
+    python -m benchmarks.load --requests 500 --concurrency 20 --baseline benchmarks/baseline.json
+    python -m benchmarks.load --scenario list --scenario stats --url http://localhost:8000
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import sys
+import time
+from collections import deque
+from datetime import date
+from typing import Awaitable, Callable, Dict, List, Optional
+import httpx
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from config import settings
+from src.services.auth_service import get_password_hash
+
+# Пароль всех нагрузочных пользователей
+LOAD_PASSWORD = "load-password"
+
+SEED_USERS_SQL = """
+INSERT INTO users (name, email, hashed_password, is_active)
+SELECT 'load ' || g, 'load-' || g || '@example.com', :hashed_password, true
+FROM generate_series(1, :users) AS g
+ON CONFLICT (email) DO NOTHING
+"""
+
+LOAD_USERS_RANGE_SQL = """
+SELECT min(id), max(id) FROM users WHERE email LIKE 'load-%@example.com'
+"""
+
+# Задачи создаются только пользователям без задач - повторный запуск
+# досоздает данные после прерванного наполнения
+SEED_TASKS_SQL = """
+INSERT INTO tasks (title, description, start_date, end_date, category, completed, user_id, created_at)
+SELECT
+    'Задача ' || t,
+    'Описание задачи номер ' || t,
+    CASE WHEN t % 10 = 0 THEN NULL ELSE current_date + ((t * 7) % 120 - 60) END,
+    CASE WHEN t % 10 = 0 THEN NULL ELSE current_date + ((t * 7) % 120 - 58) END,
+    (ARRAY['work', 'personal', 'health', 'education', 'hobby', 'other'])[1 + t % 6],
+    t % 3 = 0,
+    u.id,
+    now() - make_interval(mins => t)
+FROM users AS u
+CROSS JOIN generate_series(1, :tasks) AS t
+WHERE u.email LIKE 'load-%@example.com'
+  AND u.id >= :first_id AND u.id < :last_id
+  AND NOT EXISTS (SELECT 1 FROM tasks WHERE tasks.user_id = u.id)
+"""
+
+RESET_SQL = (
+    "DELETE FROM task_tombstones WHERE user_id IN (SELECT id FROM users WHERE email LIKE 'load-%@example.com')",
+    "DELETE FROM tasks WHERE user_id IN (SELECT id FROM users WHERE email LIKE 'load-%@example.com')",
+    "DELETE FROM task_day_counts WHERE user_id IN (SELECT id FROM users WHERE email LIKE 'load-%@example.com')",
+    "DELETE FROM users WHERE email LIKE 'load-%@example.com'",
+)
+
+# Пользователей в одном INSERT задач
+SEED_CHUNK_USERS = 200
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+# Допустимый рост среднего числа SQL запросов: среднее зависит от попаданий
+# в кэш, а они - от чередования конкурентных запросов
+QUERY_SLACK = 0.1
+
+
+async def seed(users: int, tasks: int, reset: bool) -> None:
+    """Наполнение БД нагрузочными пользователями и задачами"""
+    engine = create_async_engine(settings.DATABASE_URL)
+    try:
+        async with engine.begin() as conn:
+            if reset:
+                print("Удаление нагрузочных данных...")
+                for statement in RESET_SQL:
+                    await conn.execute(text(statement))
+            await conn.execute(text(SEED_USERS_SQL), {
+                "users": users, "hashed_password": get_password_hash(LOAD_PASSWORD)
+            })
+            first_id, last_id = (await conn.execute(text(LOAD_USERS_RANGE_SQL))).one()
+
+        started_at = time.perf_counter()
+        for chunk_start in range(first_id, last_id + 1, SEED_CHUNK_USERS):
+            async with engine.begin() as conn:
+                await conn.execute(text(SEED_TASKS_SQL), {
+                    "tasks": tasks, "first_id": chunk_start, "last_id": chunk_start + SEED_CHUNK_USERS
+                })
+            done = min(chunk_start + SEED_CHUNK_USERS, last_id + 1) - first_id
+            print(f"\rНаполнение: {done}/{last_id - first_id + 1} пользователей", end="", flush=True)
+        print(f" ({time.perf_counter() - started_at:.1f} с)")
+
+        async with engine.connect() as conn:
+            await conn.execute(text("ANALYZE users"))
+            await conn.execute(text("ANALYZE tasks"))
+            await conn.execute(text("ANALYZE task_day_counts"))
+            await conn.commit()
+    finally:
+        await engine.dispose()
+
+
+class LoadSession:
+    """Авторизованный нагрузочный пользователь и id его задач"""
+
+    def __init__(self, email: str, headers: Dict[str, str], task_ids: List[int]):
+        self.email = email
+        self.headers = headers
+        self.task_ids = task_ids
+
+
+async def login(client: httpx.AsyncClient, email: str) -> httpx.Response:
+    return await client.post("/api/auth/login", json={"email": email, "password": LOAD_PASSWORD})
+
+
+async def open_sessions(client: httpx.AsyncClient, users: int, active: int, rng: random.Random) -> List[LoadSession]:
+    """Вход части пользователей и выборка id их задач для сценариев изменения"""
+    sessions = []
+    for number in rng.sample(range(1, users + 1), min(active, users)):
+        email = f"load-{number}@example.com"
+        response = await login(client, email)
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        tasks = await client.get("/api/tasks/", params={"limit": 100, "include_total": "false"}, headers=headers)
+        tasks.raise_for_status()
+        sessions.append(LoadSession(email, headers, [task["id"] for task in tasks.json()["tasks"]]))
+    return sessions
+
+
+class Context:
+    """Общее состояние сценариев одного прогона"""
+
+    def __init__(self, sessions: List[LoadSession], rng: random.Random):
+        self.sessions = sessions
+        self.rng = rng
+        # Пакеты, созданные bulk_create, - их удаляет bulk_delete
+        self.created: deque = deque()
+
+    def session(self) -> LoadSession:
+        return self.rng.choice(self.sessions)
+
+
+Scenario = Callable[[httpx.AsyncClient, Context], Awaitable[httpx.Response]]
+
+
+def _list(**params) -> Scenario:
+    async def run(client, ctx):
+        return await client.get("/api/tasks/", params={"limit": 50, **params}, headers=ctx.session().headers)
+    return run
+
+
+async def _login(client, ctx):
+    return await login(client, ctx.session().email)
+
+
+async def _search(client, ctx):
+    query = f"Задача {ctx.rng.randint(1, 99)}"
+    return await client.get("/api/tasks/", params={"search": query, "limit": 50}, headers=ctx.session().headers)
+
+
+def _stats(**params) -> Scenario:
+    async def run(client, ctx):
+        return await client.get("/api/tasks/stats", params=params, headers=ctx.session().headers)
+    return run
+
+
+async def _toggle(client, ctx):
+    session = ctx.session()
+    return await client.patch(f"/api/tasks/{ctx.rng.choice(session.task_ids)}/toggle", headers=session.headers)
+
+
+async def _bulk_toggle(client, ctx):
+    session = ctx.session()
+    ids = ctx.rng.sample(session.task_ids, min(20, len(session.task_ids)))
+    return await client.post("/api/tasks/bulk/toggle", json={"ids": ids}, headers=session.headers)
+
+
+async def _bulk_create(client, ctx):
+    session = ctx.session()
+    today = date.today().isoformat()
+    tasks = [{"title": f"Нагрузка {number}", "start_date": today, "category": "work"} for number in range(20)]
+    response = await client.post("/api/tasks/bulk", json={"tasks": tasks}, headers=session.headers)
+    if response.status_code == 200:
+        ids = [item["task"]["id"] for item in response.json()["results"] if item.get("task")]
+        ctx.created.append((session, ids))
+    return response
+
+
+async def _bulk_delete(client, ctx):
+    if ctx.created:
+        session, ids = ctx.created.popleft()
+    else:
+        session, ids = ctx.session(), [0]
+    return await client.post("/api/tasks/bulk/delete", json={"ids": ids}, headers=session.headers)
+
+
+# Порядок важен: bulk_delete удаляет задачи, созданные bulk_create
+SCENARIOS: Dict[str, Scenario] = {
+    "login": _login,
+    "list": _list(),
+    "list_day": _list(period="day"),
+    "list_week": _list(period="week"),
+    "list_month": _list(period="month"),
+    "list_category": _list(category="work"),
+    "list_pending": _list(completed="false"),
+    "search": _search,
+    "stats": _stats(),
+    "stats_month": _stats(period="month"),
+    "toggle": _toggle,
+    "bulk_toggle": _bulk_toggle,
+    "bulk_create": _bulk_create,
+    "bulk_delete": _bulk_delete,
+}
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Перцентиль по ближайшему рангу"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    ctx: Context,
+    scenario: Scenario,
+    requests: int,
+    concurrency: int
+) -> dict:
+    """Прогон сценария: requests запросов, не больше concurrency одновременно"""
+    latencies: List[float] = []
+    queries: List[int] = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal errors, remaining
+        while remaining > 0:
+            remaining -= 1
+            started_at = time.perf_counter()
+            response = await scenario(client, ctx)
+            latencies.append(time.perf_counter() - started_at)
+            if response.status_code >= 400:
+                errors += 1
+            match = SERVER_TIMING_QUERIES.search(response.headers.get("server-timing", ""))
+            if match:
+                queries.append(int(match.group(1)))
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started_at
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+def compare(results: Dict[str, dict], baseline: dict, tolerance: float) -> List[str]:
+    """Регрессии относительно базовой линии"""
+    regressions = []
+    for name, result in results.items():
+        expected = baseline["scenarios"].get(name)
+        if expected is None:
+            continue
+        if (result["queries_per_request"] or 0) > (expected["queries_per_request"] or 0) + QUERY_SLACK:
+            regressions.append(
+                f"{name}: SQL запросов на запрос {result['queries_per_request']} > {expected['queries_per_request']}"
+            )
+        if result["p50_ms"] > expected["p50_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p50 {result['p50_ms']} мс > {expected['p50_ms']} мс + {tolerance:.0%}"
+            )
+        if result["errors"] > expected["errors"]:
+            regressions.append(f"{name}: ошибок {result['errors']} > {expected['errors']}")
+    return regressions
+
+
+def build_client(url: Optional[str], concurrency: int) -> httpx.AsyncClient:
+    """Клиент к серверу по url или к приложению в этом процессе"""
+    if url:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        return httpx.AsyncClient(base_url=url, limits=limits, timeout=60)
+    # Все запросы в процессе идут с одного адреса: ограничение частоты
+    # отклоняло бы сценарий login. Для --url лимиты задает сам сервер
+    settings.RATE_LIMIT_ENABLED = False
+    from main import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load", timeout=60)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000, help="Нагрузочных пользователей в БД")
+    parser.add_argument("--tasks", type=int, default=100, help="Задач у каждого пользователя")
+    parser.add_argument("--reset", action="store_true", help="Пересоздать нагрузочные данные")
+    parser.add_argument("--seed-only", action="store_true", help="Только наполнить БД")
+    parser.add_argument("--skip-seed", action="store_true", help="Не проверять наполнение БД")
+    parser.add_argument("--active-users", type=int, default=100, help="Пользователей, от имени которых идут запросы")
+    parser.add_argument("--requests", type=int, default=300, help="Запросов на сценарий")
+    parser.add_argument("--login-requests", type=int, default=50, help="Запросов в сценарии login (bcrypt)")
+    parser.add_argument("--concurrency", type=int, default=10, help="Одновременных запросов")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="Сценарий (по умолчанию все)")
+    parser.add_argument("--url", help="Адрес запущенного сервера вместо приложения в процессе")
+    parser.add_argument("--seed", type=int, default=1, help="Зерно генератора случайных чисел")
+    parser.add_argument("--baseline", help="JSON с базовой линией для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Допустимый рост p50 (доля)")
+    parser.add_argument("--save-baseline", help="Сохранить результаты как базовую линию")
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    if not args.skip_seed:
+        await seed(args.users, args.tasks, args.reset)
+    if args.seed_only:
+        return
+
+    rng = random.Random(args.seed)
+    names = args.scenario or list(SCENARIOS)
+    results: Dict[str, dict] = {}
+    async with build_client(args.url, args.concurrency) as client:
+        ctx = Context(await open_sessions(client, args.users, args.active_users, rng), rng)
+        print(f"\n{'сценарий':<16} {'rps':>8} {'p50 мс':>9} {'p95 мс':>9} {'p99 мс':>9} {'SQL/запр':>9} {'ошибки':>7}")
+        for name in names:
+            requests = args.login_requests if name == "login" else args.requests
+            result = await run_scenario(client, ctx, SCENARIOS[name], requests, args.concurrency)
+            results[name] = result
+            print(
+                f"{name:<16} {result['rps']:>8} {result['p50_ms']:>9} {result['p95_ms']:>9} "
+                f"{result['p99_ms']:>9} {result['queries_per_request'] or '-':>9} {result['errors']:>7}"
+            )
+
+    report = {
+        "params": {
+            "users": args.users,
+            "tasks": args.tasks,
+            "active_users": args.active_users,
+            "requests": args.requests,
+            "login_requests": args.login_requests,
+            "concurrency": args.concurrency,
+        },
+        "scenarios": results,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+                file.write("\n")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        if baseline["params"] != report["params"]:
+            print(f"⚠️  Параметры прогона отличаются от базовой линии: {baseline['params']}")
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"❌ {regression}")
+        if regressions:
+            sys.exit(1)
+        print("✅ Регрессий относительно базовой линии нет")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Сравнение стоимости сериализации списка задач: старый и быстрый путь.
+
+Старый путь: ORM объекты Task -> TaskListResponse (from_attributes) ->
+повторная валидация response_model и jsonable_encoder внутри FastAPI ->
+JSONResponse. Быстрый путь (routers/tasks._list_response): строки-словари ->
+заранее собранный TypeAdapter -> bytes.
+
+Без аргументов измеряется только сериализация на синтетических задачах.
+С флагом --db дополнительно измеряется выборка из БД (ORM сущности против
+строк) на данных, созданных в откатываемой транзакции.
+
+Запуск из каталога backend:
+    python -m benchmarks.serialization --tasks 1000 --repeat 50
+    python -m benchmarks.serialization --db
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from config import settings
+from src.models.models import Task, TASK_COLUMNS
+from src.routers.tasks import _list_response
+from src.schemas.task import TaskListResponse
+
+response_field = create_response_field(name="bench", type_=TaskListResponse)
+
+SEED_USER_SQL = """
+INSERT INTO users (name, email, hashed_password, is_active)
+VALUES ('bench', 'bench-serialization@example.com', 'x', true)
+RETURNING id
+"""
+
+SEED_TASKS_SQL = """
+INSERT INTO tasks (title, description, start_date, end_date, start_time, end_time,
+                   category, completed, user_id, created_at)
+SELECT
+    'Задача ' || t,
+    'Описание задачи номер ' || t,
+    current_date + (t % 30),
+    current_date + (t % 30) + 1,
+    time '09:00',
+    time '18:00',
+    (ARRAY['work', 'personal', 'health', 'education', 'hobby', 'other'])[1 + t % 6],
+    t % 3 = 0,
+    :user_id,
+    now() - make_interval(mins => t)
+FROM generate_series(1, :tasks) AS t
+"""
+
+
+def synthetic_rows(count: int) -> list:
+    """Строки задач, как их возвращает select(*TASK_COLUMNS).mappings()"""
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": number,
+            "title": f"Задача {number}",
+            "description": f"Описание задачи номер {number}",
+            "start_date": date.today() + timedelta(days=number % 30),
+            "end_date": date.today() + timedelta(days=number % 30 + 1),
+            "start_time": dt_time(9, 0),
+            "end_time": dt_time(18, 0),
+            "category": "work",
+            "completed": number % 3 == 0,
+            "created_at": now - timedelta(minutes=number),
+            "updated_at": None,
+            "user_id": 1,
+        }
+        for number in range(1, count + 1)
+    ]
+
+
+async def old_path(tasks: list) -> bytes:
+    """Сериализация, как до быстрого пути"""
+    model = TaskListResponse(
+        tasks=tasks, total=len(tasks), page=1, per_page=len(tasks), total_pages=1
+    )
+    content = await serialize_response(field=response_field, response_content=model)
+    return JSONResponse(content).body
+
+
+async def fast_path(rows: list) -> bytes:
+    """Сериализация через TypeAdapter в bytes"""
+    return _list_response(rows, len(rows), 0, len(rows)).body
+
+
+async def measure(call, repeat: int) -> float:
+    """Медианное время одного вызова, секунды"""
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        await call()
+        timings.append(time.perf_counter() - started_at)
+    return statistics.median(timings)
+
+
+def report(name: str, seconds: float, count: int) -> None:
+    print(f"{name:<32} {seconds * 1000:9.2f} мс  {seconds / count * 1e6:8.2f} мкс/задача")
+
+
+async def bench_serialization(count: int, repeat: int) -> None:
+    rows = synthetic_rows(count)
+    orm_tasks = [Task(**row) for row in rows]
+    assert (await old_path(orm_tasks)) and (await fast_path(rows))
+
+    print(f"Сериализация {count} задач (медиана из {repeat}):")
+    old = await measure(lambda: old_path(orm_tasks), repeat)
+    fast = await measure(lambda: fast_path(rows), repeat)
+    report("ORM + response_model", old, count)
+    report("строки + TypeAdapter", fast, count)
+    print(f"Ускорение: x{old / fast:.1f}")
+
+
+async def bench_database(count: int, repeat: int) -> None:
+    engine = create_async_engine(settings.DATABASE_URL)
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            user_id = (await conn.execute(text(SEED_USER_SQL))).scalar_one()
+            await conn.execute(text(SEED_TASKS_SQL), {"user_id": user_id, "tasks": count})
+            db = AsyncSession(bind=conn, join_transaction_mode="create_savepoint")
+
+            async def orm_request():
+                result = await db.execute(select(Task).where(Task.user_id == user_id))
+                body = await old_path(result.scalars().all())
+                # Как и в запросе к API, identity map живет одну сессию
+                db.expunge_all()
+                return body
+
+            async def rows_request():
+                result = await db.execute(select(*TASK_COLUMNS).where(Task.user_id == user_id))
+                return await fast_path(result.mappings().all())
+
+            print(f"\nВыборка из БД и сериализация {count} задач (медиана из {repeat}):")
+            old = await measure(orm_request, repeat)
+            fast = await measure(rows_request, repeat)
+            report("select(Task) + response_model", old, count)
+            report("select(колонки) + TypeAdapter", fast, count)
+            print(f"Ускорение: x{old / fast:.1f}")
+        finally:
+            await transaction.rollback()
+    await engine.dispose()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1000, help="Задач в ответе")
+    parser.add_argument("--repeat", type=int, default=50, help="Повторов каждого замера")
+    parser.add_argument("--db", action="store_true", help="Также измерить выборку из БД")
+    args = parser.parse_args()
+
+    await bench_serialization(args.tasks, args.repeat)
+    if args.db:
+        await bench_database(args.tasks, args.repeat)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
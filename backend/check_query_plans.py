@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Проверка планов запросов task_service на наполненной тестовыми данными БД.
+
+Скрипт в одной транзакции создает пользователей и задачи, выполняет
+ANALYZE, вызывает функции task_service, перехватывает отправленный в БД SQL
+и прогоняет его через EXPLAIN. Запрос считается корректным, если таблицы
+tasks, task_tombstones, task_day_counts и task_occurrences читаются только через индекс (Index Scan / Index
+Only Scan / Bitmap Index/Heap Scan). Запросы без таблиц (блокировки)
+пропускаются. В конце транзакция откатывается - данные не остаются.
+
+Запуск (нужна БД с применёнными миграциями):
+    PLAN_CHECK_USERS=200 PLAN_CHECK_TASKS=500 python check_query_plans.py
+"""
+import asyncio
+import json
+import os
+import sys
+from datetime import date, datetime, timedelta
+from sqlalchemy import event, text
+from sqlalchemy.dialects.postgresql import Range
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from config import settings
+from src.services import rollups, task_service
+from src.services.periods import resolve_period
+
+INDEX_NODES = {"Index Scan", "Index Only Scan", "Bitmap Index Scan", "Bitmap Heap Scan"}
+CHECKED_TABLES = {"tasks", "task_tombstones", "task_day_counts", "task_occurrences"}
+
+SEED_USERS_SQL = """
+INSERT INTO users (name, email, hashed_password, is_active)
+SELECT 'plan-check ' || g, 'plan-check-' || g || '@example.com', 'x', true
+FROM generate_series(1, :users) AS g
+"""
+
+SEED_TASKS_SQL = """
+INSERT INTO tasks (title, description, start_date, end_date, category, completed, user_id, created_at)
+SELECT
+    'Задача ' || t,
+    'Описание задачи номер ' || t,
+    CASE WHEN t % 10 = 0 THEN NULL ELSE current_date + ((t * 7) % 120 - 60) END,
+    CASE WHEN t % 10 = 0 THEN NULL ELSE current_date + ((t * 7) % 120 - 58) END,
+    (ARRAY['work', 'personal', 'health', 'education', 'hobby', 'other'])[1 + t % 6],
+    t % 3 = 0,
+    u.id,
+    now() - make_interval(mins => t)
+FROM users AS u
+CROSS JOIN generate_series(1, :tasks) AS t
+WHERE u.email LIKE 'plan-check-%'
+"""
+
+
+# Повторяющиеся задачи: каждая 50-я задача - еженедельная серия, первые
+# 20 вхождений отмечены выполненными
+SEED_SERIES_SQL = """
+WITH series AS (
+    UPDATE tasks AS t
+    SET recurrence = 'FREQ=WEEKLY',
+        recurrence_freq = 'WEEKLY',
+        recurrence_interval = 1,
+        recurrence_weekdays = 1 << (extract(isodow FROM t.start_date)::int - 1)
+    FROM users AS u
+    WHERE u.id = t.user_id AND u.email LIKE 'plan-check-%'
+        AND t.id % 50 = 0 AND t.start_date IS NOT NULL
+    RETURNING t.id, t.start_date
+)
+INSERT INTO task_occurrences (task_id, occurrence_date, completed)
+SELECT id, start_date + 7 * week, true
+FROM series
+CROSS JOIN generate_series(0, 19) AS week
+"""
+
+# Удаленные задачи: по 10% задач каждого пользователя
+SEED_TOMBSTONES_SQL = """
+INSERT INTO task_tombstones (task_id, user_id)
+SELECT -t.id, t.user_id
+FROM tasks AS t
+JOIN users AS u ON u.id = t.user_id
+WHERE u.email LIKE 'plan-check-%' AND t.id % 10 = 0
+"""
+
+
+def collect_nodes(plan: dict, nodes: list) -> list:
+    """Плоский список узлов плана"""
+    nodes.append(plan)
+    for child in plan.get("Plans", []):
+        collect_nodes(child, nodes)
+    return nodes
+
+
+async def check_plans():
+    """Наполняет БД, снимает планы запросов сервиса и проверяет их"""
+    users = int(os.getenv("PLAN_CHECK_USERS", "200"))
+    tasks = int(os.getenv("PLAN_CHECK_TASKS", "500"))
+    engine = create_async_engine(settings.DATABASE_URL)
+    captured = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        # Служебные команды сессии (savepoint при commit) не проверяются
+        if not statement.startswith(("EXPLAIN", "SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")):
+            captured.append((statement, parameters))
+
+    failures = 0
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            print(f"Наполнение БД: {users} пользователей x {tasks} задач...")
+            await conn.execute(text(SEED_USERS_SQL), {"users": users})
+            await conn.execute(text(SEED_TASKS_SQL), {"tasks": tasks})
+            await conn.execute(text(SEED_SERIES_SQL))
+            await conn.execute(text(SEED_TOMBSTONES_SQL))
+            await conn.execute(text("ANALYZE users"))
+            await conn.execute(text("ANALYZE tasks"))
+            await conn.execute(text("ANALYZE task_tombstones"))
+            await conn.execute(text("ANALYZE task_day_counts"))
+            await conn.execute(text("ANALYZE task_occurrences"))
+
+            user_id = (await conn.execute(text(
+                "SELECT id FROM users WHERE email = :email"
+            ), {"email": f"plan-check-{users // 2}@example.com"})).scalar_one()
+            task_id = (await conn.execute(text(
+                "SELECT id FROM tasks WHERE user_id = :user_id LIMIT 1"
+            ), {"user_id": user_id})).scalar_one()
+
+            db = AsyncSession(bind=conn, join_transaction_mode="create_savepoint")
+            _, _, next_cursor = await task_service.get_tasks(db, user_id, limit=20)
+            today = date.today()
+            month = resolve_period("month", today)
+            now = datetime.now().replace(microsecond=0)
+            next_hours = Range(now, now + timedelta(hours=6), bounds="[)")
+            checks = [
+                ("get_tasks", lambda: task_service.get_tasks(db, user_id)),
+                ("get_tasks period=day", lambda: task_service.get_tasks(db, user_id, period="day")),
+                ("get_tasks period=week", lambda: task_service.get_tasks(db, user_id, period="week")),
+                ("get_tasks period=month", lambda: task_service.get_tasks(db, user_id, period="month")),
+                ("get_tasks period=month category", lambda: task_service.get_tasks(
+                    db, user_id, period="month", category="work"
+                )),
+                ("get_tasks category", lambda: task_service.get_tasks(db, user_id, category="work")),
+                ("get_tasks completed", lambda: task_service.get_tasks(db, user_id, completed=False)),
+                ("get_tasks cursor", lambda: task_service.get_tasks(
+                    db, user_id, limit=20, cursor=next_cursor, with_total=False
+                )),
+                ("get_tasks skip=400", lambda: task_service.get_tasks(db, user_id, skip=400)),
+                ("get_task_stats", lambda: task_service.get_task_stats(db, user_id)),
+                ("get_task_stats period=day", lambda: task_service.get_task_stats(db, user_id, "day")),
+                ("get_task_stats period=week", lambda: task_service.get_task_stats(db, user_id, "week")),
+                ("get_task_stats period=month", lambda: task_service.get_task_stats(db, user_id, "month")),
+                ("search_tasks", lambda: task_service.search_tasks(db, user_id, "Задача 1")),
+                ("get_task", lambda: task_service.get_task(db, task_id, user_id)),
+                ("get_changes", lambda: task_service.get_changes(db, user_id, 0, 100)),
+                ("get_agenda", lambda: task_service.get_agenda(db, user_id, next_hours)),
+                ("get_conflicts", lambda: task_service.get_conflicts(db, user_id, next_hours, task_id)),
+                ("get_calendar", lambda: rollups.get_calendar(db, user_id, month, today)),
+                ("get_category_breakdown", lambda: rollups.get_category_breakdown(db, user_id, None, today)),
+                ("get_category_breakdown month", lambda: rollups.get_category_breakdown(db, user_id, month, today)),
+            ]
+
+            for name, call in checks:
+                task_service.task_cache.clear()
+                captured.clear()
+                await call()
+                for number, (statement, parameters) in enumerate(list(captured), start=1):
+                    result = await conn.exec_driver_sql(
+                        "EXPLAIN (FORMAT JSON) " + statement, parameters
+                    )
+                    raw_plan = result.scalar_one()
+                    plan = (json.loads(raw_plan) if isinstance(raw_plan, str) else raw_plan)[0]["Plan"]
+                    scans = [
+                        (node["Node Type"], node.get("Index Name", ""))
+                        for node in collect_nodes(plan, [])
+                        if node.get("Relation Name") in CHECKED_TABLES or
+                        node.get("Index Name", "").startswith(("ix_tasks", "ix_task_tombstones", "ux_task_day_counts")) or
+                        node.get("Index Name") in {"tasks_pkey", "task_tombstones_pkey", "task_occurrences_pkey"}
+                    ]
+                    if not scans and "FROM" not in statement:
+                        continue
+                    ok = bool(scans) and all(node_type in INDEX_NODES for node_type, _ in scans)
+                    failures += not ok
+                    summary = ", ".join(f"{node_type} {index}".strip() for node_type, index in scans)
+                    print(f"{'✅' if ok else '❌'} {name} #{number}: {summary or plan['Node Type']}")
+        finally:
+            await transaction.rollback()
+    await engine.dispose()
+
+    if failures:
+        print(f"❌ Запросов без индексного доступа: {failures}")
+        sys.exit(1)
+    print("✅ Все запросы используют индексы")
+
+
+if __name__ == "__main__":
+    asyncio.run(check_plans())
@@ -1,18 +1,91 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Hashable, Optional
+from uuid import uuid4
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from config import settings
+from src.services.metrics import Counter, Histogram, register_collector
+from src.services.read_routing import read_routing
 
-# Создание асинхронного движка базы данных
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=True,
-    future=True
+logger = logging.getLogger(__name__)
+
+pool_wait_seconds = Histogram(
+    "db_pool_wait_seconds",
+    "Время ожидания соединения из пула"
+)
+pool_timeouts_total = Counter(
+    "db_pool_timeouts_total",
+    "Запросы соединения, не дождавшиеся свободного соединения в пуле"
 )
 
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений с замером времени ожидания свободного соединения"""
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            pool_timeouts_total.inc()
+            raise
+        finally:
+            pool_wait_seconds.observe(time.perf_counter() - started_at)
+
+
+def _connect_args(url: str) -> dict:
+    """Параметры asyncpg: кэш prepared statements или режим совместимости с PgBouncer"""
+    if not url.startswith("postgresql+asyncpg"):
+        return {}
+    if settings.DB_PGBOUNCER:
+        # PgBouncer в режиме transaction не сохраняет prepared statements между
+        # транзакциями: отключаем кэши и делаем имена уникальными
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    return {
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+    }
+
+
+def _create_engine(url: str) -> AsyncEngine:
+    if not url.startswith("postgresql"):
+        # Схема и запросы используют возможности PostgreSQL, других СУБД нет
+        raise RuntimeError("DATABASE_URL и DATABASE_REPLICA_URL должны указывать на PostgreSQL")
+    return create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        future=True,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=_connect_args(url)
+    )
+
+# Создание асинхронного движка базы данных
+engine = _create_engine(settings.DATABASE_URL)
+# Реплика для чтения (необязательна, см. src.services.read_routing)
+replica_engine = _create_engine(settings.DATABASE_REPLICA_URL) if settings.DATABASE_REPLICA_URL else None
+
 # Создание фабрики сессий
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
+ReplicaSessionLocal = sessionmaker(
+    replica_engine, class_=AsyncSession, expire_on_commit=False
+) if replica_engine is not None else None
+if replica_engine is not None:
+    read_routing.attach(replica_engine, ReplicaSessionLocal)
 
 # Зависимость для получения сессии базы данных
 async def get_db():
@@ -21,3 +94,59 @@ async def get_db():
             yield session
         finally:
             await session.close()
+
+@asynccontextmanager
+async def read_session(key: Optional[Hashable] = None) -> AsyncIterator[AsyncSession]:
+    """Сессия только для чтения: реплика или primary (см. src.services.read_routing)
+
+    Не подходит для запросов с блокировками и водяными знаками
+    (синхронизация): advisory-блокировки primary реплике не видны.
+    """
+    factory = ReplicaSessionLocal if await read_routing.use_replica(key) else AsyncSessionLocal
+    async with factory() as session:
+        yield session
+
+def _pool_stats(pool_engine: AsyncEngine) -> dict:
+    pool = pool_engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+    }
+
+def get_pool_stats() -> dict:
+    """Состояние пула соединений для мониторинга
+
+    Время ожидания и таймауты - общие для пулов primary и реплики.
+    """
+    stats = {
+        **_pool_stats(engine),
+        "timeouts": pool_timeouts_total.value,
+        "wait_seconds": pool_wait_seconds.snapshot(),
+    }
+    if replica_engine is not None:
+        stats["replica"] = {
+            **_pool_stats(replica_engine),
+            "usable": read_routing.replica_ok,
+            "lag_seconds": read_routing.lag_seconds,
+        }
+    stats["reads"] = dict(read_routing.reads)
+    return stats
+
+@register_collector
+def _collect_pool_stats():
+    pools = {"primary": engine}
+    if replica_engine is not None:
+        pools["replica"] = replica_engine
+    for name, pool_engine in pools.items():
+        stats = _pool_stats(pool_engine)
+        labels = {"pool": name}
+        yield "db_pool_size", "gauge", "Размер пула соединений", labels, stats["size"]
+        yield "db_pool_checked_out", "gauge", "Выданные соединения", labels, stats["checked_out"]
+        yield "db_pool_overflow", "gauge", "Соединения сверх размера пула", labels, stats["overflow"]
+    for target, count in read_routing.reads.items():
+        yield "db_reads_total", "counter", "Сессии для чтения по базе", {"target": target}, count
+    if read_routing.lag_seconds is not None:
+        yield "db_replica_lag_seconds", "gauge", "Отставание реплики", {}, read_routing.lag_seconds
@@ -1,20 +1,59 @@
-from fastapi import FastAPI, Request
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from src.routers import auth, tasks
+from fastapi.responses import JSONResponse
+from src.routers import auth, tasks, metrics
+from src.middleware import RateLimitMiddleware, ReadConsistencyMiddleware, TelemetryMiddleware, instrument_engine
+from src.services.password_hasher import hashing_pool, HashingPoolSaturated
+from src.services.cache import close_shared_backends
+from src.services.rate_limit import configured_limits, create_rate_limit_backend
+from src.services.read_routing import COMMIT_LSN_HEADER
+from src.services.task_events import change_feed
+from database import engine, replica_engine
 from config import settings
 
-app = FastAPI(title="Home Project API", version="1.0.0")
+# Выборочные строки телеметрии пишутся в stdout рядом с логами uvicorn
+telemetry_logger = logging.getLogger("telemetry")
+telemetry_logger.setLevel(logging.INFO)
+if not telemetry_logger.handlers:
+    telemetry_logger.addHandler(logging.StreamHandler())
 
-# Middleware для обработки проксированных запросов
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    # Логируем входящие запросы для отладки
-    print(f"Request: {request.method} {request.url}")
-    print(f"Headers: {dict(request.headers)}")
-    
-    response = await call_next(request)
-    return response
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Прием изменений задач от всех воркеров через LISTEN
+    await change_feed.start(settings.CHANGE_FEED_LISTEN_URL or settings.DATABASE_URL)
+    yield
+    await change_feed.stop()
+    await close_shared_backends()
+    # Останавливаем пул хеширования паролей
+    hashing_pool.shutdown()
+
+app = FastAPI(title="Home Project API", version="1.0.0", lifespan=lifespan)
+
+@app.exception_handler(HashingPoolSaturated)
+async def hashing_pool_saturated_handler(request: Request, exc: HashingPoolSaturated):
+    """Backpressure: очередь bcrypt переполнена"""
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": "Слишком много запросов авторизации, повторите попытку позже"},
+        headers={"Retry-After": "1"},
+    )
+
+# Позиция WAL клиента для чтения с реплики (read-your-writes между воркерами)
+if settings.DATABASE_REPLICA_URL:
+    app.add_middleware(ReadConsistencyMiddleware)
+
+# Ограничение частоты запросов: внутри CORS, чтобы ответ 429 был виден
+# браузеру
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        backend=create_rate_limit_backend(),
+        limits=configured_limits(),
+        trusted_proxies=settings.SERVER_FORWARDED_ALLOW_IPS.split(",")
+    )
 
 # Настройка CORS
 app.add_middleware(
@@ -23,6 +62,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "RateLimit-Policy", "Retry-After", COMMIT_LSN_HEADER],
+)
+
+# Телеметрия запросов: внешний слой, чтобы учитывать время всех middleware
+instrument_engine(engine)
+if replica_engine is not None:
+    instrument_engine(replica_engine)
+app.add_middleware(
+    TelemetryMiddleware,
+    sample_rate=settings.TELEMETRY_SAMPLE_RATE,
+    server_timing=settings.TELEMETRY_SERVER_TIMING
 )
 
 # Middleware для доверенных хостов (для продакшена)
@@ -35,6 +85,8 @@ if settings.ENVIRONMENT == "production":
 # Подключение роутеров
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(tasks.router, prefix="/api", tags=["tasks"])
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router)
 
 @app.get("/")
 async def root():
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Проверка и пересборка счетчиков задач task_day_counts.
+
+Счетчики ведутся триггерами в транзакциях изменения задач. Скрипт
+сравнивает их с пересчетом по таблице tasks и выводит расхождения; с
+флагом --fix пересобирает счетчики (для одного пользователя или всех).
+Код выхода 1 - найдены расхождения и пересборка не выполнялась.
+
+Запуск (нужна БД с применёнными миграциями):
+    python rebuild_rollups.py
+    python rebuild_rollups.py --user-id 42 --fix
+"""
+import argparse
+import asyncio
+import sys
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from config import settings
+from src.services.cache import close_shared_backends
+from src.services.rollups import find_rollup_mismatches, rebuild_rollups
+
+# Сколько расхождений выводить
+SHOW_MISMATCHES = 20
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--user-id", type=int, default=None, help="Только счетчики пользователя")
+    parser.add_argument("--fix", action="store_true", help="Пересобрать счетчики")
+    args = parser.parse_args()
+
+    engine = create_async_engine(settings.DATABASE_URL)
+    try:
+        async with AsyncSession(engine) as db:
+            mismatches = await find_rollup_mismatches(db, args.user_id)
+            await db.rollback()
+            for row in mismatches[:SHOW_MISMATCHES]:
+                print(
+                    f"❌ user={row['user_id']} day={row['day']} category={row['category']}: "
+                    f"total {row['actual_total']}/{row['expected_total']}, "
+                    f"completed {row['actual_completed']}/{row['expected_completed']}, "
+                    f"due_pending {row['actual_due_pending']}/{row['expected_due_pending']}"
+                )
+            if len(mismatches) > SHOW_MISMATCHES:
+                print(f"... и еще {len(mismatches) - SHOW_MISMATCHES}")
+
+            if args.fix:
+                rows = await rebuild_rollups(db, args.user_id)
+                print(f"✅ Счетчики пересобраны: {rows} строк")
+            elif mismatches:
+                print(f"❌ Расхождений: {len(mismatches)} (запустите с --fix)")
+                sys.exit(1)
+            else:
+                print("✅ Счетчики совпадают с задачами")
+    finally:
+        await close_shared_backends()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
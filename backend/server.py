@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Запуск API.
+
+В продакшене - gunicorn с воркерами uvicorn (uvloop и httptools): по
+одному процессу на доступное ядро, приложение загружается до fork, по
+SIGTERM воркеры перестают принимать соединения и дожидаются текущих
+запросов. Автоперезагрузка при изменении файлов - только для разработки
+(один процесс uvicorn).
+
+Запуск:
+    python server.py
+    python server.py --workers 4
+    python server.py --reload
+"""
+import argparse
+import math
+import os
+import sys
+from typing import Optional
+import uvicorn
+from gunicorn.app.base import BaseApplication
+from gunicorn.arbiter import Arbiter
+from uvicorn.workers import UvicornWorker
+from config import settings
+
+# Запас к SERVER_GRACEFUL_TIMEOUT на завершение lifespan (LISTEN, кэши,
+# пул хеширования), после которого gunicorn принудительно завершает воркер
+SHUTDOWN_MARGIN_SECONDS = 5
+
+
+def _cgroup_cpu_quota() -> Optional[float]:
+    """Квота CPU контейнера в ядрах (None - без ограничения)"""
+    try:
+        # cgroup v2: "<квота> <период>" или "max <период>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        # cgroup v1: квота -1 - без ограничения
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return None if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+
+def available_cpus() -> int:
+    """Ядра, доступные процессу: привязка к CPU и квота cgroup"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+
+class DrainingServer(uvicorn.Server):
+    """Сервер uvicorn, закрывающий потоки изменений при остановке
+
+    Потоки SSE не завершаются сами и без этого держали бы воркер до
+    истечения SERVER_GRACEFUL_TIMEOUT.
+    """
+
+    def handle_exit(self, sig, frame) -> None:
+        from src.services.task_events import change_feed
+
+        change_feed.close_subscribers()
+        super().handle_exit(sig, frame)
+
+
+class Worker(UvicornWorker):
+    """Воркер gunicorn: uvicorn с настройками SERVER_* и DrainingServer"""
+
+    CONFIG_KWARGS = {
+        "loop": settings.SERVER_LOOP,
+        "http": settings.SERVER_HTTP,
+        "timeout_graceful_shutdown": settings.SERVER_GRACEFUL_TIMEOUT,
+        "access_log": settings.SERVER_ACCESS_LOG,
+    }
+
+    async def _serve(self) -> None:
+        self.config.app = self.wsgi
+        server = DrainingServer(config=self.config)
+        self._install_sigquit_handler()
+        await server.serve(sockets=self.sockets)
+        if not server.started:
+            sys.exit(Arbiter.WORKER_BOOT_ERROR)
+
+
+def _post_fork(server, worker) -> None:
+    # Пулы соединений не переходят через fork: воркер открывает свои
+    # (close=False не трогает соединения мастера, если они были открыты)
+    from database import engine, replica_engine
+
+    for pool_engine in (engine, replica_engine):
+        if pool_engine is not None:
+            pool_engine.sync_engine.dispose(close=False)
+
+
+class Application(BaseApplication):
+    """gunicorn с настройками из config.Settings вместо gunicorn.conf.py"""
+
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self) -> None:
+        for name, value in self.options.items():
+            self.cfg.set(name, value)
+
+    def load(self):
+        from main import app
+
+        return app
+
+
+def gunicorn_options(workers: int) -> dict:
+    options = {
+        "bind": f"{settings.SERVER_HOST}:{settings.SERVER_PORT}",
+        "workers": workers,
+        "worker_class": "server.Worker",
+        "preload_app": settings.SERVER_PRELOAD,
+        "graceful_timeout": settings.SERVER_GRACEFUL_TIMEOUT + SHUTDOWN_MARGIN_SECONDS,
+        "keepalive": settings.SERVER_KEEPALIVE,
+        "forwarded_allow_ips": settings.SERVER_FORWARDED_ALLOW_IPS,
+        "accesslog": "-" if settings.SERVER_ACCESS_LOG else None,
+        "errorlog": "-",
+        "post_fork": _post_fork,
+    }
+    # Файл heartbeat воркеров в памяти: /tmp контейнера может быть на
+    # медленном overlay-диске, и запись в него задерживает воркеры
+    if os.path.isdir("/dev/shm"):
+        options["worker_tmp_dir"] = "/dev/shm"
+    return options
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=None, help="Число воркеров (по умолчанию SERVER_WORKERS или по ядрам)")
+    parser.add_argument("--reload", action="store_true", help="Перезапуск при изменении файлов (только для разработки)")
+    args = parser.parse_args()
+
+    if args.reload:
+        if settings.ENVIRONMENT == "production":
+            parser.error("--reload недоступен при ENVIRONMENT=production")
+        uvicorn.run(
+            "main:app",
+            host=settings.SERVER_HOST,
+            port=settings.SERVER_PORT,
+            reload=True,
+            loop=settings.SERVER_LOOP,
+            http=settings.SERVER_HTTP,
+        )
+        return
+
+    workers = args.workers or settings.SERVER_WORKERS or available_cpus()
+    # Пул соединений у каждого воркера свой
+    print(f"Воркеров: {workers}, соединений с БД до {workers * (settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW)}", flush=True)
+    if workers > 1 and not settings.CACHE_URL:
+        # Лимиты фактически умножаются на число воркеров
+        print("CACHE_URL не задан: кэши и лимиты частоты запросов у каждого воркера свои", flush=True)
+    Application(gunicorn_options(workers)).run()
+
+
+if __name__ == "__main__":
+    main()
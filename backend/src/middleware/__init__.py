@@ -0,0 +1,5 @@
+from .rate_limit import RateLimitMiddleware
+from .read_consistency import ReadConsistencyMiddleware
+from .telemetry import TelemetryMiddleware, instrument_engine
+
+__all__ = ["RateLimitMiddleware", "ReadConsistencyMiddleware", "TelemetryMiddleware", "instrument_engine"]
@@ -0,0 +1,154 @@
+import ipaddress
+from typing import Dict, Iterable, Optional
+from urllib.parse import parse_qs
+from jose import JWTError, jwt
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from src.services.metrics import register_collector
+from src.services.rate_limit import RateLimitBackend, RateLimitDecision, TokenBucket, closed_decision
+from config import settings
+
+# Маршруты группы auth: ограничение по IP защищает от перебора паролей
+AUTH_PATHS = ("/api/auth/login", "/api/auth/token", "/api/auth/register")
+READ_METHODS = ("GET", "HEAD")
+
+# Запросы по группам и результату для /metrics
+requests_by_result: Dict[tuple, int] = {}
+
+
+@register_collector
+def _collect_rate_limit():
+    for (group, result), count in requests_by_result.items():
+        yield (
+            "rate_limit_requests_total", "counter", "Запросы, прошедшие проверку лимита",
+            {"group": group, "result": result}, count
+        )
+
+
+def route_group(method: str, path: str) -> Optional[str]:
+    """Группа лимита запроса (None - без ограничения)"""
+    if not path.startswith("/api/") or method == "OPTIONS":
+        return None
+    if path in AUTH_PATHS:
+        return "auth"
+    return "reads" if method in READ_METHODS else "writes"
+
+
+class RateLimitMiddleware:
+    """ASGI middleware: ограничение частоты запросов (token bucket)
+
+    Запросы группы auth считаются по IP клиента, остальные - по
+    пользователю из подписанного JWT (заголовок Authorization или
+    stream_token потока), без валидного токена - по IP. IP берется из
+    X-Forwarded-For, только если запрос пришел от доверенного прокси:
+    крайний правый адрес не из trusted_proxies (адреса и подсети, "*" -
+    любой адрес, как у uvicorn). В ответ добавляются
+    заголовки RateLimit-*, превышение - 429 с Retry-After.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        backend: RateLimitBackend,
+        limits: Dict[str, TokenBucket],
+        trusted_proxies: Iterable[str] = ()
+    ):
+        self.app = app
+        self.backend = backend
+        self.limits = limits
+        proxies = [proxy.strip() for proxy in trusted_proxies if proxy.strip()]
+        self.trust_all = "*" in proxies
+        self.trusted_proxies = [ipaddress.ip_network(proxy, strict=False) for proxy in proxies if proxy != "*"]
+
+    def _trusted(self, address: str) -> bool:
+        if self.trust_all:
+            return True
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self.trusted_proxies)
+
+    def client_ip(self, scope: Scope, headers: Headers) -> str:
+        client = scope.get("client")
+        address = client[0] if client else "unknown"
+        if not self._trusted(address):
+            return address
+        forwarded = headers.get("x-forwarded-for")
+        if forwarded:
+            for hop in reversed(forwarded.split(",")):
+                address = hop.strip()
+                if not self._trusted(address):
+                    break
+        return address
+
+    @staticmethod
+    def token_subject(scope: Scope, headers: Headers) -> Optional[str]:
+        """Пользователь из JWT (sub); None - токена нет или он невалиден"""
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer":
+            token = ""
+        if not token and b"stream_token=" in scope["query_string"]:
+            values = parse_qs(scope["query_string"].decode("latin-1")).get("stream_token")
+            token = values[0] if values else ""
+        if not token:
+            return None
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
+            return None
+        return payload.get("sub")
+
+    def identity(self, group: str, scope: Scope, headers: Headers) -> str:
+        if group != "auth":
+            subject = self.token_subject(scope, headers)
+            if subject is not None:
+                return f"user:{subject}"
+        return f"ip:{self.client_ip(scope, headers)}"
+
+    @staticmethod
+    def _headers(limit: TokenBucket, decision: RateLimitDecision) -> Dict[str, str]:
+        return {
+            "RateLimit-Limit": str(limit.burst),
+            "RateLimit-Remaining": str(decision.remaining),
+            "RateLimit-Reset": str(decision.reset_after),
+            "RateLimit-Policy": f"{limit.per_minute};w=60;burst={limit.burst}",
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        group = route_group(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if group is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        limit = self.limits[group]
+        if limit.closed:
+            decision = closed_decision()
+        else:
+            decision = await self.backend.take(f"{group}:{self.identity(group, scope, headers)}", limit)
+        if decision is None:
+            await self.app(scope, receive, send)
+            return
+
+        result = "allowed" if decision.allowed else "rejected"
+        requests_by_result[group, result] = requests_by_result.get((group, result), 0) + 1
+        limit_headers = self._headers(limit, decision)
+        if not decision.allowed:
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Слишком много запросов, повторите попытку позже"},
+                headers={**limit_headers, "Retry-After": str(decision.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        async def send_with_limits(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response_headers = MutableHeaders(scope=message)
+                for name, value in limit_headers.items():
+                    response_headers.append(name, value)
+            await send(message)
+
+        await self.app(scope, receive, send_with_limits)
@@ -0,0 +1,39 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from src.services.read_routing import (
+    COMMIT_LSN_HEADER,
+    READ_AFTER_LSN_HEADER,
+    RequestPosition,
+    current_position,
+    parse_lsn
+)
+
+
+class ReadConsistencyMiddleware:
+    """ASGI middleware: позиция WAL клиента для чтения с реплики
+
+    Позиция из READ_AFTER_LSN_HEADER запроса (некорректная
+    игнорируется) ограничивает чтения с реплики в любом воркере, позиция
+    коммита изменений запроса возвращается в COMMIT_LSN_HEADER ответа.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        position = RequestPosition(parse_lsn(Headers(scope=scope).get(READ_AFTER_LSN_HEADER)))
+        token = current_position.set(position)
+
+        async def send_with_position(message: Message) -> None:
+            if message["type"] == "http.response.start" and position.commit_lsn is not None:
+                MutableHeaders(scope=message).append(COMMIT_LSN_HEADER, position.commit_lsn)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_position)
+        finally:
+            current_position.reset(token)
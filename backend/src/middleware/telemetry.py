@@ -0,0 +1,127 @@
+import logging
+import random
+import time
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from src.services.metrics import Histogram
+
+logger = logging.getLogger("telemetry")
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+request_duration_seconds = Histogram(
+    "http_request_duration_seconds",
+    "Длительность обработки HTTP запроса",
+    labelnames=("method", "route", "status")
+)
+request_db_seconds = Histogram(
+    "http_request_db_seconds",
+    "Суммарное время SQL запросов за HTTP запрос",
+    labelnames=("method", "route")
+)
+request_db_queries = Histogram(
+    "http_request_db_queries",
+    "Количество SQL запросов за HTTP запрос",
+    buckets=QUERY_COUNT_BUCKETS,
+    labelnames=("method", "route")
+)
+
+
+class RequestStats:
+    """Счетчики БД текущего запроса"""
+
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+# Объект статистики текущего запроса; изменяемый, поэтому виден и из
+# дочерних задач, которым контекст копируется при создании
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Подсчет времени и количества SQL запросов в рамках HTTP запроса"""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started_at = conn.info["query_started_at"].pop()
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += time.perf_counter() - started_at
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_started_at"):
+            connection.info["query_started_at"].pop()
+
+
+class TelemetryMiddleware:
+    """ASGI middleware: гистограммы по маршрутам, время БД, Server-Timing
+
+    Метрики пишутся для каждого запроса (это только инкременты в памяти),
+    а подробная строка лога - для доли sample_rate запросов. Заголовки и
+    тело запроса не логируются.
+    """
+
+    def __init__(self, app: ASGIApp, sample_rate: float = 0.0, server_timing: bool = True):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    elapsed_ms = (time.perf_counter() - started_at) * 1000
+                    headers = MutableHeaders(scope=message)
+                    headers.append(
+                        "Server-Timing",
+                        f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries", '
+                        f"app;dur={elapsed_ms:.2f}"
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request_stats.reset(token)
+            elapsed = time.perf_counter() - started_at
+            # Шаблон пути маршрута ограничивает число меток; Starlette кладет
+            # найденный маршрут в scope
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+
+            request_duration_seconds.labels(method=method, route=route_path, status=status_code).observe(elapsed)
+            request_db_seconds.labels(method=method, route=route_path).observe(stats.db_time)
+            request_db_queries.labels(method=method, route=route_path).observe(stats.queries)
+
+            if self.sample_rate and random.random() < self.sample_rate:
+                logger.info(
+                    "request method=%s route=%s status=%s duration_ms=%.2f db_ms=%.2f queries=%d",
+                    method, route_path, status_code, elapsed * 1000, stats.db_time * 1000, stats.queries
+                )
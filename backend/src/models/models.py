@@ -1,14 +1,41 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Date, Time, ForeignKey, Text
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Boolean, Date, Time, ForeignKey, Text, Index, Sequence, Computed, text
+from sqlalchemy.dialects.postgresql import TSRANGE
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
 Base = declarative_base()
 
+# Поисковый вектор задачи: название (вес A) и описание (вес B).
+# Запросы поиска должны использовать то же выражение, что и индекс ix_tasks_search
+TASK_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+)
+
+# Интервал задачи из даты и времени: [начало, конец). Без времени задача
+# занимает дни целиком, задача только со временем начала - момент ('[]').
+# Конец раньше начала (возможен после частичного обновления) сводится к моменту
+_TASK_START_SQL = "start_date + coalesce(start_time, time '00:00')"
+_TASK_END_SQL = (
+    "CASE WHEN end_time IS NOT NULL THEN coalesce(end_date, start_date) + end_time "
+    "WHEN start_time IS NOT NULL AND end_date IS NULL THEN start_date + start_time "
+    "ELSE coalesce(end_date, start_date) + 1 + time '00:00' END"
+)
+TASK_TIME_RANGE_SQL = (
+    f"CASE WHEN start_date IS NOT NULL THEN tsrange("
+    f"{_TASK_START_SQL}, greatest({_TASK_START_SQL}, {_TASK_END_SQL}), "
+    f"CASE WHEN ({_TASK_END_SQL}) > ({_TASK_START_SQL}) THEN '[)' ELSE '[]' END) END"
+)
+
+# Глобальная последовательность изменений задач: каждое создание, изменение
+# и удаление получает следующий номер (водяной знак синхронизации клиента)
+task_change_seq = Sequence("task_change_seq", metadata=Base.metadata)
+
 class User(Base):
     __tablename__ = "users"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
@@ -21,21 +48,134 @@ class User(Base):
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Полнотекстовый поиск (только Postgres)
+        Index(
+            "ix_tasks_search",
+            text(f"({TASK_SEARCH_VECTOR_SQL})"),
+            postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
-    title = Column(String, nullable=False, index=True)
+    id = Column(Integer, primary_key=True)
+    title = Column(String, nullable=False)
     description = Column(Text, nullable=True)
-    start_date = Column(Date, nullable=True, index=True)
-    end_date = Column(Date, nullable=True, index=True)
+    start_date = Column(Date, nullable=True)
+    end_date = Column(Date, nullable=True)
     start_time = Column(Time, nullable=True)
     end_time = Column(Time, nullable=True)
-    category = Column(String, nullable=True, index=True)
-    completed = Column(Boolean, default=False, index=True)
+    category = Column(String, nullable=True)
+    completed = Column(Boolean, nullable=False, default=False, server_default=text("false"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Повторяющаяся задача (серия): правило RRULE и производные от него
+    # колонки для разворачивания вхождений в SQL (src/services/recurrence.py).
+    # recurrence_end - последнее возможное вхождение (NULL - бессрочно)
+    recurrence = Column(String, nullable=True)
+    recurrence_freq = Column(String, nullable=True)
+    recurrence_interval = Column(Integer, nullable=True)
+    recurrence_weekdays = Column(Integer, nullable=True)
+    recurrence_end = Column(Date, nullable=True)
+    # Вычисляемый интервал (TASK_TIME_RANGE_SQL) для повестки и поиска пересечений
+    time_range = Column(TSRANGE, Computed(TASK_TIME_RANGE_SQL, persisted=True))
+    change_seq = Column(
+        BigInteger,
+        nullable=False,
+        server_default=task_change_seq.next_value(),
+        onupdate=task_change_seq.next_value()
+    )
     
     # Foreign key к пользователю
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     
     # Связь с пользователем
     owner = relationship("User", back_populates="tasks")
+
+class TaskTombstone(Base):
+    """Запись об удаленной задаче для дельта-синхронизации"""
+    __tablename__ = "task_tombstones"
+    
+    task_id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    change_seq = Column(BigInteger, nullable=False, server_default=task_change_seq.next_value())
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class TaskOccurrence(Base):
+    """Отметка вхождения серии: выполнение или отмена одного дня
+
+    Хранятся только отмеченные вхождения, остальные разворачиваются из
+    правила серии при запросе.
+    """
+    __tablename__ = "task_occurrences"
+    
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True)
+    occurrence_date = Column(Date, primary_key=True)
+    completed = Column(Boolean, nullable=False, server_default=text("false"))
+    cancelled = Column(Boolean, nullable=False, server_default=text("false"))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class TaskDayCount(Base):
+    """Счетчики задач пользователя по дню и категории (rollup)
+
+    Поддерживаются триггерами task_day_counts_* на tasks в той же транзакции,
+    что и изменение задачи (см. миграцию 7f788b821e53). total и completed
+    считаются по start_date, due_pending - незавершенные задачи по end_date:
+    просроченные на дату X - сумма due_pending дней раньше X. day = NULL -
+    задачи без даты.
+    """
+    __tablename__ = "task_day_counts"
+    
+    id = Column(BigInteger, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    day = Column(Date, nullable=True)
+    category = Column(String, nullable=True)
+    total = Column(Integer, nullable=False, server_default=text("0"))
+    completed = Column(Integer, nullable=False, server_default=text("0"))
+    due_pending = Column(Integer, nullable=False, server_default=text("0"))
+
+# Колонки задачи для read-only запросов: строки без создания ORM объектов
+TASK_COLUMNS = tuple(Task.__table__.columns)
+
+# Индексы под запросы task_service: все запросы начинаются с user_id.
+# Список задач: фильтр completed и порядок сортировки get_tasks
+Index(
+    "ix_tasks_user_listing",
+    Task.user_id, Task.completed, Task.start_date, Task.created_at.desc(), Task.id.desc()
+)
+# Список задач категории в том же порядке
+Index(
+    "ix_tasks_user_category_listing",
+    Task.user_id, Task.category, Task.completed, Task.start_date,
+    Task.created_at.desc(), Task.id.desc()
+)
+# Фильтр по периоду и статистика (index-only scan за счет INCLUDE;
+# recurrence_freq отделяет разовые задачи от серий)
+Index(
+    "ix_tasks_user_start_date",
+    Task.user_id, Task.start_date,
+    postgresql_include=["end_date", "completed", "id", "recurrence_freq"]
+)
+# Серии пользователя, пересекающиеся с периодом
+Index(
+    "ix_tasks_user_series",
+    Task.user_id, Task.start_date,
+    postgresql_where=Task.recurrence_freq.isnot(None)
+)
+# Повестка и пересечения по времени (GiST, user_id - через btree_gist)
+Index(
+    "ix_tasks_user_time_range",
+    Task.user_id, Task.time_range,
+    postgresql_using="gist"
+).ddl_if(dialect="postgresql")
+# Поиск: порядок по дате создания
+Index("ix_tasks_user_created", Task.user_id, Task.created_at.desc(), Task.id.desc())
+# Дельта-синхронизация: изменения и удаления пользователя после водяного знака
+Index("ix_tasks_user_change_seq", Task.user_id, Task.change_seq)
+Index("ix_task_tombstones_user_change_seq", TaskTombstone.user_id, TaskTombstone.change_seq)
+# Rollup: ключ счетчика (NULL дня/категории - тоже значение ключа)
+Index(
+    "ux_task_day_counts_key",
+    TaskDayCount.user_id, TaskDayCount.day, TaskDayCount.category,
+    unique=True,
+    postgresql_nulls_not_distinct=True
+)
@@ -1,16 +1,18 @@
+import time
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import AsyncIterator, NamedTuple, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
-from database import get_db
-from src.schemas.user import UserCreate, UserLogin, UserResponse, Token, TokenData
-from src.models.models import User
+from database import AsyncSessionLocal, get_db, read_session
+from src.schemas.user import UserCreate, UserLogin, UserResponse, StreamToken, Token, TokenData
 from src.services.auth_service import (
     create_user,
     authenticate_user,
     create_access_token,
-    get_user_by_email
+    get_user_by_email,
+    get_principal
 )
 from config import settings
 
@@ -18,26 +20,88 @@ router = APIRouter()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
-    """Получение текущего пользователя по JWT токену"""
-    credentials_exception = HTTPException(
+# Назначение токена потока изменений (claim scope); у обычных токенов его нет
+STREAM_SCOPE = "stream"
+
+class StreamGrant(NamedTuple):
+    """Пользователь потока и момент (unix time), когда поток нужно закрыть"""
+    user: UserResponse
+    expires_at: float
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _token_payload(token: Optional[str], scope: Optional[str] = None) -> dict:
+    """Claims JWT токена с назначением scope; 401, если токен невалиден"""
+    if not token:
+        raise _credentials_exception()
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = TokenData(email=email)
     except JWTError:
-        raise credentials_exception
-    user = await get_user_by_email(db, email=token_data.email)
+        raise _credentials_exception()
+    # Токен потока не заменяет обычный, и наоборот
+    if payload.get("sub") is None or payload.get("scope") != scope:
+        raise _credentials_exception()
+    return payload
+
+async def _principal_from_payload(payload: dict, db: AsyncSession) -> UserResponse:
+    """Пользователь по claims проверенного токена; 401, если его нет или он неактивен"""
+    token_data = TokenData(email=payload["sub"])
+    user = await get_principal(db, token_data.email, expires_at=payload.get("exp"))
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
 
+async def _principal_from_token(token: Optional[str], db: AsyncSession) -> UserResponse:
+    """Пользователь по JWT токену; 401, если токен невалиден"""
+    return await _principal_from_payload(_token_payload(token), db)
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> UserResponse:
+    """Получение текущего пользователя по JWT токену
+
+    Пользователь берется из кэша principal_cache, поэтому в штатном режиме
+    аутентификация запроса не обращается к базе данных.
+    """
+    return await _principal_from_token(token, db)
+
+async def get_read_db(
+    current_user: UserResponse = Depends(get_current_user)
+) -> AsyncIterator[AsyncSession]:
+    """Сессия для чтения данных текущего пользователя
+
+    Реплика, если она настроена и пользователь недавно ничего не менял,
+    иначе primary (src.services.read_routing). Только для обработчиков без записи.
+    """
+    async with read_session(current_user.id) as db:
+        yield db
+
+async def get_stream_user(
+    request: Request,
+    stream_token: Optional[str] = Query(None, description="Токен потока из POST /api/auth/stream-token (EventSource не передает заголовки)")
+) -> StreamGrant:
+    """Пользователь для долгоживущих потоковых ответов
+
+    Обычный токен - только в заголовке Authorization, в адресе - только
+    короткий токен потока: адрес пишется в журналы доступа. Поток живет
+    не дольше токена, которым был получен (session_exp токена потока).
+    Сессия БД закрывается сразу после проверки, чтобы открытый поток не
+    удерживал соединение из пула.
+    """
+    scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+    async with AsyncSessionLocal() as db:
+        if scheme.lower() == "bearer" and credentials:
+            payload = _token_payload(credentials)
+            return StreamGrant(await _principal_from_payload(payload, db), payload["exp"])
+        payload = _token_payload(stream_token, STREAM_SCOPE)
+        return StreamGrant(await _principal_from_payload(payload, db), payload["session_exp"])
+
 @router.post("/register", response_model=UserResponse)
 async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
     """Регистрация нового пользователя"""
@@ -97,7 +161,25 @@ async def login_for_access_token(
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
+@router.post("/stream-token", response_model=StreamToken)
+async def issue_stream_token(
+    token: str = Depends(oauth2_scheme),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Короткий токен для открытия потока изменений (GET /api/tasks/stream)
+
+    Годен только для потока и только STREAM_TOKEN_EXPIRE_SECONDS; поток
+    закрывается, когда истекает токен, которым получен этот.
+    """
+    session_exp = _token_payload(token)["exp"]
+    expires_in = max(0, min(settings.STREAM_TOKEN_EXPIRE_SECONDS, int(session_exp - time.time())))
+    stream_token = create_access_token(
+        data={"sub": current_user.email, "scope": STREAM_SCOPE, "session_exp": session_exp},
+        expires_delta=timedelta(seconds=expires_in)
+    )
+    return {"stream_token": stream_token, "expires_in": expires_in}
+
 @router.get("/me", response_model=UserResponse)
-async def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: UserResponse = Depends(get_current_user)):
     """Получение информации о текущем пользователе"""
     return current_user
@@ -0,0 +1,37 @@
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from src.services.metrics import render_prometheus
+from database import get_pool_stats
+from config import settings
+
+
+def check_metrics_token(authorization: Optional[str] = Header(None)) -> None:
+    """Доступ к служебным endpoint по METRICS_TOKEN (если он задан)"""
+    if settings.METRICS_TOKEN is None:
+        return
+    expected = f"Bearer {settings.METRICS_TOKEN}".encode()
+    if not hmac.compare_digest((authorization or "").encode(), expected):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Нужен токен метрик",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+router = APIRouter(dependencies=[Depends(check_metrics_token)], include_in_schema=False)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Метрики процесса в формате Prometheus
+
+    У каждого воркера свои счетчики и гистограммы: ответ описывает только
+    ответивший процесс, а не весь сервер.
+    """
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@router.get("/health/db")
+async def db_pool_health():
+    """Состояние пулов соединений с БД этого процесса"""
+    return get_pool_stats()
@@ -1,14 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+import asyncio
+import hashlib
+import io
+import json
+import time
+from fastapi import APIRouter, Depends, File, HTTPException, status, Query, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.dialects.postgresql import Range
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Optional, List
-from database import get_db
-from src.models.models import User
+from typing import Dict, Optional, List
+from datetime import date, datetime, timedelta
+from config import settings
+from database import get_db, read_session
+from src.schemas.user import UserResponse
 from src.schemas.task import (
     TaskCreate, 
     TaskUpdate, 
     TaskResponse, 
     TaskListResponse, 
-    TaskStatsResponse
+    TaskStatsResponse,
+    TaskCalendarResponse,
+    TaskCategoryBreakdownResponse,
+    TaskAgendaResponse,
+    TaskSyncResponse,
+    TaskOccurrenceUpdate,
+    task_list_adapter,
+    TaskBulkCreate,
+    TaskBulkUpdate,
+    TaskBulkToggle,
+    TaskBulkDelete,
+    TaskBulkItemResult,
+    TaskBulkResponse,
+    TaskImportResponse
 )
 from src.services.task_service import (
     create_task,
@@ -17,70 +40,503 @@ from src.services.task_service import (
     update_task,
     delete_task,
     toggle_task_completion,
+    update_occurrence,
     get_task_stats,
-    search_tasks
+    get_agenda,
+    get_conflicts,
+    occurrence_time_range,
+    search_tasks,
+    bulk_create_tasks,
+    bulk_update_tasks,
+    bulk_toggle_tasks,
+    bulk_delete_tasks,
+    get_data_version,
+    export_tasks_query,
+    stream_tasks,
+    import_tasks,
+    get_changes,
+    InvalidCursor
 )
-from src.routers.auth import get_current_user
+from src.services.periods import PERIODS, PeriodError, local_datetime, local_today, resolve_period
+from src.services.recurrence import RecurrenceError
+from src.services.rollups import get_calendar, get_category_breakdown
+from src.services.task_events import change_feed
+from src.services.task_formats import TASK_FORMATS, ImportReport, InvalidImportFile, validated_batches
+from src.routers.auth import StreamGrant, get_current_user, get_read_db, get_stream_user
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
+CURSOR_DESCRIPTION = "Курсор следующей страницы (next_cursor); при указании skip игнорируется"
+INCLUDE_TOTAL_DESCRIPTION = "Считать общее количество задач (false экономит запрос)"
+
+class RawJSONResponse(Response):
+    """Ответ с уже сериализованным в bytes JSON"""
+    media_type = "application/json"
+
+def _list_response(
+    tasks: list,
+    total: Optional[int],
+    skip: int,
+    limit: int,
+    next_cursor: Optional[str] = None,
+    cursor: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None
+) -> RawJSONResponse:
+    """Сборка ответа со списком задач
+
+    Строки валидируются и сериализуются заранее собранным TypeAdapter сразу
+    в bytes, минуя повторную валидацию response_model и jsonable_encoder.
+    """
+    response = task_list_adapter.validate_python({
+        "tasks": tasks,
+        "total": total,
+        "page": None if cursor else (skip // limit) + 1,
+        "per_page": limit,
+        "total_pages": None if total is None else (total + limit - 1) // limit,
+        "next_cursor": next_cursor
+    })
+    return RawJSONResponse(task_list_adapter.dump_json(response), headers=headers)
+
+def _bad_request(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+def get_user_today(
+    tz: Optional[str] = Query(None, description="Часовой пояс пользователя (IANA), например Europe/Moscow")
+) -> date:
+    """Текущая дата пользователя для периодов day/week/month"""
+    try:
+        return local_today(tz)
+    except PeriodError as exc:
+        raise _bad_request(str(exc))
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Слабое сравнение ETag с заголовком If-None-Match"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+async def check_not_modified(
+    request: Request,
+    response: Response,
+    today: date = Depends(get_user_today),
+    current_user: UserResponse = Depends(get_current_user)
+) -> Dict[str, str]:
+    """Условный GET для списков и статистики задач
+
+    ETag строится из версии данных пользователя, пути, параметров запроса
+    и текущей даты пользователя (от нее зависят периоды). При совпадении с
+    If-None-Match отвечаем 304 до обращения к БД и сериализации. Заголовки
+    также возвращаются - для эндпоинтов, отдающих готовый Response.
+    """
+    query = "&".join(sorted(f"{key}={value}" for key, value in request.query_params.multi_items()))
+    digest = hashlib.sha1(
+        f"{current_user.id}|{request.url.path}|{query}|{today.isoformat()}".encode()
+    ).hexdigest()[:16]
+    etag = f'W/"{await get_data_version(current_user.id)}-{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return headers
+
 @router.post("/", response_model=TaskResponse, status_code=status.HTTP_201_CREATED)
 async def create_new_task(
     task: TaskCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: UserResponse = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Создание новой задачи"""
     db_task = await create_task(db, task, current_user.id)
     return db_task
 
+def _bulk_response(results: List[TaskBulkItemResult]) -> TaskBulkResponse:
+    """Сборка ответа пакетной операции"""
+    failed = sum(1 for item in results if item.error is not None)
+    return TaskBulkResponse(results=results, succeeded=len(results) - failed, failed=failed)
+
+def _bulk_id_results(task_ids: List[int], tasks: dict, status_name: str) -> TaskBulkResponse:
+    """Результат по каждому запрошенному id: задача найдена или нет"""
+    return _bulk_response([
+        TaskBulkItemResult(id=task_id, status=status_name, task=tasks[task_id])
+        if task_id in tasks else
+        TaskBulkItemResult(id=task_id, status="not_found", error="Задача не найдена")
+        for task_id in task_ids
+    ])
+
+@router.post("/bulk", response_model=TaskBulkResponse)
+async def bulk_create(
+    payload: TaskBulkCreate,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Пакетное создание задач: невалидные элементы пропускаются с ошибкой"""
+    results: List[Optional[TaskBulkItemResult]] = [None] * len(payload.tasks)
+    valid = []
+    for index, item in enumerate(payload.tasks):
+        try:
+            valid.append((index, TaskCreate.model_validate(item)))
+        except ValidationError as exc:
+            error = "; ".join(err["msg"] for err in exc.errors())
+            results[index] = TaskBulkItemResult(index=index, status="invalid", error=error)
+    
+    created = await bulk_create_tasks(db, [task for _, task in valid], current_user.id)
+    for (index, _), task in zip(valid, created):
+        results[index] = TaskBulkItemResult(index=index, id=task.id, status="created", task=task)
+    return _bulk_response(results)
+
+@router.patch("/bulk", response_model=TaskBulkResponse)
+async def bulk_update(
+    payload: TaskBulkUpdate,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Пакетное обновление: одинаковые изменения для списка задач"""
+    if not payload.changes.dict(exclude_unset=True):
+        raise _bad_request("Не указаны изменения")
+    try:
+        tasks = await bulk_update_tasks(db, payload.ids, payload.changes, current_user.id)
+    except RecurrenceError as exc:
+        raise _bad_request(str(exc))
+    return _bulk_id_results(payload.ids, {task.id: task for task in tasks}, "updated")
+
+@router.post("/bulk/toggle", response_model=TaskBulkResponse)
+async def bulk_toggle(
+    payload: TaskBulkToggle,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Пакетное изменение статуса выполнения"""
+    tasks = await bulk_toggle_tasks(db, payload.ids, current_user.id, payload.completed)
+    return _bulk_id_results(payload.ids, {task.id: task for task in tasks}, "updated")
+
+@router.post("/bulk/delete", response_model=TaskBulkResponse)
+async def bulk_delete(
+    payload: TaskBulkDelete,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Пакетное удаление задач"""
+    deleted = await bulk_delete_tasks(db, payload.ids, current_user.id)
+    return _bulk_id_results(payload.ids, {task_id: None for task_id in deleted}, "deleted")
+
 @router.get("/", response_model=TaskListResponse)
 async def get_user_tasks(
     skip: int = Query(0, ge=0, description="Количество пропускаемых записей"),
     limit: int = Query(100, ge=1, le=1000, description="Количество записей на странице"),
-    period: Optional[str] = Query(None, description="Фильтр по периоду: day, week, month"),
+    period: Optional[str] = Query(None, description="Фильтр по периоду: day, week, month, custom"),
+    date_from: Optional[date] = Query(None, description="Начало произвольного периода"),
+    date_to: Optional[date] = Query(None, description="Конец произвольного периода (включительно)"),
     category: Optional[str] = Query(None, description="Фильтр по категории"),
     completed: Optional[bool] = Query(None, description="Фильтр по статусу выполнения"),
     search: Optional[str] = Query(None, description="Поиск по названию и описанию"),
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    include_total: bool = Query(True, description=INCLUDE_TOTAL_DESCRIPTION),
+    today: date = Depends(get_user_today),
+    cache_headers: Dict[str, str] = Depends(check_not_modified),
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Получение списка задач пользователя с фильтрацией и пагинацией"""
     
     # Если есть поисковый запрос, используем поиск
     if search:
-        tasks, total = await search_tasks(db, current_user.id, search, skip, limit)
-    else:
-        tasks, total = await get_tasks(
-            db, current_user.id, skip, limit, period, category, completed
+        if cursor:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Курсорная пагинация не поддерживается для поиска"
+            )
+        tasks, total = await search_tasks(
+            db, current_user.id, search, skip, limit, with_total=include_total
         )
+        return _list_response(tasks, total, skip, limit, headers=cache_headers)
     
-    total_pages = (total + limit - 1) // limit
-    current_page = (skip // limit) + 1
+    try:
+        tasks, total, next_cursor = await get_tasks(
+            db, current_user.id, skip, limit, period, category, completed,
+            cursor=cursor, with_total=include_total,
+            date_from=date_from, date_to=date_to, today=today
+        )
+    except (InvalidCursor, PeriodError) as exc:
+        raise _bad_request(str(exc))
     
-    return TaskListResponse(
-        tasks=tasks,
-        total=total,
-        page=current_page,
-        per_page=limit,
-        total_pages=total_pages
-    )
+    return _list_response(tasks, total, skip, limit, next_cursor, cursor, cache_headers)
 
 @router.get("/stats", response_model=TaskStatsResponse)
 async def get_user_task_stats(
-    period: Optional[str] = Query(None, description="Фильтр по периоду: day, week, month"),
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    period: Optional[str] = Query(None, description="Фильтр по периоду: day, week, month, custom"),
+    date_from: Optional[date] = Query(None, description="Начало произвольного периода"),
+    date_to: Optional[date] = Query(None, description="Конец произвольного периода (включительно)"),
+    today: date = Depends(get_user_today),
+    _: Dict[str, str] = Depends(check_not_modified),
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Получение статистики по задачам пользователя"""
-    stats = await get_task_stats(db, current_user.id, period)
+    try:
+        stats = await get_task_stats(
+            db, current_user.id, period, date_from=date_from, date_to=date_to, today=today
+        )
+    except PeriodError as exc:
+        raise _bad_request(str(exc))
     return TaskStatsResponse(**stats)
 
+@router.get("/calendar", response_model=TaskCalendarResponse)
+async def get_user_task_calendar(
+    period: Optional[str] = Query(None, description="Период: day, week, month (по умолчанию), custom"),
+    date_from: Optional[date] = Query(None, description="Начало произвольного периода"),
+    date_to: Optional[date] = Query(None, description="Конец произвольного периода (включительно)"),
+    category: Optional[str] = Query(None, description="Фильтр по категории"),
+    today: date = Depends(get_user_today),
+    _: Dict[str, str] = Depends(check_not_modified),
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Календарь (тепловая карта): счетчики задач по дням периода
+
+    Счетчики ведутся по дню начала задачи: серия повторяющихся задач
+    учитывается один раз, в день начала серии. Поэтому для периода с
+    сериями они расходятся с /period и /stats, где серии развернуты во
+    вхождения.
+    """
+    try:
+        date_range = resolve_period(period, today, date_from, date_to) or resolve_period("month", today)
+    except PeriodError as exc:
+        raise _bad_request(str(exc))
+    days = await get_calendar(db, current_user.id, date_range, today, category)
+    start, end = date_range
+    return TaskCalendarResponse(date_from=start, date_to=end - timedelta(days=1), days=days)
+
+@router.get("/categories", response_model=TaskCategoryBreakdownResponse)
+async def get_user_task_categories(
+    period: Optional[str] = Query(None, description="Фильтр по периоду: day, week, month, custom"),
+    date_from: Optional[date] = Query(None, description="Начало произвольного периода"),
+    date_to: Optional[date] = Query(None, description="Конец произвольного периода (включительно)"),
+    today: date = Depends(get_user_today),
+    _: Dict[str, str] = Depends(check_not_modified),
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Счетчики задач по категориям
+
+    Как и в /calendar, серия повторяющихся задач считается одной задачей
+    (в отличие от /period и /stats за период).
+    """
+    try:
+        date_range = resolve_period(period, today, date_from, date_to)
+    except PeriodError as exc:
+        raise _bad_request(str(exc))
+    categories = await get_category_breakdown(db, current_user.id, date_range, today)
+    return TaskCategoryBreakdownResponse(categories=categories)
+
+def _time_window(start: datetime, end: datetime) -> Range:
+    """Интервал [start, end) повестки или поиска пересечений"""
+    if end <= start:
+        raise _bad_request("Конец интервала должен быть позже начала")
+    if end - start > timedelta(days=settings.AGENDA_MAX_DAYS):
+        raise _bad_request(f"Интервал не может быть длиннее {settings.AGENDA_MAX_DAYS} дней")
+    return Range(start, end, bounds="[)")
+
+@router.get("/agenda", response_model=TaskAgendaResponse)
+async def get_user_agenda(
+    start: Optional[datetime] = Query(None, description="Начало интервала (по умолчанию - текущее время)"),
+    end: Optional[datetime] = Query(None, description="Конец интервала"),
+    hours: Optional[int] = Query(None, ge=1, description="Длина интервала в часах, если не указан end"),
+    category: Optional[str] = Query(None, description="Фильтр по категории"),
+    completed: Optional[bool] = Query(None, description="Фильтр по статусу выполнения"),
+    limit: int = Query(100, ge=1, le=1000, description="Максимум задач в ответе"),
+    tz: Optional[str] = Query(None, description="Часовой пояс пользователя (IANA), например Europe/Moscow"),
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Повестка: задачи и вхождения серий, пересекающиеся с интервалом времени
+
+    Время без часового пояса считается локальным временем пользователя.
+    Без ETag: интервал по умолчанию зависит от текущего времени.
+    """
+    try:
+        start = local_datetime(start, tz)
+        if end is not None:
+            end = local_datetime(end, tz)
+        else:
+            end = start + timedelta(hours=hours or settings.AGENDA_DEFAULT_HOURS)
+    except PeriodError as exc:
+        raise _bad_request(str(exc))
+    window = _time_window(start, end)
+    tasks = await get_agenda(db, current_user.id, window, category, completed, limit)
+    return TaskAgendaResponse(start=start, end=end, tasks=tasks)
+
+@router.get("/conflicts", response_model=TaskAgendaResponse)
+async def get_user_conflicts(
+    start: datetime = Query(..., description="Начало проверяемого слота"),
+    end: datetime = Query(..., description="Конец проверяемого слота"),
+    exclude_id: Optional[int] = Query(None, description="Не учитывать задачу (при ее переносе)"),
+    limit: int = Query(100, ge=1, le=1000, description="Максимум задач в ответе"),
+    tz: Optional[str] = Query(None, description="Часовой пояс пользователя (IANA), например Europe/Moscow"),
+    _: Dict[str, str] = Depends(check_not_modified),
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Пересечения: незавершенные задачи со временем, занимающие слот [start, end)"""
+    try:
+        start = local_datetime(start, tz)
+        end = local_datetime(end, tz)
+    except PeriodError as exc:
+        raise _bad_request(str(exc))
+    window = _time_window(start, end)
+    try:
+        tasks = await get_conflicts(db, current_user.id, window, exclude_id, limit)
+    except PeriodError as exc:
+        raise _bad_request(str(exc))
+    return TaskAgendaResponse(start=start, end=end, tasks=tasks)
+
+@router.get("/sync", response_model=TaskSyncResponse)
+async def sync_user_tasks(
+    since: int = Query(0, ge=0, description="Водяной знак из предыдущего ответа; 0 - все задачи"),
+    limit: int = Query(500, ge=1, le=1000, description="Максимум изменений в ответе"),
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Дельта-синхронизация: задачи, измененные и удаленные после since"""
+    changed, deleted, occurrences, watermark, has_more = await get_changes(db, current_user.id, since, limit)
+    return TaskSyncResponse(
+        changed=changed, deleted=deleted, occurrences=occurrences, watermark=watermark, has_more=has_more
+    )
+
+@router.get("/export")
+async def export_user_tasks(
+    export_format: str = Query("ndjson", alias="format", description="Формат: ndjson или csv"),
+    period: Optional[str] = Query(None, description="Фильтр по периоду: day, week, month, custom"),
+    date_from: Optional[date] = Query(None, description="Начало произвольного периода"),
+    date_to: Optional[date] = Query(None, description="Конец произвольного периода (включительно)"),
+    category: Optional[str] = Query(None, description="Фильтр по категории"),
+    completed: Optional[bool] = Query(None, description="Фильтр по статусу выполнения"),
+    today: date = Depends(get_user_today),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Потоковая выгрузка всех задач пользователя в NDJSON или CSV"""
+    task_format = TASK_FORMATS.get(export_format)
+    if task_format is None:
+        raise _bad_request(f"Формат должен быть одним из: {', '.join(TASK_FORMATS)}")
+    try:
+        query = export_tasks_query(
+            current_user.id, period, category, completed,
+            date_from=date_from, date_to=date_to, today=today
+        )
+    except PeriodError as exc:
+        raise _bad_request(str(exc))
+    
+    async def content():
+        # Своя сессия: поток читается уже после выхода из обработчика
+        async with read_session(current_user.id) as session:
+            yield task_format.header()
+            async for rows in stream_tasks(session, query, settings.EXPORT_BATCH_SIZE):
+                yield task_format.encode(rows)
+    
+    filename = f"tasks-{today.isoformat()}.{task_format.name}"
+    return StreamingResponse(
+        content(),
+        media_type=task_format.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def _import_format_name(import_format: Optional[str], file: UploadFile) -> Optional[str]:
+    """Формат импорта: явно указанный или по расширению файла"""
+    if import_format:
+        return import_format
+    extension = (file.filename or "").rsplit(".", 1)[-1].lower()
+    return {"jsonl": "ndjson", "ndjson": "ndjson", "csv": "csv"}.get(extension)
+
+@router.post("/import", response_model=TaskImportResponse)
+async def import_user_tasks(
+    file: UploadFile = File(..., description="Файл NDJSON или CSV (UTF-8)"),
+    import_format: Optional[str] = Query(None, alias="format", description="ndjson или csv; по умолчанию по расширению файла"),
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Импорт задач из файла: валидные строки загружаются, по остальным - отчет"""
+    task_format = TASK_FORMATS.get(_import_format_name(import_format, file))
+    if task_format is None:
+        raise _bad_request(f"Формат должен быть одним из: {', '.join(TASK_FORMATS)}")
+    
+    report = ImportReport(settings.IMPORT_MAX_ERRORS)
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        imported = await import_tasks(
+            db,
+            validated_batches(stream, task_format, report, settings.IMPORT_BATCH_SIZE, settings.IMPORT_MAX_ROWS),
+            current_user.id
+        )
+    except InvalidImportFile as exc:
+        raise _bad_request(str(exc))
+    finally:
+        # Файл закрывает UploadFile, обертка не должна делать это повторно
+        stream.detach()
+    
+    return TaskImportResponse(
+        imported=imported,
+        failed=report.failed,
+        errors=report.errors,
+        errors_truncated=report.failed > len(report.errors)
+    )
+
+def _sse(event: str, data: dict) -> str:
+    """Сообщение Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.get("/stream")
+async def task_change_stream(grant: StreamGrant = Depends(get_stream_user)):
+    """Поток изменений задач пользователя (Server-Sent Events)
+
+    События: ready (версия данных при подключении), created, updated,
+    toggled, deleted, imported и resync - часть событий могла быть потеряна,
+    клиенту нужно перезагрузить данные. Отметка вхождения серии - updated
+    с occurrence_date и cancelled, task - само вхождение. Когда истекает
+    токен, которым открыт поток, приходит expired и поток закрывается:
+    для продолжения нужен новый токен.
+    """
+    current_user = grant.user
+    queue = change_feed.subscribe(current_user.id)
+    
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            yield _sse("ready", {"version": await get_data_version(current_user.id)})
+            while True:
+                remaining = grant.expires_at - time.time()
+                if remaining <= 0:
+                    yield _sse("expired", {})
+                    break
+                try:
+                    payload = await asyncio.wait_for(queue.get(), min(settings.CHANGE_FEED_HEARTBEAT_SECONDS, remaining))
+                except asyncio.TimeoutError:
+                    # Комментарий не дает прокси закрыть неактивное соединение
+                    yield ": ping\n\n"
+                    continue
+                if payload is None:
+                    # Воркер останавливается (ChangeFeed.close_subscribers)
+                    break
+                yield _sse(payload["type"], {key: value for key, value in payload.items() if key != "origin"})
+        finally:
+            change_feed.unsubscribe(current_user.id, queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/{task_id}", response_model=TaskResponse)
 async def get_single_task(
     task_id: int,
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Получение конкретной задачи по ID"""
     task = await get_task(db, task_id, current_user.id)
@@ -95,11 +551,14 @@ async def get_single_task(
 async def update_existing_task(
     task_id: int,
     task_update: TaskUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: UserResponse = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Обновление задачи"""
-    task = await update_task(db, task_id, task_update, current_user.id)
+    try:
+        task = await update_task(db, task_id, task_update, current_user.id)
+    except RecurrenceError as exc:
+        raise _bad_request(str(exc))
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -110,22 +569,74 @@ async def update_existing_task(
 @router.patch("/{task_id}/toggle", response_model=TaskResponse)
 async def toggle_task_status(
     task_id: int,
-    current_user: User = Depends(get_current_user),
+    occurrence_date: Optional[date] = Query(None, description="Вхождение повторяющейся задачи"),
+    current_user: UserResponse = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Переключение статуса выполнения задачи"""
-    task = await toggle_task_completion(db, task_id, current_user.id)
+    """Переключение статуса выполнения задачи или одного вхождения серии"""
+    task = await toggle_task_completion(db, task_id, current_user.id, occurrence_date)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Задача не найдена"
+            detail="Вхождение задачи не найдено" if occurrence_date else "Задача не найдена"
         )
     return task
 
+@router.put("/{task_id}/occurrences/{occurrence_date}", response_model=TaskResponse)
+async def update_task_occurrence(
+    task_id: int,
+    occurrence_date: date,
+    changes: TaskOccurrenceUpdate,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Отметка одного вхождения серии: выполнение или отмена"""
+    occurrence = await update_occurrence(
+        db, task_id, current_user.id, occurrence_date,
+        completed=changes.completed, cancelled=changes.cancelled
+    )
+    if not occurrence:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Вхождение задачи не найдено"
+        )
+    return occurrence
+
+@router.get("/{task_id}/conflicts", response_model=TaskAgendaResponse)
+async def get_task_conflicts(
+    task_id: int,
+    occurrence_date: Optional[date] = Query(None, description="Вхождение повторяющейся задачи"),
+    limit: int = Query(100, ge=1, le=1000, description="Максимум задач в ответе"),
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Задачи, пересекающиеся по времени с задачей (или вхождением серии)"""
+    task = await get_task(db, task_id, current_user.id)
+    if not task:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Задача не найдена"
+        )
+    if task.time_range is None:
+        raise _bad_request("У задачи нет даты")
+    if task.recurrence and occurrence_date is None:
+        raise _bad_request("Для повторяющейся задачи укажите occurrence_date")
+    window = occurrence_time_range(task, occurrence_date)
+    if window is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Вхождение задачи не найдено"
+        )
+    try:
+        tasks = await get_conflicts(db, current_user.id, window, task.id, limit)
+    except PeriodError as exc:
+        raise _bad_request(str(exc))
+    return TaskAgendaResponse(start=window.lower, end=window.upper, tasks=tasks)
+
 @router.delete("/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_existing_task(
     task_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: UserResponse = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Удаление задачи"""
@@ -141,51 +652,48 @@ async def get_tasks_by_category(
     category: str,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    include_total: bool = Query(True, description=INCLUDE_TOTAL_DESCRIPTION),
+    cache_headers: Dict[str, str] = Depends(check_not_modified),
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Получение задач по категории"""
-    tasks, total = await get_tasks(
-        db, current_user.id, skip, limit, category=category
-    )
-    
-    total_pages = (total + limit - 1) // limit
-    current_page = (skip // limit) + 1
+    try:
+        tasks, total, next_cursor = await get_tasks(
+            db, current_user.id, skip, limit, category=category,
+            cursor=cursor, with_total=include_total
+        )
+    except (InvalidCursor, PeriodError) as exc:
+        raise _bad_request(str(exc))
     
-    return TaskListResponse(
-        tasks=tasks,
-        total=total,
-        page=current_page,
-        per_page=limit,
-        total_pages=total_pages
-    )
+    return _list_response(tasks, total, skip, limit, next_cursor, cursor, cache_headers)
 
 @router.get("/period/{period}", response_model=TaskListResponse)
 async def get_tasks_by_period(
     period: str,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    include_total: bool = Query(True, description=INCLUDE_TOTAL_DESCRIPTION),
+    date_from: Optional[date] = Query(None, description="Начало периода custom"),
+    date_to: Optional[date] = Query(None, description="Конец периода custom (включительно)"),
+    today: date = Depends(get_user_today),
+    cache_headers: Dict[str, str] = Depends(check_not_modified),
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Получение задач по периоду"""
-    if period not in ["day", "week", "month"]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Период должен быть: day, week или month"
-        )
-    
-    tasks, total = await get_tasks(
-        db, current_user.id, skip, limit, period=period
-    )
+    if period not in PERIODS:
+        raise _bad_request("Период должен быть: day, week, month или custom")
     
-    total_pages = (total + limit - 1) // limit
-    current_page = (skip // limit) + 1
+    try:
+        tasks, total, next_cursor = await get_tasks(
+            db, current_user.id, skip, limit, period=period,
+            cursor=cursor, with_total=include_total,
+            date_from=date_from, date_to=date_to, today=today
+        )
+    except (InvalidCursor, PeriodError) as exc:
+        raise _bad_request(str(exc))
     
-    return TaskListResponse(
-        tasks=tasks,
-        total=total,
-        page=current_page,
-        per_page=limit,
-        total_pages=total_pages
-    )
+    return _list_response(tasks, total, skip, limit, next_cursor, cursor, cache_headers)
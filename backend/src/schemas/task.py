@@ -1,6 +1,8 @@
-from pydantic import BaseModel, validator
-from typing import Optional
+from pydantic import BaseModel, Field, TypeAdapter, validator
+from typing import Any, Dict, List, Optional
 from datetime import datetime, date, time
+from config import settings
+from src.services.recurrence import format_rule, parse_rule, recurrence_values
 
 class TaskBase(BaseModel):
     title: str
@@ -10,6 +12,8 @@ class TaskBase(BaseModel):
     start_time: Optional[time] = None
     end_time: Optional[time] = None
     category: Optional[str] = None
+    # Правило повторения (подмножество RRULE), например FREQ=WEEKLY;BYDAY=MO,WE
+    recurrence: Optional[str] = None
 
 class TaskCreate(TaskBase):
     @validator('title')
@@ -51,6 +55,16 @@ class TaskCreate(TaskBase):
             if v not in valid_categories:
                 raise ValueError(f'Категория должна быть одной из: {", ".join(valid_categories)}')
         return v
+    
+    @validator('recurrence')
+    def validate_recurrence(cls, v, values):
+        if v:
+            if not values.get('start_date'):
+                raise ValueError('Для повторяющейся задачи нужна дата начала')
+            # Правило проверяется вместе с датой начала (UNTIL не раньше нее),
+            # иначе ошибка возникла бы только при записи
+            return recurrence_values(v, values['start_date'])['recurrence']
+        return None
 
 class TaskUpdate(BaseModel):
     title: Optional[str] = None
@@ -61,6 +75,8 @@ class TaskUpdate(BaseModel):
     end_time: Optional[time] = None
     category: Optional[str] = None
     completed: Optional[bool] = None
+    # Пустая строка превращает серию в разовую задачу
+    recurrence: Optional[str] = None
     
     @validator('title')
     def validate_title(cls, v):
@@ -85,6 +101,16 @@ class TaskUpdate(BaseModel):
             if v not in valid_categories:
                 raise ValueError(f'Категория должна быть одной из: {", ".join(valid_categories)}')
         return v
+    
+    @validator('recurrence')
+    def validate_recurrence(cls, v):
+        if v:
+            return format_rule(parse_rule(v))
+        return v
+
+class TaskImport(TaskCreate):
+    # Статус выполнения переносится из других инструментов
+    completed: bool = False
 
 class TaskResponse(TaskBase):
     id: int
@@ -92,16 +118,49 @@ class TaskResponse(TaskBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
     user_id: int
+    # Дата вхождения серии в списках за период (None - разовая задача или сама серия)
+    occurrence_date: Optional[date] = None
     
     class Config:
         from_attributes = True
 
+class TaskOccurrenceUpdate(BaseModel):
+    completed: Optional[bool] = None
+    # Отмененное вхождение не попадает в списки и статистику
+    cancelled: Optional[bool] = None
+
 class TaskListResponse(BaseModel):
     tasks: list[TaskResponse]
-    total: int
-    page: int
+    # total/total_pages равны None, если подсчет отключен (include_total=false),
+    # page - в режиме курсорной пагинации
+    total: Optional[int] = None
+    page: Optional[int] = None
     per_page: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+# Собранные один раз валидаторы/сериализаторы для быстрого пути ответа
+task_adapter = TypeAdapter(TaskResponse)
+task_list_adapter = TypeAdapter(TaskListResponse)
+
+class TaskOccurrenceResponse(BaseModel):
+    task_id: int
+    occurrence_date: date
+    completed: bool
+    cancelled: bool
+
+class TaskSyncResponse(BaseModel):
+    # Созданные и измененные задачи после водяного знака
+    changed: List[TaskResponse]
+    # id удаленных задач
+    deleted: List[int]
+    # Все отметки вхождений серий из changed: заменяют прежние отметки этих
+    # серий на клиенте (вхождения без отметки не выполнены и не отменены)
+    occurrences: List[TaskOccurrenceResponse] = []
+    # Водяной знак для следующего запроса (since)
+    watermark: int
+    # Изменений больше limit - нужно повторить запрос с новым watermark
+    has_more: bool
 
 class TaskStatsResponse(BaseModel):
     total: int
@@ -109,3 +168,77 @@ class TaskStatsResponse(BaseModel):
     pending: int
     overdue: int
     today: int
+
+class TaskCalendarDay(BaseModel):
+    day: date
+    # Задачи, начинающиеся в этот день
+    total: int
+    completed: int
+    pending: int
+    # Незавершенные задачи, срок которых истек в этот день
+    overdue: int
+
+class TaskCalendarResponse(BaseModel):
+    date_from: date
+    date_to: date
+    # Только дни с задачами
+    days: List[TaskCalendarDay]
+
+class TaskCategoryCount(BaseModel):
+    category: Optional[str] = None
+    total: int
+    completed: int
+    pending: int
+    overdue: int
+
+class TaskCategoryBreakdownResponse(BaseModel):
+    categories: List[TaskCategoryCount]
+
+class TaskAgendaResponse(BaseModel):
+    # Интервал [start, end) в локальном времени пользователя
+    start: datetime
+    end: datetime
+    # Задачи и вхождения серий по времени начала
+    tasks: List[TaskResponse]
+
+class TaskBulkCreate(BaseModel):
+    # Элементы валидируются по одному как TaskCreate, чтобы ошибка в одном
+    # не отклоняла весь пакет
+    tasks: List[Dict[str, Any]] = Field(..., min_length=1, max_length=settings.BULK_MAX_ITEMS)
+
+class TaskBulkUpdate(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=settings.BULK_MAX_ITEMS)
+    changes: TaskUpdate
+
+class TaskBulkToggle(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=settings.BULK_MAX_ITEMS)
+    # None - инвертировать статус каждой задачи
+    completed: Optional[bool] = None
+
+class TaskBulkDelete(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=settings.BULK_MAX_ITEMS)
+
+class TaskBulkItemResult(BaseModel):
+    # index - позиция элемента в запросе на создание
+    index: Optional[int] = None
+    id: Optional[int] = None
+    status: str
+    error: Optional[str] = None
+    task: Optional[TaskResponse] = None
+
+class TaskBulkResponse(BaseModel):
+    results: List[TaskBulkItemResult]
+    succeeded: int
+    failed: int
+
+class TaskImportError(BaseModel):
+    # Номер строки файла (для CSV - с учетом заголовка)
+    line: int
+    error: str
+
+class TaskImportResponse(BaseModel):
+    imported: int
+    failed: int
+    errors: List[TaskImportError]
+    # В errors попадают только первые IMPORT_MAX_ERRORS ошибок
+    errors_truncated: bool = False
@@ -34,5 +34,10 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
+class StreamToken(BaseModel):
+    stream_token: str
+    # Секунд, за которые поток нужно открыть
+    expires_in: int
+
 class TokenData(BaseModel):
     email: Optional[str] = None
@@ -3,6 +3,8 @@ from .auth_service import (
     get_password_hash,
     create_access_token,
     get_user_by_email,
+    get_principal,
+    invalidate_principal,
     create_user,
     authenticate_user
 )
@@ -12,6 +14,8 @@ __all__ = [
     "get_password_hash", 
     "create_access_token",
     "get_user_by_email",
+    "get_principal",
+    "invalidate_principal",
     "create_user",
     "authenticate_user"
 ]
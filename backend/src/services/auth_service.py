@@ -1,15 +1,30 @@
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, event, inspect
 from src.models.models import User
-from src.schemas.user import UserCreate, UserLogin
+from src.schemas.user import UserCreate, UserLogin, UserResponse
+from src.services.cache import create_cache
+from src.services.metrics import register_cache
+from src.services.password_hasher import hashing_pool
+from src.services.read_routing import read_routing
 from config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Кэш пользователей по subject токена (email): снимок без hashed_password
+principal_cache = create_cache(
+    "principal",
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    dump=lambda principal: principal.model_dump(mode="json"),
+    load=UserResponse.model_validate
+)
+register_cache("principal", principal_cache)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Проверка пароля"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -37,9 +52,55 @@ async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
     result = await db.execute(select(User).where(User.email == email))
     return result.scalar_one_or_none()
 
+async def get_principal(db: AsyncSession, email: str, expires_at: Optional[float] = None) -> Optional[UserResponse]:
+    """Получение пользователя для аутентификации запроса (через кэш)
+
+    expires_at - exp токена (unix time): запись в кэше не переживает токен,
+    которым она была заполнена.
+    """
+    async def load() -> Optional[UserResponse]:
+        user = None
+        if await read_routing.use_replica(principal_key(email)):
+            async with read_routing.replica_sessions() as replica_db:
+                user = await get_user_by_email(replica_db, email)
+        # Только что созданная или измененная учетная запись могла еще не
+        # дойти до реплики
+        if user is None or not user.is_active:
+            user = await get_user_by_email(db, email)
+        if user is None or not user.is_active:
+            return None
+        return UserResponse.model_validate(user)
+
+    ttl = None if expires_at is None else expires_at - time.time()
+    return await principal_cache.get_or_set(email, load, ttl=ttl)
+
+def principal_key(email: str) -> tuple:
+    """Ключ закрепления чтений учетной записи за primary (ReadRouting)"""
+    return ("principal", email)
+
+def invalidate_principal(email: str) -> None:
+    """Сброс кэшированного пользователя (смена данных, деактивация, удаление)
+
+    Следующая загрузка читает primary, а не отстающую реплику.
+    """
+    read_routing.note_write(principal_key(email))
+    principal_cache.delete_nowait(email)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_principal(mapper, connection, target):
+    """Инвалидация кэша при изменении пользователя через ORM
+
+    Массовые UPDATE/DELETE в обход ORM должны вызывать invalidate_principal явно.
+    """
+    invalidate_principal(target.email)
+    # При смене email сбрасываем и запись под старым адресом
+    for old_email in inspect(target).attrs.email.history.deleted:
+        invalidate_principal(old_email)
+
 async def create_user(db: AsyncSession, user: UserCreate) -> User:
     """Создание нового пользователя"""
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await hashing_pool.run(get_password_hash, user.password)
     db_user = User(
         name=user.name,
         email=user.email,
@@ -55,6 +116,6 @@ async def authenticate_user(db: AsyncSession, email: str, password: str) -> Opti
     user = await get_user_by_email(db, email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await hashing_pool.run(verify_password, password, user.hashed_password):
         return None
     return user
@@ -0,0 +1,400 @@
+import asyncio
+import logging
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Sequence, Set, Tuple
+from config import settings
+
+logger = logging.getLogger("cache")
+
+
+class TTLCache:
+    """In-process LRU-кэш с ограничением времени жизни записей.
+
+    Рассчитан на использование из одного event loop: операции не блокируют
+    и не требуют синхронизации.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Получение значения по ключу (None/default при промахе или истечении TTL)"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Сохранение значения; ttl ограничивает время жизни сверху значением по умолчанию"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable) -> bool:
+        """Удаление записи из кэша"""
+        return self._data.pop(key, None) is not None
+
+    def clear(self) -> None:
+        """Полная очистка кэша"""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Счетчики попаданий/промахов для мониторинга"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Признак промаха (None - допустимое значение кэша)
+MISSING = object()
+
+
+# Тег данных всех пользователей (пересчет в обход изменений задач)
+ALL_USERS_TAG = "users"
+
+
+def user_tag(user_id: int) -> str:
+    """Тег данных пользователя: его инвалидация сбрасывает все записи с этим тегом"""
+    return f"user:{user_id}"
+
+
+class CacheBackend(ABC):
+    """Хранилище кэша
+
+    Записи хранятся вместе с версиями своих тегов на момент чтения
+    источника; инвалидация тега увеличивает его версию, и записи со старой
+    версией перестают находиться. shared - хранилище общее для всех
+    процессов (инвалидация видна другим воркерам), значения в нем
+    хранятся в JSON. Версии тегов не повторяются и годятся как версии
+    данных (ETag).
+    """
+
+    shared = False
+
+    @abstractmethod
+    async def get(self, key: str, tags: Sequence[str]) -> Tuple[Any, tuple]:
+        """Значение (или MISSING) и текущие версии тегов"""
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float, versions: tuple) -> None:
+        """Сохранение значения с версиями тегов, прочитанными в get"""
+
+    @abstractmethod
+    async def versions(self, tags: Sequence[str]) -> Optional[tuple]:
+        """Текущие версии тегов; None - хранилище недоступно"""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Удаление записи"""
+
+    @abstractmethod
+    async def invalidate(self, tags: Sequence[str]) -> None:
+        """Увеличение версий тегов"""
+
+    def delete_nowait(self, key: str) -> Optional[Awaitable]:
+        """delete из синхронного кода: None - выполнено сразу, иначе операция для запуска в фоне"""
+        return self.delete(key)
+
+    def invalidate_nowait(self, tags: Sequence[str]) -> Optional[Awaitable]:
+        """invalidate из синхронного кода: None - выполнено сразу, иначе операция для запуска в фоне"""
+        return self.invalidate(tags)
+
+    def clear(self) -> None:
+        """Очистка записей процесса (у общего хранилища ничего не делает)"""
+
+    def stats(self) -> dict:
+        return {"size": 0, "maxsize": 0, "evictions": 0}
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Хранилище в памяти процесса на базе TTLCache"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.tag_versions: Dict[str, int] = {}
+
+    async def get(self, key, tags):
+        versions = tuple(self.tag_versions.get(tag, 0) for tag in tags)
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != versions:
+            return MISSING, versions
+        return entry[1], versions
+
+    async def set(self, key, value, ttl, versions):
+        self.entries.set(key, (versions, value), ttl=ttl)
+
+    async def versions(self, tags):
+        return tuple(self.tag_versions.get(tag, 0) for tag in tags)
+
+    async def delete(self, key):
+        self.delete_nowait(key)
+
+    async def invalidate(self, tags):
+        self.invalidate_nowait(tags)
+
+    def delete_nowait(self, key):
+        self.entries.delete(key)
+
+    def invalidate_nowait(self, tags):
+        for tag in tags:
+            self.tag_versions[tag] = self.tag_versions.get(tag, 0) + 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        stats = self.entries.stats()
+        return {"size": stats["size"], "maxsize": stats["maxsize"], "evictions": stats["evictions"]}
+
+
+class RedisCacheBackend(CacheBackend):
+    """Общее хранилище в Redis-совместимом сервере (Redis, Valkey, KeyDB)
+
+    Запись и версии ее тегов читаются одним MGET. Недоступность сервера
+    не ломает запросы: чтение считается промахом, ошибка пишется в лог,
+    устаревание записей ограничено TTL.
+    """
+
+    shared = True
+
+    def __init__(self, client, prefix: str):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str) -> "RedisCacheBackend":
+        try:
+            from redis.asyncio import Redis
+        except ImportError:
+            raise RuntimeError("Для CACHE_URL нужен пакет redis (pip install redis)")
+        return cls(Redis.from_url(url), prefix)
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}:tag:{tag}"
+
+    async def get(self, key, tags):
+        try:
+            values = await self.client.mget([f"{self.prefix}:{key}", *map(self._tag_key, tags)])
+        except Exception as exc:
+            logger.warning("Кэш недоступен: %s", exc)
+            return MISSING, None
+        versions = tuple(int(version or 0) for version in values[1:])
+        if values[0] is None:
+            return MISSING, versions
+        stored_versions, value = json.loads(values[0])
+        if tuple(stored_versions) != versions:
+            return MISSING, versions
+        return value, versions
+
+    async def set(self, key, value, ttl, versions):
+        if versions is None:
+            return
+        try:
+            await self.client.set(
+                f"{self.prefix}:{key}", json.dumps([versions, value]), px=max(int(ttl * 1000), 1)
+            )
+        except Exception as exc:
+            logger.warning("Кэш недоступен: %s", exc)
+
+    async def versions(self, tags):
+        try:
+            values = await self.client.mget(list(map(self._tag_key, tags)))
+        except Exception as exc:
+            logger.warning("Кэш недоступен: %s", exc)
+            return None
+        return tuple(int(version or 0) for version in values)
+
+    async def delete(self, key):
+        try:
+            await self.client.delete(f"{self.prefix}:{key}")
+        except Exception as exc:
+            logger.warning("Кэш недоступен: %s", exc)
+
+    async def invalidate(self, tags):
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for tag in tags:
+                    # Теги не истекают: сброшенная в 0 версия совпала бы со
+                    # старыми записями и выданными ETag (тегов - по одному
+                    # на пользователя)
+                    pipe.incr(self._tag_key(tag))
+                await pipe.execute()
+        except Exception as exc:
+            logger.warning("Кэш недоступен, теги %s не сброшены: %s", list(tags), exc)
+
+
+class Cache:
+    """Кэш с тегами, защитой от одновременных промахов и счетчиками
+
+    get_or_set загружает значение при промахе один раз на ключ в пределах
+    процесса: остальные запросы того же ключа ждут результата первого
+    (single-flight). None не кэшируется. dump/load преобразуют значение в
+    JSON-совместимое и обратно для общего хранилища.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        backend: CacheBackend,
+        ttl: float,
+        dump: Optional[Callable[[Any], Any]] = None,
+        load: Optional[Callable[[Any], Any]] = None
+    ):
+        self.name = name
+        self.backend = backend
+        self.ttl = ttl
+        self.dump = dump if backend.shared else None
+        self.load = load if backend.shared else None
+        self._flights: Dict[str, asyncio.Future] = {}
+        self._background: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @property
+    def shared(self) -> bool:
+        return self.backend.shared
+
+    def _key(self, key: str) -> str:
+        return f"{self.name}:{key}"
+
+    async def get_or_set(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        tags: Sequence[str] = (),
+        ttl: Optional[float] = None
+    ) -> Any:
+        """Значение из кэша или результат loader(); ttl ограничен TTL кэша"""
+        key = self._key(key)
+        value, versions = await self.backend.get(key, tags)
+        if value is not MISSING:
+            self.hits += 1
+            return self.load(value) if self.load else value
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+            # Первый запрос не смог загрузить значение - загружаем сами
+            return await loader()
+
+        self.misses += 1
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        try:
+            value = await loader()
+        except BaseException:
+            flight.cancel()
+            raise
+        finally:
+            del self._flights[key]
+        flight.set_result(value)
+
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if value is not None and ttl > 0:
+            await self.backend.set(key, self.dump(value) if self.dump else value, ttl, versions)
+        return value
+
+    async def versions(self, *tags: str) -> Optional[tuple]:
+        """Текущие версии тегов (None - хранилище недоступно)"""
+        return await self.backend.versions(tags)
+
+    async def delete(self, key: str) -> None:
+        await self.backend.delete(self._key(key))
+
+    async def invalidate(self, *tags: str) -> None:
+        """Сброс всех записей с любым из тегов"""
+        await self.backend.invalidate(tags)
+
+    def _run_soon(self, operation: Awaitable) -> None:
+        task = asyncio.ensure_future(operation)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def delete_nowait(self, key: str) -> None:
+        """delete для синхронного кода (обработчики событий ORM)"""
+        pending = self.backend.delete_nowait(self._key(key))
+        if pending is not None:
+            self._run_soon(pending)
+
+    def invalidate_nowait(self, *tags: str) -> None:
+        """invalidate для синхронного кода (обработчики событий)"""
+        pending = self.backend.invalidate_nowait(tags)
+        if pending is not None:
+            self._run_soon(pending)
+
+    def clear(self) -> None:
+        """Очистка записей процесса"""
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        """Счетчики для мониторинга (формат TTLCache.stats() и coalesced)"""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            **self.backend.stats(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_shared_backends: Dict[str, RedisCacheBackend] = {}
+
+
+def shared_backend(url: str) -> RedisCacheBackend:
+    """Общее хранилище по адресу (одно соединение на адрес в процессе)"""
+    backend = _shared_backends.get(url)
+    if backend is None:
+        backend = RedisCacheBackend.from_url(url, settings.CACHE_KEY_PREFIX)
+        _shared_backends[url] = backend
+    return backend
+
+
+def create_cache(name: str, maxsize: int, ttl: float, dump=None, load=None) -> Cache:
+    """Кэш на хранилище из настроек: CACHE_URL - общий сервер, иначе память процесса"""
+    if not settings.CACHE_URL:
+        return Cache(name, MemoryCacheBackend(maxsize=maxsize, ttl=ttl), ttl)
+    return Cache(name, shared_backend(settings.CACHE_URL), ttl, dump, load)
+
+
+async def close_shared_backends() -> None:
+    """Закрытие соединений с общими хранилищами (при остановке приложения)"""
+    for backend in _shared_backends.values():
+        await backend.client.aclose()
+    _shared_backends.clear()
@@ -0,0 +1,32 @@
+from sqlalchemy import func, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Класс advisory-блокировок журнала изменений (первый ключ двухключевой формы)
+CHANGE_LOCK_CLASS = 7301
+
+
+def _lock(exclusive: bool):
+    return func.pg_advisory_xact_lock if exclusive else func.pg_advisory_xact_lock_shared
+
+
+def user_changes_locked(user_id: int):
+    """Условие WHERE, берущее разделяемую блокировку журнала изменений пользователя
+
+    Подзапрос не зависит от строк и выполняется один раз до чтения таблицы
+    (One-Time Filter), поэтому изменение берет блокировку раньше, чем
+    получает номера change_seq, без отдельного запроса. Чтениям так нельзя:
+    снимок запроса сделан до блокировки и не видит транзакции, коммит
+    которых она дождалась, - они блокируют отдельным запросом.
+    """
+    return select(true()).select_from(_lock(False)(CHANGE_LOCK_CLASS, user_id)).scalar_subquery()
+
+
+async def lock_user_changes(db: AsyncSession, user_id: int, exclusive: bool = False) -> None:
+    """Блокировка журнала изменений пользователя до конца транзакции
+
+    Изменения берут разделяемую блокировку до получения номеров change_seq,
+    синхронизация и пересборка счетчиков - исключительную: она дожидается
+    коммита транзакций, уже получивших номера, и водяной знак не
+    перескакивает через незакоммиченные.
+    """
+    await db.execute(select(_lock(exclusive)(CHANGE_LOCK_CLASS, user_id)))
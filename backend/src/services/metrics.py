@@ -0,0 +1,146 @@
+import bisect
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Границы корзин гистограмм по умолчанию (секунды)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Все созданные метрики по имени
+registry: Dict[str, "Counter | Histogram"] = {}
+
+# Сборщики метрик, вычисляемых в момент выгрузки: функция возвращает
+# кортежи (имя, тип, описание, метки, значение)
+Sample = Tuple[str, str, str, Dict[str, str], float]
+collectors: List[Callable[[], Iterable[Sample]]] = []
+
+
+class Counter:
+    """Монотонно растущий счетчик"""
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self.value = 0
+        registry[name] = self
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def snapshot(self) -> dict:
+        return {"value": self.value}
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (совместима с форматом Prometheus)
+
+    При заданных labelnames значения пишутся в дочерние гистограммы:
+    histogram.labels(method="GET", route="/").observe(0.01)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str = "",
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        labelnames: Sequence[str] = (),
+        register: bool = True
+    ):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self.children: Dict[tuple, "Histogram"] = {}
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        if register:
+            registry[name] = self
+
+    def labels(self, **labels: str) -> "Histogram":
+        key = tuple(str(labels[label]) for label in self.labelnames)
+        child = self.children.get(key)
+        if child is None:
+            child = Histogram(self.name, buckets=self.buckets, register=False)
+            self.children[key] = child
+        return child
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> dict:
+        """Накопительные счетчики по корзинам (ключ - верхняя граница, как le в Prometheus)"""
+        cumulative = {}
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            running += count
+            cumulative["+Inf" if bound == float("inf") else repr(bound)] = running
+        return {"buckets": cumulative, "sum": self.sum, "count": self.count}
+
+
+def register_collector(collector: Callable[[], Iterable[Sample]]) -> Callable[[], Iterable[Sample]]:
+    """Регистрация функции, отдающей метрики на момент выгрузки (можно как декоратор)"""
+    collectors.append(collector)
+    return collector
+
+
+def register_cache(cache_name: str, cache) -> None:
+    """Выгрузка счетчиков кэша (TTLCache.stats() / Cache.stats()) с меткой cache"""
+    def collect():
+        stats = cache.stats()
+        labels = {"cache": cache_name}
+        yield "cache_hits_total", "counter", "Попадания в кэш", labels, stats["hits"]
+        yield "cache_misses_total", "counter", "Промахи кэша", labels, stats["misses"]
+        yield "cache_coalesced_total", "counter", "Промахи, дождавшиеся загрузки другого запроса", labels, stats.get("coalesced", 0)
+        yield "cache_hit_ratio", "gauge", "Доля попаданий в кэш", labels, stats["hit_ratio"]
+        yield "cache_evictions_total", "counter", "Вытеснения из кэша", labels, stats["evictions"]
+        yield "cache_entries", "gauge", "Записей в кэше процесса", labels, stats["size"]
+    register_collector(collect)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _render_histogram(lines: List[str], histogram: Histogram, labels: Dict[str, str]) -> None:
+    snapshot = histogram.snapshot()
+    for bound, count in snapshot["buckets"].items():
+        lines.append(f"{histogram.name}_bucket{_format_labels({**labels, 'le': bound})} {count}")
+    lines.append(f"{histogram.name}_sum{_format_labels(labels)} {snapshot['sum']}")
+    lines.append(f"{histogram.name}_count{_format_labels(labels)} {snapshot['count']}")
+
+
+def render_prometheus() -> str:
+    """Все метрики в текстовом формате Prometheus"""
+    lines: List[str] = []
+    for metric in registry.values():
+        if isinstance(metric, Counter):
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} counter")
+            lines.append(f"{metric.name} {metric.value}")
+            continue
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} histogram")
+        if metric.labelnames:
+            for key, child in metric.children.items():
+                _render_histogram(lines, child, dict(zip(metric.labelnames, key)))
+        else:
+            _render_histogram(lines, metric, {})
+
+    # Метрики сборщиков группируются по имени
+    grouped: Dict[str, Tuple[str, str, List[Tuple[Dict[str, str], float]]]] = {}
+    for collector in collectors:
+        for name, metric_type, description, labels, value in collector():
+            grouped.setdefault(name, (metric_type, description, []))[2].append((labels, value))
+    for name, (metric_type, description, samples) in grouped.items():
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,78 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+from config import settings
+from src.services.metrics import Counter, Histogram
+
+queue_wait_seconds = Histogram(
+    "password_hash_queue_wait_seconds",
+    "Время ожидания задачи хеширования в очереди пула"
+)
+hash_duration_seconds = Histogram(
+    "password_hash_duration_seconds",
+    "Время выполнения bcrypt хеширования/проверки"
+)
+rejected_total = Counter(
+    "password_hash_rejected_total",
+    "Запросы, отклоненные из-за переполнения очереди хеширования"
+)
+
+
+class HashingPoolSaturated(Exception):
+    """Очередь пула хеширования заполнена - запрос нужно повторить позже"""
+
+
+def _timed_call(fn: Callable, *args) -> tuple:
+    """Выполнение функции в воркере с замером момента старта и длительности"""
+    started_at = time.monotonic()
+    result = fn(*args)
+    return result, started_at, time.monotonic() - started_at
+
+
+class HashingPool:
+    """Ограниченный пул для CPU-тяжелых операций bcrypt вне event loop
+
+    Одновременно принимается не больше max_pending операций (выполняемых и
+    ожидающих); сверх лимита run() сразу выбрасывает HashingPoolSaturated.
+    """
+
+    def __init__(self, executor: Executor, max_pending: int):
+        self.executor = executor
+        self.max_pending = max_pending
+        self.pending = 0
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Выполнение fn(*args) в пуле; fn должна быть функцией уровня модуля"""
+        if self.pending >= self.max_pending:
+            rejected_total.inc()
+            raise HashingPoolSaturated()
+
+        self.pending += 1
+        submitted_at = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+            result, started_at, duration = await loop.run_in_executor(
+                self.executor, _timed_call, fn, *args
+            )
+        finally:
+            self.pending -= 1
+
+        queue_wait_seconds.observe(max(started_at - submitted_at, 0.0))
+        hash_duration_seconds.observe(duration)
+        return result
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _create_executor() -> Executor:
+    if settings.PASSWORD_HASH_EXECUTOR == "process":
+        return ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+    return ThreadPoolExecutor(
+        max_workers=settings.PASSWORD_HASH_WORKERS,
+        thread_name_prefix="password-hash"
+    )
+
+
+hashing_pool = HashingPool(_create_executor(), settings.PASSWORD_HASH_MAX_PENDING)
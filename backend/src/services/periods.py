@@ -0,0 +1,99 @@
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from config import settings
+
+PERIODS = ("day", "week", "month", "custom")
+
+# Полуинтервал дат [начало, конец)
+DateRange = Tuple[date, date]
+
+
+class PeriodError(ValueError):
+    """Некорректный период, диапазон дат или часовой пояс"""
+
+
+def _zone(tz: Optional[str]) -> Optional[ZoneInfo]:
+    tz = tz or settings.DEFAULT_TIMEZONE
+    if not tz:
+        return None
+    try:
+        return ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise PeriodError(f"Неизвестный часовой пояс: {tz}")
+
+
+def local_today(tz: Optional[str] = None) -> date:
+    """Текущая дата в часовом поясе пользователя
+
+    Без tz используется settings.DEFAULT_TIMEZONE, а если он не задан -
+    локальная дата сервера.
+    """
+    return local_datetime(None, tz).date()
+
+
+def local_datetime(value: Optional[datetime], tz: Optional[str] = None) -> datetime:
+    """Время без часового пояса в поясе пользователя (как даты и время задач)
+
+    None - текущее время; время с поясом переводится в пояс пользователя
+    (tz, settings.DEFAULT_TIMEZONE или пояс сервера), время без пояса
+    считается уже локальным.
+    """
+    zone = _zone(tz)
+    if value is None:
+        return datetime.now(zone).replace(tzinfo=None)
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(zone).replace(tzinfo=None)
+
+
+def resolve_period(
+    period: Optional[str],
+    today: date,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+) -> Optional[DateRange]:
+    """Преобразование периода в полуинтервал дат [start, end)
+
+    day/week/month отсчитываются от today (неделя начинается с понедельника),
+    custom - от date_from до date_to включительно. Переданные без периода
+    date_from/date_to трактуются как custom. None - фильтр не нужен.
+    Граница за пределами дат datetime (date_to=9999-12-31) - PeriodError.
+    """
+    try:
+        return _period_range(period, today, date_from, date_to)
+    except OverflowError:
+        raise PeriodError("Период выходит за пределы допустимых дат")
+
+
+def _period_range(
+    period: Optional[str],
+    today: date,
+    date_from: Optional[date],
+    date_to: Optional[date]
+) -> Optional[DateRange]:
+    if period is None and (date_from or date_to):
+        period = "custom"
+    if period is None:
+        return None
+
+    if period == "day":
+        return today, today + timedelta(days=1)
+
+    if period == "week":
+        week_start = today - timedelta(days=today.weekday())
+        return week_start, week_start + timedelta(days=7)
+
+    if period == "month":
+        month_start = today.replace(day=1)
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+        return month_start, next_month
+
+    if period == "custom":
+        if not date_from or not date_to:
+            raise PeriodError("Для произвольного периода нужны date_from и date_to")
+        if date_to < date_from:
+            raise PeriodError("date_to не может быть раньше date_from")
+        return date_from, date_to + timedelta(days=1)
+
+    raise PeriodError("Период должен быть: day, week, month или custom")
@@ -0,0 +1,153 @@
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+from config import settings
+from src.services.cache import shared_backend
+
+logger = logging.getLogger("rate_limit")
+
+
+class TokenBucket(NamedTuple):
+    """Лимит: корзина на burst запросов, пополняется на per_minute в минуту"""
+    per_minute: int
+    burst: int
+
+    @property
+    def closed(self) -> bool:
+        """Без пополнения запросы отклоняются, хранилище не вызывается"""
+        return self.per_minute <= 0
+
+    @property
+    def rate(self) -> float:
+        """Пополнение в секунду"""
+        return self.per_minute / 60
+
+
+class RateLimitDecision(NamedTuple):
+    allowed: bool
+    # Целых запросов в корзине после этого
+    remaining: int
+    # Секунд до полной корзины
+    reset_after: int
+    # Секунд до следующего разрешенного запроса (0 - запрос разрешен)
+    retry_after: int
+
+
+# Retry-After для закрытой группы: корзина не пополняется, повтор не поможет
+CLOSED_RETRY_AFTER = 60
+
+
+def closed_decision() -> RateLimitDecision:
+    """Отказ без обращения к хранилищу для лимита с per_minute <= 0 (группа закрыта)"""
+    return RateLimitDecision(allowed=False, remaining=0, reset_after=0, retry_after=CLOSED_RETRY_AFTER)
+
+
+def _decision(limit: TokenBucket, tokens: float, allowed: bool) -> RateLimitDecision:
+    return RateLimitDecision(
+        allowed=allowed,
+        remaining=int(tokens),
+        reset_after=math.ceil((limit.burst - tokens) / limit.rate),
+        retry_after=0 if allowed else math.ceil((1 - tokens) / limit.rate),
+    )
+
+
+class RateLimitBackend(ABC):
+    """Хранилище состояния корзин
+
+    shared - состояние общее для всех процессов (лимит не умножается на
+    число воркеров).
+    """
+
+    shared = False
+
+    @abstractmethod
+    async def take(self, key: str, limit: TokenBucket) -> Optional[RateLimitDecision]:
+        """Взять запрос из корзины ключа (None - хранилище недоступно, запрос пропускается)"""
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Корзины в памяти процесса
+
+    Не больше maxsize ключей: давно не использованные удаляются, и их
+    корзины при следующем запросе снова полные.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key, limit):
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (limit.burst, now))
+        tokens = min(limit.burst, tokens + (now - updated_at) * limit.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return _decision(limit, tokens, allowed)
+
+
+# Пополнение и списание одним атомарным шагом; время - часы сервера, а не
+# воркеров. Запись живет, пока корзина не наполнится снова
+TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or burst
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """Корзины в Redis-совместимом сервере, общие для всех воркеров
+
+    Недоступность сервера не ломает запросы: они пропускаются без
+    ограничения, ошибка пишется в лог.
+    """
+
+    shared = True
+
+    def __init__(self, client, prefix: str):
+        self.prefix = prefix
+        self._take = client.register_script(TAKE_SCRIPT)
+
+    async def take(self, key, limit):
+        try:
+            allowed, tokens = await self._take(keys=[f"{self.prefix}:ratelimit:{key}"], args=[limit.rate, limit.burst])
+        except Exception as exc:
+            logger.warning("Хранилище лимитов недоступно: %s", exc)
+            return None
+        return _decision(limit, float(tokens), bool(allowed))
+
+
+def create_rate_limit_backend() -> RateLimitBackend:
+    """Хранилище из настроек: CACHE_URL - общий сервер (соединение кэшей), иначе память процесса"""
+    if not settings.CACHE_URL:
+        return MemoryRateLimitBackend(maxsize=settings.RATE_LIMIT_MAX_KEYS)
+    return RedisRateLimitBackend(shared_backend(settings.CACHE_URL).client, settings.CACHE_KEY_PREFIX)
+
+
+def configured_limits() -> Dict[str, TokenBucket]:
+    """Лимиты групп маршрутов из настроек"""
+    return {
+        "auth": TokenBucket(settings.RATE_LIMIT_AUTH_PER_MINUTE, settings.RATE_LIMIT_AUTH_BURST),
+        "reads": TokenBucket(settings.RATE_LIMIT_READS_PER_MINUTE, settings.RATE_LIMIT_READS_BURST),
+        "writes": TokenBucket(settings.RATE_LIMIT_WRITES_PER_MINUTE, settings.RATE_LIMIT_WRITES_BURST),
+    }
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+from typing import Dict, Hashable, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from config import settings
+
+logger = logging.getLogger("read_routing")
+
+# Позиция WAL клиента: ответ на изменение несет позицию коммита, клиент
+# возвращает последнюю полученную в следующих запросах
+COMMIT_LSN_HEADER = "X-Commit-LSN"
+READ_AFTER_LSN_HEADER = "X-Read-After-LSN"
+
+# Отставание реплики: 0, если она воспроизвела все полученные изменения
+# (на простаивающем primary время последней транзакции не растет) или не
+# находится в режиме восстановления (отдельный сервер вместо реплики).
+# Позиция воспроизведения WAL - только у реплики в режиме восстановления
+REPLICA_LAG_SQL = text("""
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+END AS lag,
+CASE WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn()::text END AS replay_lsn
+""")
+
+# Позиция WAL primary после коммита: не меньше конца записи коммита
+COMMIT_LSN_SQL = text("SELECT pg_current_wal_lsn()::text")
+
+
+def parse_lsn(value: Optional[str]) -> Optional[int]:
+    """Позиция WAL из текстового вида pg_lsn (16/B374D848); None - некорректная"""
+    if not value:
+        return None
+    high, separator, low = value.strip().partition("/")
+    try:
+        if not separator or len(high) > 8 or len(low) > 8:
+            return None
+        return int(high, 16) << 32 | int(low, 16)
+    except ValueError:
+        return None
+
+
+class RequestPosition:
+    """Позиции WAL текущего HTTP запроса
+
+    read_after - последний коммит клиента (заголовок запроса), реплика
+    используется, только если уже воспроизвела его; commit_lsn - позиция
+    коммита изменений этого запроса для заголовка ответа.
+    """
+
+    __slots__ = ("read_after", "commit_lsn")
+
+    def __init__(self, read_after: Optional[int] = None):
+        self.read_after = read_after
+        self.commit_lsn: Optional[str] = None
+
+    def note_commit(self, lsn: Optional[str]) -> None:
+        position = parse_lsn(lsn)
+        if position is None:
+            return
+        if self.commit_lsn is None or position > parse_lsn(self.commit_lsn):
+            self.commit_lsn = lsn
+        if self.read_after is None or position > self.read_after:
+            self.read_after = position
+
+
+# Позиции текущего запроса (ReadConsistencyMiddleware); изменяемый объект,
+# поэтому изменения видны и из дочерних задач
+current_position: ContextVar[Optional[RequestPosition]] = ContextVar("current_position", default=None)
+
+
+class ReadRouting:
+    """Выбор базы для чтения: реплика или primary (read-your-writes)
+
+    Пользователь читает с primary в течение pin_seconds после своих
+    изменений: о них сообщают task_service после коммита и поток изменений
+    из других воркеров. Ключ закрепления - id пользователя или другой
+    ключ данных (например, учетная запись по email). Закрепления живут в
+    процессе, поэтому клиент еще получает позицию WAL своего коммита
+    (COMMIT_LSN_HEADER) и возвращает ее (READ_AFTER_LSN_HEADER): любой
+    воркер читает с реплики, только если она воспроизвела WAL до этой
+    позиции. Реплика не используется, пока ее отставание больше
+    max_lag_seconds или она недоступна; отставание и позиция
+    воспроизведения проверяются не чаще раза в check_interval секунд
+    (позиция за это время только растет, поэтому прошлая - нижняя оценка).
+    pin_seconds должен быть больше max_lag_seconds.
+    """
+
+    # Выше этого числа закреплений при записи удаляются истекшие
+    PRUNE_THRESHOLD = 10000
+
+    def __init__(self, pin_seconds: float, max_lag_seconds: float, check_interval: float):
+        self.pin_seconds = pin_seconds
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self._pinned_until: Dict[Hashable, float] = {}
+        # Закрепление всех пользователей (потеря событий потока изменений)
+        self._all_pinned_until = 0.0
+        self.replica_ok = True
+        self._checked_at: Optional[float] = None
+        self._check_lock = asyncio.Lock()
+        self.lag_seconds: Optional[float] = None
+        # Воспроизведенная позиция WAL (None - сервер не в режиме восстановления)
+        self.replay_lsn: Optional[int] = None
+        self.reads = {"replica": 0, "primary": 0}
+        self.replica_engine: Optional[AsyncEngine] = None
+        self.replica_sessions = None
+
+    def attach(self, replica_engine: AsyncEngine, replica_sessions) -> None:
+        """Подключение реплики (database.py при заданном DATABASE_REPLICA_URL)"""
+        self.replica_engine = replica_engine
+        self.replica_sessions = replica_sessions
+
+    def note_write(self, key: Optional[Hashable] = None) -> None:
+        """Изменение данных по ключу (None - возможно, любых)"""
+        until = time.monotonic() + self.pin_seconds
+        if key is None:
+            self._all_pinned_until = until
+            return
+        if len(self._pinned_until) > self.PRUNE_THRESHOLD:
+            now = time.monotonic()
+            self._pinned_until = {
+                pinned_key: pinned_until for pinned_key, pinned_until in self._pinned_until.items()
+                if pinned_until > now
+            }
+        self._pinned_until[key] = until
+
+    async def note_commit(self, db: AsyncSession, key: Optional[Hashable] = None) -> None:
+        """Изменение данных по ключу закоммичено в сессии db
+
+        Кроме закрепления, запоминает позицию коммита для заголовка ответа;
+        лишний запрос к primary - только если реплика настроена.
+        """
+        self.note_write(key)
+        position = current_position.get()
+        if self.replica_engine is None or position is None:
+            return
+        position.note_commit(await db.scalar(COMMIT_LSN_SQL))
+
+    def replayed(self, lsn: Optional[int]) -> bool:
+        """Реплика воспроизвела WAL до позиции lsn (по последней проверке)"""
+        return lsn is None or self.replay_lsn is None or self.replay_lsn >= lsn
+
+    def is_pinned(self, key: Optional[Hashable]) -> bool:
+        now = time.monotonic()
+        if now < self._all_pinned_until:
+            return True
+        return key is not None and now < self._pinned_until.get(key, 0.0)
+
+    async def replica_usable(self) -> bool:
+        """Реплика настроена, доступна и отстает не больше max_lag_seconds"""
+        if self.replica_engine is None:
+            return False
+        now = time.monotonic()
+        stale = self._checked_at is None or now - self._checked_at >= self.check_interval
+        # Проверку выполняет один запрос, остальные используют прошлый результат
+        if stale and not self._check_lock.locked():
+            async with self._check_lock:
+                await self._check_replica()
+        return self.replica_ok
+
+    async def _check_replica(self) -> None:
+        try:
+            async with self.replica_engine.connect() as connection:
+                lag, replay_lsn = (await connection.execute(REPLICA_LAG_SQL)).one()
+            self.lag_seconds = float(lag)
+            self.replay_lsn = parse_lsn(replay_lsn)
+            self.replica_ok = self.lag_seconds <= self.max_lag_seconds
+        except Exception as exc:
+            logger.warning("Реплика недоступна: %s", exc)
+            self.lag_seconds = None
+            self.replica_ok = False
+        self._checked_at = time.monotonic()
+
+    async def use_replica(self, key: Optional[Hashable] = None) -> bool:
+        """Читать ли данные по ключу с реплики"""
+        position = current_position.get()
+        replica = (
+            not self.is_pinned(key)
+            and await self.replica_usable()
+            and self.replayed(position.read_after if position is not None else None)
+        )
+        self.reads["replica" if replica else "primary"] += 1
+        return replica
+
+
+read_routing = ReadRouting(
+    settings.REPLICA_PIN_SECONDS,
+    settings.REPLICA_MAX_LAG_SECONDS,
+    settings.REPLICA_LAG_CHECK_SECONDS
+)
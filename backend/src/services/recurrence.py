@@ -0,0 +1,229 @@
+import calendar
+from datetime import date, timedelta
+from typing import Iterator, List, NamedTuple, Optional
+from sqlalchemy import Integer, and_, case, cast, extract, literal
+
+# Поддерживаемое подмножество RRULE (RFC 5545): FREQ, INTERVAL, COUNT,
+# UNTIL и BYDAY (только для WEEKLY, без номеров недель)
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+# Ограничение COUNT: последнее вхождение вычисляется перебором при сохранении
+MAX_COUNT = 1000
+MAX_INTERVAL = 1000
+
+
+class RecurrenceError(ValueError):
+    """Некорректное или неподдерживаемое правило повторения"""
+
+
+class Recurrence(NamedTuple):
+    freq: str
+    interval: int = 1
+    # Битовая маска дней недели (понедельник - бит 0); 0 - день start_date
+    weekdays: int = 0
+    count: Optional[int] = None
+    until: Optional[date] = None
+
+
+def _positive(name: str, value: str, limit: int) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        raise RecurrenceError(f"{name} должен быть целым числом")
+    if not 1 <= number <= limit:
+        raise RecurrenceError(f"{name} должен быть от 1 до {limit}")
+    return number
+
+
+def parse_rule(rule: str) -> Recurrence:
+    """Разбор правила вида FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE;UNTIL=20261231"""
+    parts = {}
+    for part in rule.strip().upper().removeprefix("RRULE:").split(";"):
+        if not part:
+            continue
+        name, separator, value = part.partition("=")
+        if not separator or not value:
+            raise RecurrenceError(f"Некорректная часть правила: {part}")
+        if name in parts:
+            raise RecurrenceError(f"Повторяется параметр {name}")
+        parts[name] = value
+
+    freq = parts.pop("FREQ", None)
+    if freq not in FREQUENCIES:
+        raise RecurrenceError(f"FREQ должен быть одним из: {', '.join(FREQUENCIES)}")
+    interval = _positive("INTERVAL", parts.pop("INTERVAL", "1"), MAX_INTERVAL)
+
+    weekdays = 0
+    if "BYDAY" in parts:
+        if freq != "WEEKLY":
+            raise RecurrenceError("BYDAY поддерживается только для FREQ=WEEKLY")
+        for day in parts.pop("BYDAY").split(","):
+            if day not in WEEKDAYS:
+                raise RecurrenceError(f"Неизвестный день недели: {day}")
+            weekdays |= 1 << WEEKDAYS.index(day)
+
+    count = until = None
+    if "COUNT" in parts and "UNTIL" in parts:
+        raise RecurrenceError("COUNT и UNTIL нельзя указывать вместе")
+    if "COUNT" in parts:
+        count = _positive("COUNT", parts.pop("COUNT"), MAX_COUNT)
+    if "UNTIL" in parts:
+        value = parts.pop("UNTIL")
+        try:
+            # Время в UNTIL не используется: вхождения - целые дни
+            until = date(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+        except ValueError:
+            raise RecurrenceError("UNTIL должен быть датой в формате YYYYMMDD")
+
+    if parts:
+        raise RecurrenceError(f"Неподдерживаемые параметры: {', '.join(parts)}")
+    return Recurrence(freq, interval, weekdays, count, until)
+
+
+def format_rule(recurrence: Recurrence) -> str:
+    """Каноническая запись правила"""
+    parts = [f"FREQ={recurrence.freq}"]
+    if recurrence.interval != 1:
+        parts.append(f"INTERVAL={recurrence.interval}")
+    if recurrence.weekdays:
+        days = [day for bit, day in enumerate(WEEKDAYS) if recurrence.weekdays & (1 << bit)]
+        parts.append(f"BYDAY={','.join(days)}")
+    if recurrence.count is not None:
+        parts.append(f"COUNT={recurrence.count}")
+    if recurrence.until is not None:
+        parts.append(f"UNTIL={recurrence.until.strftime('%Y%m%d')}")
+    return ";".join(parts)
+
+
+def _weekday_mask(recurrence: Recurrence, dtstart: date) -> int:
+    return recurrence.weekdays or 1 << dtstart.weekday()
+
+
+def _months_between(start: date, day: date) -> int:
+    return (day.year - start.year) * 12 + day.month - start.month
+
+
+def occurs_on(recurrence: Recurrence, dtstart: date, day: date) -> bool:
+    """Попадает ли день на правило без учета COUNT/UNTIL (то же условие, что occurrence_condition)"""
+    if day < dtstart:
+        return False
+    if recurrence.freq == "DAILY":
+        return (day - dtstart).days % recurrence.interval == 0
+    if recurrence.freq == "WEEKLY":
+        weeks = ((day - timedelta(days=day.weekday())) - (dtstart - timedelta(days=dtstart.weekday()))).days // 7
+        return bool(_weekday_mask(recurrence, dtstart) & (1 << day.weekday())) and weeks % recurrence.interval == 0
+    if recurrence.freq == "MONTHLY":
+        return day.day == dtstart.day and _months_between(dtstart, day) % recurrence.interval == 0
+    return (
+        (day.month, day.day) == (dtstart.month, dtstart.day)
+        and (day.year - dtstart.year) % recurrence.interval == 0
+    )
+
+
+def _period_candidates(recurrence: Recurrence, dtstart: date, period: int) -> List[date]:
+    """Дни правила в period-м периоде (дне, неделе, месяце, годе) от dtstart"""
+    if recurrence.freq == "DAILY":
+        return [dtstart + timedelta(days=period * recurrence.interval)]
+    if recurrence.freq == "WEEKLY":
+        week_start = dtstart - timedelta(days=dtstart.weekday()) + timedelta(weeks=period * recurrence.interval)
+        mask = _weekday_mask(recurrence, dtstart)
+        days = []
+        for bit in range(7):
+            if mask & (1 << bit):
+                try:
+                    days.append(week_start + timedelta(days=bit))
+                except OverflowError:
+                    break
+        if not days:
+            raise OverflowError("date value out of range")
+        return days
+    months = period * recurrence.interval * (12 if recurrence.freq == "YEARLY" else 1)
+    year, month = divmod(dtstart.month - 1 + months, 12)
+    year += dtstart.year
+    if year > date.max.year:
+        raise OverflowError("date value out of range")
+    if dtstart.day > calendar.monthrange(year, month + 1)[1]:
+        return []
+    return [date(year, month + 1, dtstart.day)]
+
+
+def iter_occurrences(recurrence: Recurrence, dtstart: date) -> Iterator[date]:
+    """Даты вхождений по возрастанию с учетом COUNT/UNTIL
+
+    Как и в RFC 5545, несуществующие даты (31 число, 29 февраля)
+    пропускаются, а не переносятся. Вхождения после date.max не
+    существуют: перебор на них заканчивается.
+    """
+    emitted = 0
+    period = 0
+    while True:
+        try:
+            candidates = _period_candidates(recurrence, dtstart, period)
+        except OverflowError:
+            return
+        for day in candidates:
+            if day < dtstart:
+                continue
+            if recurrence.until is not None and day > recurrence.until:
+                return
+            yield day
+            emitted += 1
+            if recurrence.count is not None and emitted >= recurrence.count:
+                return
+        period += 1
+
+
+def recurrence_values(rule: Optional[str], dtstart: Optional[date]) -> dict:
+    """Колонки задачи, производные от правила: по ним вхождения разворачиваются в SQL"""
+    if not rule:
+        return {
+            "recurrence": None,
+            "recurrence_freq": None,
+            "recurrence_interval": None,
+            "recurrence_weekdays": None,
+            "recurrence_end": None,
+        }
+    if dtstart is None:
+        raise RecurrenceError("Для повторяющейся задачи нужна дата начала")
+    recurrence = parse_rule(rule)
+    end = recurrence.until
+    if recurrence.count is not None:
+        end = None
+        for end in iter_occurrences(recurrence, dtstart):
+            pass
+    if end is not None and end < dtstart:
+        raise RecurrenceError("UNTIL не может быть раньше даты начала")
+    return {
+        "recurrence": format_rule(recurrence),
+        "recurrence_freq": recurrence.freq,
+        "recurrence_interval": recurrence.interval,
+        "recurrence_weekdays": _weekday_mask(recurrence, dtstart),
+        "recurrence_end": end,
+    }
+
+
+def occurrence_condition(series, day):
+    """SQL условие: день day - вхождение серии (колонки series - как у tasks)"""
+    start = series.start_date
+    interval = series.recurrence_interval
+    day_dow = cast(extract("isodow", day), Integer)
+    start_dow = cast(extract("isodow", start), Integer)
+    # Недели между понедельниками недель вхождения и начала
+    weeks_apart = ((day - day_dow) - (start - start_dow)) // 7
+    years_apart = cast(extract("year", day) - extract("year", start), Integer)
+    months_apart = years_apart * 12 + cast(extract("month", day) - extract("month", start), Integer)
+    same_day_of_month = extract("day", day) == extract("day", start)
+    return case(
+        (series.recurrence_freq == "DAILY", (day - start) % interval == 0),
+        (series.recurrence_freq == "WEEKLY", and_(
+            series.recurrence_weekdays.op("&")(literal(1).op("<<")(day_dow - 1)) != 0,
+            weeks_apart % interval == 0
+        )),
+        (series.recurrence_freq == "MONTHLY", and_(same_day_of_month, months_apart % interval == 0)),
+        else_=and_(
+            same_day_of_month,
+            extract("month", day) == extract("month", start),
+            years_apart % interval == 0
+        )
+    )
@@ -0,0 +1,168 @@
+from datetime import date
+from typing import List, Optional
+from sqlalchemy import and_, case, delete, func, insert, literal, not_, or_, select, text, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.models.models import Task, TaskDayCount
+from src.services.change_locks import lock_user_changes
+from src.services.periods import DateRange
+from src.services.task_service import invalidate_data, publish_data_reset
+
+
+def _day_range_condition(date_range: Optional[DateRange]):
+    """Фильтр счетчиков по дню в полуинтервале [start, end)"""
+    if date_range is None:
+        return None
+    start, end = date_range
+    return and_(TaskDayCount.day >= start, TaskDayCount.day < end)
+
+
+def _counts(today: date):
+    """Суммы счетчиков: total, completed, overdue (незавершенные с концом до today)"""
+    return (
+        func.coalesce(func.sum(TaskDayCount.total), 0).label("total"),
+        func.coalesce(func.sum(TaskDayCount.completed), 0).label("completed"),
+        func.coalesce(
+            func.sum(TaskDayCount.due_pending).filter(TaskDayCount.day < today), 0
+        ).label("overdue"),
+    )
+
+
+def _with_pending(row) -> dict:
+    counts = dict(row)
+    counts["pending"] = counts["total"] - counts["completed"]
+    return counts
+
+
+async def get_calendar(
+    db: AsyncSession,
+    user_id: int,
+    date_range: DateRange,
+    today: date,
+    category: Optional[str] = None
+) -> List[dict]:
+    """Счетчики задач по дням периода для календаря (только непустые дни)
+
+    total/completed/pending - задачи, начинающиеся в этот день, overdue -
+    незавершенные задачи, срок которых истек в этот день.
+    """
+    conditions = [TaskDayCount.user_id == user_id, _day_range_condition(date_range)]
+    if category:
+        conditions.append(TaskDayCount.category == category)
+
+    total, completed, overdue = _counts(today)
+    query = (
+        select(TaskDayCount.day, total, completed, overdue)
+        .where(and_(*conditions))
+        .group_by(TaskDayCount.day)
+        .having(or_(func.sum(TaskDayCount.total) != 0, overdue != 0))
+        .order_by(TaskDayCount.day)
+    )
+    result = await db.execute(query)
+    return [_with_pending(row) for row in result.mappings().all()]
+
+
+async def get_category_breakdown(
+    db: AsyncSession,
+    user_id: int,
+    date_range: Optional[DateRange],
+    today: date
+) -> List[dict]:
+    """Счетчики задач по категориям
+
+    total/completed/pending - задачи, начинающиеся в периоде (без периода -
+    все, включая задачи без даты), overdue - незавершенные задачи со сроком
+    в периоде, истекшим до today.
+    """
+    conditions = [TaskDayCount.user_id == user_id]
+    if date_range is not None:
+        conditions.append(_day_range_condition(date_range))
+
+    total, completed, overdue = _counts(today)
+    query = (
+        select(TaskDayCount.category, total, completed, overdue)
+        .where(and_(*conditions))
+        .group_by(TaskDayCount.category)
+        .having(or_(func.sum(TaskDayCount.total) != 0, overdue != 0))
+        .order_by(TaskDayCount.category.nulls_last())
+    )
+    result = await db.execute(query)
+    return [_with_pending(row) for row in result.mappings().all()]
+
+
+def expected_counts(user_id: Optional[int] = None):
+    """Счетчики, вычисленные по таблице tasks (как их ведут триггеры)"""
+    user_condition = Task.user_id == user_id if user_id is not None else literal(True)
+    pending = not_(func.coalesce(Task.completed, False))
+    starts = select(
+        Task.user_id,
+        Task.start_date.label("day"),
+        Task.category,
+        literal(1).label("total"),
+        case((pending, 0), else_=1).label("completed"),
+        literal(0).label("due_pending"),
+    ).where(user_condition)
+    dues = select(
+        Task.user_id, Task.end_date, Task.category, literal(0), literal(0), literal(1)
+    ).where(and_(user_condition, Task.end_date.isnot(None), pending))
+    rows = union_all(starts, dues).subquery()
+    return select(
+        rows.c.user_id,
+        rows.c.day,
+        rows.c.category,
+        func.sum(rows.c.total).label("total"),
+        func.sum(rows.c.completed).label("completed"),
+        func.sum(rows.c.due_pending).label("due_pending"),
+    ).group_by(rows.c.user_id, rows.c.day, rows.c.category).subquery("expected")
+
+
+async def find_rollup_mismatches(db: AsyncSession, user_id: Optional[int] = None) -> List[dict]:
+    """Расхождения счетчиков с таблицей tasks (нулевые строки не считаются)"""
+    expected = expected_counts(user_id)
+    actual = select(TaskDayCount).where(
+        TaskDayCount.user_id == user_id if user_id is not None else literal(True)
+    ).subquery("actual")
+    key_matches = and_(
+        expected.c.user_id == actual.c.user_id,
+        expected.c.day.isnot_distinct_from(actual.c.day),
+        expected.c.category.isnot_distinct_from(actual.c.category),
+    )
+    columns = ("total", "completed", "due_pending")
+    query = select(
+        func.coalesce(expected.c.user_id, actual.c.user_id).label("user_id"),
+        func.coalesce(expected.c.day, actual.c.day).label("day"),
+        func.coalesce(expected.c.category, actual.c.category).label("category"),
+        *(func.coalesce(expected.c[name], 0).label(f"expected_{name}") for name in columns),
+        *(func.coalesce(actual.c[name], 0).label(f"actual_{name}") for name in columns),
+    ).select_from(
+        expected.outerjoin(actual, key_matches, full=True)
+    ).where(or_(*(
+        func.coalesce(expected.c[name], 0) != func.coalesce(actual.c[name], 0) for name in columns
+    ))).order_by("user_id", "day", "category")
+    result = await db.execute(query)
+    return [dict(row) for row in result.mappings().all()]
+
+
+async def rebuild_rollups(db: AsyncSession, user_id: Optional[int] = None) -> int:
+    """Пересборка счетчиков по таблице tasks, возвращает число строк
+
+    На время пересборки изменения задач блокируются: для одного пользователя -
+    его advisory-блокировкой изменений, для всех - блокировкой таблицы tasks.
+    Нулевые строки, оставшиеся после удалений, при этом исчезают.
+    Версии данных (ETag календаря и категорий) и кэши сбрасываются.
+    """
+    if user_id is not None:
+        await lock_user_changes(db, user_id, exclusive=True)
+        await db.execute(delete(TaskDayCount).where(TaskDayCount.user_id == user_id))
+    else:
+        await db.execute(text("LOCK TABLE tasks IN SHARE MODE"))
+        await db.execute(delete(TaskDayCount))
+
+    expected = expected_counts(user_id)
+    columns = ("user_id", "day", "category", "total", "completed", "due_pending")
+    result = await db.execute(
+        insert(TaskDayCount).from_select(columns, select(*(expected.c[name] for name in columns)))
+    )
+    await publish_data_reset(db, user_id)
+    await db.commit()
+    await invalidate_data(db, user_id)
+    return result.rowcount
@@ -0,0 +1,69 @@
+import re
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+from sqlalchemy import and_, bindparam, func, literal_column, select, RowMapping
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.models.models import Task, TASK_COLUMNS, TASK_SEARCH_VECTOR_SQL
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Разбиение текста на слова в нижнем регистре"""
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+class SearchBackend(ABC):
+    """Интерфейс поискового бэкенда задач"""
+
+    @abstractmethod
+    async def search(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        search_query: str,
+        skip: int,
+        limit: int,
+        with_total: bool
+    ) -> Tuple[List[RowMapping], Optional[int]]:
+        """Поиск задач пользователя (строки-словари), упорядоченных по релевантности
+
+        Каждое слово запроса ищется как префикс слов названия/описания.
+        """
+
+
+class PostgresSearchBackend(SearchBackend):
+    """Полнотекстовый поиск Postgres по GIN-индексу ix_tasks_search"""
+
+    def __init__(self):
+        # Выражение должно совпадать с индексом, иначе индекс не используется
+        self.vector = literal_column(f"({TASK_SEARCH_VECTOR_SQL})")
+
+    async def search(self, db, user_id, search_query, skip, limit, with_total):
+        tokens = tokenize(search_query)
+        if not tokens:
+            return [], 0 if with_total else None
+
+        # Префиксный поиск каждого слова: "слово1:* & слово2:*"
+        ts_query = func.to_tsquery(
+            literal_column("'simple'"),
+            bindparam("ts_query", " & ".join(f"{token}:*" for token in tokens))
+        )
+        condition = and_(Task.user_id == user_id, self.vector.op("@@")(ts_query))
+
+        query = select(*TASK_COLUMNS).where(condition).order_by(
+            func.ts_rank(self.vector, ts_query).desc(),
+            Task.created_at.desc(),
+            Task.id.desc()
+        ).offset(skip).limit(limit)
+        result = await db.execute(query)
+        tasks = result.mappings().all()
+
+        total = None
+        if with_total:
+            count_result = await db.execute(select(func.count(Task.id)).where(condition))
+            total = count_result.scalar()
+        return tasks, total
+
+
+search_backend = PostgresSearchBackend()
@@ -0,0 +1,239 @@
+import asyncio
+import json
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Set
+import asyncpg
+from sqlalchemy import CTE, Text, case, cast, event, func, literal, literal_column, null, select
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from src.schemas.task import TaskResponse, task_adapter
+from src.services.metrics import Counter, register_collector
+from config import settings
+
+logger = logging.getLogger("task_events")
+
+# Канал NOTIFY с изменениями задач всех пользователей
+CHANNEL = "task_changes"
+# Payload NOTIFY ограничен 8000 байт; больше - событие без данных задачи
+MAX_PAYLOAD_BYTES = 7900
+# Ключ session.info с событиями, ожидающими коммита (локальная доставка)
+PENDING_KEY = "pending_task_events"
+
+events_total = Counter("task_events_total", "События изменений задач, доставленные подписчикам процесса")
+dropped_total = Counter("task_events_dropped_total", "Переполнения очереди подписчика (клиент получает resync)")
+
+
+def change_event(
+    change: str,
+    user_id: int,
+    origin: str,
+    task_ids: Iterable[int] = (),
+    task=None,
+    **extra
+) -> dict:
+    """Событие изменения задач пользователя
+
+    change - created/updated/toggled/deleted/imported; task - задача для
+    событий об одной задаче, клиент может применить ее без перезапроса.
+    origin - id процесса, выполнившего изменение.
+    """
+    payload = {"type": change, "user_id": user_id, "task_ids": list(task_ids), "origin": origin, **extra}
+    if task is not None:
+        payload["task"] = task_adapter.dump_python(task_adapter.validate_python(task), mode="json")
+    return payload
+
+
+def _task_json(columns):
+    """Задача из строки RETURNING в виде jsonb с полями TaskResponse"""
+    fields = []
+    for name in TaskResponse.model_fields:
+        fields += [literal_column(f"'{name}'"), columns[name] if name in columns else null()]
+    return func.jsonb_build_object(*fields)
+
+
+class ChangeFeed:
+    """Рассылка изменений задач подписчикам (SSE) всех воркеров
+
+    События публикуются через pg_notify в транзакции изменения (доставляются
+    только после коммита) и принимаются каждым процессом на выделенном
+    соединении LISTEN. Пока LISTEN не подключен, события доставляются
+    внутри процесса после коммита сессии. При потере соединения LISTEN подписчики и
+    обработчики получают событие resync: часть изменений могла быть пропущена.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self.handlers: List[Callable[[dict], None]] = []
+        self.connection: Optional[asyncpg.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def listening(self) -> bool:
+        return self.connection is not None and not self.connection.is_closed()
+
+    def add_handler(self, handler: Callable[[dict], None]) -> Callable[[dict], None]:
+        """Обработчик каждого события процесса (можно использовать как декоратор)"""
+        self.handlers.append(handler)
+        return handler
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue) -> None:
+        queues = self.subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[user_id]
+
+    def close_subscribers(self) -> None:
+        """Завершение потоков процесса при остановке воркера
+
+        В очередь подписчиков ставится None: поток закрывается, и клиент
+        переподключается к другому воркеру, не дожидаясь таймаута остановки.
+        """
+        for queues in self.subscribers.values():
+            for queue in queues:
+                while queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    def dispatch(self, payload: dict) -> None:
+        """Доставка события обработчикам и подписчикам пользователя"""
+        for handler in self.handlers:
+            handler(payload)
+        if payload["type"] == "resync":
+            targets = [queue for queues in self.subscribers.values() for queue in queues]
+        else:
+            targets = list(self.subscribers.get(payload["user_id"], ()))
+        for queue in targets:
+            events_total.inc()
+            try:
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                # Медленный клиент: вместо накопленных событий - один resync
+                dropped_total.inc()
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync"})
+
+    async def publish(self, db: AsyncSession, payload: dict) -> None:
+        """Публикация события отдельным запросом в транзакции сессии (до коммита)"""
+        data = json.dumps(payload, ensure_ascii=False)
+        if len(data.encode()) > MAX_PAYLOAD_BYTES:
+            data = json.dumps({key: value for key, value in payload.items() if key != "task"})
+        await db.execute(select(func.pg_notify(CHANNEL, data)))
+        if not self.listening:
+            self._deliver_locally(db, payload)
+
+    def notify_cte(self, changed: CTE, payload: dict, task_ids=None, with_task: bool = False) -> CTE:
+        """CTE, публикующий событие в том же запросе, что и изменение
+
+        changed - CTE изменения с RETURNING; событие отправляется, только
+        если оно вернуло строки. payload - постоянная часть события,
+        task_ids - колонка changed, из которой собирается список id,
+        with_task - добавить измененную задачу (изменение одной задачи).
+        Колонка payload CTE - текст события для published.
+        """
+        data = literal(payload, JSONB)
+        if task_ids is not None:
+            data = data.op("||")(func.jsonb_build_object(literal_column("'task_ids'"), func.jsonb_agg(task_ids)))
+        if with_task:
+            data = data.op("||")(func.jsonb_build_object(
+                literal_column("'task'"), func.jsonb_agg(_task_json(changed.c)).op("->")(0)
+            ))
+        text = case(
+            (func.octet_length(cast(data, Text)) > MAX_PAYLOAD_BYTES, cast(data.op("-")(literal_column("'task'")), Text)),
+            else_=cast(data, Text)
+        )
+        event_data = select(text.label("payload")).select_from(changed).having(func.count() > 0).subquery("event_data")
+        return select(
+            event_data.c.payload,
+            func.pg_notify(CHANNEL, event_data.c.payload).label("notified")
+        ).cte("change_event")
+
+    def published(self, db: AsyncSession, data: str) -> None:
+        """Событие, отправленное запросом с notify_cte (data - колонка payload)"""
+        if not self.listening:
+            self._deliver_locally(db, json.loads(data))
+
+    def _deliver_locally(self, db: AsyncSession, payload: dict) -> None:
+        """Нет LISTEN в этом процессе - доставка своим подписчикам после коммита"""
+        db.sync_session.info.setdefault(PENDING_KEY, []).append(payload)
+
+    def _on_notify(self, connection, pid, channel, data) -> None:
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            logger.warning("Некорректное событие в канале %s", channel)
+            return
+        self.dispatch(payload)
+
+    async def start(self, url: str) -> None:
+        """Запуск фонового LISTEN с переподключением"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen(url))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self, url: str) -> None:
+        dsn = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        delay = 1.0
+        connected_before = False
+        while True:
+            try:
+                connection = await asyncpg.connect(dsn)
+                try:
+                    closed = asyncio.Event()
+                    connection.add_termination_listener(lambda _: closed.set())
+                    await connection.add_listener(CHANNEL, self._on_notify)
+                    self.connection = connection
+                    delay = 1.0
+                    if connected_before:
+                        self.dispatch({"type": "resync"})
+                    connected_before = True
+                    await closed.wait()
+                finally:
+                    self.connection = None
+                    if not connection.is_closed():
+                        await connection.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Соединение LISTEN %s недоступно: %s", CHANNEL, exc)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+
+change_feed = ChangeFeed(queue_size=settings.CHANGE_FEED_QUEUE_SIZE)
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_pending(session: Session) -> None:
+    for payload in session.info.pop(PENDING_KEY, ()):
+        change_feed.dispatch(payload)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
+
+
+@register_collector
+def _collect_subscribers():
+    yield (
+        "task_events_subscribers", "gauge", "Открытые потоки изменений задач", {},
+        sum(len(queues) for queues in change_feed.subscribers.values())
+    )
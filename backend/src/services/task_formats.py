@@ -0,0 +1,181 @@
+import csv
+import io
+import json
+from abc import ABC, abstractmethod
+from itertools import islice
+from typing import AsyncGenerator, Dict, Iterator, List, Optional, TextIO, Tuple
+from pydantic import ValidationError
+from sqlalchemy import RowMapping
+from starlette.concurrency import run_in_threadpool
+from src.schemas.task import TaskImport, TaskImportError, TaskResponse, task_adapter
+
+# Колонки выгрузки - поля TaskResponse в порядке объявления
+TASK_FIELDS = tuple(TaskResponse.model_fields)
+
+# Разобранная запись файла импорта: номер строки, поля, ошибка разбора
+ParsedRecord = Tuple[int, Optional[dict], Optional[str]]
+
+
+class InvalidImportFile(ValueError):
+    """Файл импорта нельзя обработать целиком (формат, кодировка, размер)"""
+
+
+class TaskFormat(ABC):
+    """Формат файла выгрузки задач"""
+
+    name = ""
+    media_type = ""
+
+    def header(self) -> bytes:
+        """Начало файла перед первой пачкой строк"""
+        return b""
+
+    @abstractmethod
+    def encode(self, rows: List[RowMapping]) -> bytes:
+        """Сериализация пачки строк задач"""
+
+    @abstractmethod
+    def parse(self, stream: TextIO) -> Iterator[ParsedRecord]:
+        """Построчный разбор файла импорта"""
+
+
+class NDJSONFormat(TaskFormat):
+    """Одна задача - одна JSON строка"""
+
+    name = "ndjson"
+    media_type = "application/x-ndjson"
+
+    def encode(self, rows):
+        return b"".join(
+            task_adapter.dump_json(task_adapter.validate_python(row)) + b"\n"
+            for row in rows
+        )
+
+    def parse(self, stream):
+        for line, text in enumerate(stream, start=1):
+            if not text.strip():
+                continue
+            try:
+                record = json.loads(text)
+            except ValueError:
+                yield line, None, "Некорректный JSON"
+                continue
+            if isinstance(record, dict):
+                yield line, record, None
+            else:
+                yield line, None, "Ожидался JSON объект"
+
+
+class CSVFormat(TaskFormat):
+    """CSV с заголовком; пустое значение - NULL, даты в ISO 8601"""
+
+    name = "csv"
+    media_type = "text/csv; charset=utf-8"
+
+    def header(self):
+        return self._write([TASK_FIELDS])
+
+    def encode(self, rows):
+        return self._write(
+            [self._cell(value) for value in task_adapter.dump_python(
+                task_adapter.validate_python(row), mode="json"
+            ).values()]
+            for row in rows
+        )
+
+    def parse(self, stream):
+        reader = csv.DictReader(stream)
+        if reader.fieldnames is None:
+            return
+        if "title" not in reader.fieldnames:
+            raise InvalidImportFile("В заголовке CSV нет колонки title")
+        for record in reader:
+            # Пустая ячейка - значение по умолчанию; лишние ячейки без
+            # заголовка (ключ None) отбрасываются
+            yield reader.line_num, {
+                key: value for key, value in record.items()
+                if key is not None and value != ""
+            }, None
+
+    @staticmethod
+    def _cell(value) -> str:
+        if value is None:
+            return ""
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        return str(value)
+
+    @staticmethod
+    def _write(records) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(records)
+        return buffer.getvalue().encode()
+
+
+TASK_FORMATS: Dict[str, TaskFormat] = {
+    task_format.name: task_format for task_format in (NDJSONFormat(), CSVFormat())
+}
+
+
+class ImportReport:
+    """Итог импорта: счетчики и первые max_errors ошибок"""
+
+    def __init__(self, max_errors: int):
+        self.max_errors = max_errors
+        self.rows = 0
+        self.failed = 0
+        self.errors: List[TaskImportError] = []
+
+    def add_error(self, line: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(TaskImportError(line=line, error=error))
+
+
+def _validate_batch(
+    records: Iterator[ParsedRecord],
+    batch_size: int,
+    report: ImportReport,
+    max_rows: int
+) -> Tuple[List[TaskImport], bool]:
+    """Разбор и валидация следующей пачки записей; второй элемент - файл дочитан"""
+    tasks = []
+    consumed = 0
+    try:
+        for line, record, error in islice(records, batch_size):
+            consumed += 1
+            report.rows += 1
+            if report.rows > max_rows:
+                raise InvalidImportFile(f"В файле больше {max_rows} строк")
+            if error is not None:
+                report.add_error(line, error)
+                continue
+            try:
+                tasks.append(TaskImport.model_validate(record))
+            except ValidationError as exc:
+                report.add_error(line, "; ".join(err["msg"] for err in exc.errors()))
+    except UnicodeDecodeError:
+        raise InvalidImportFile("Файл должен быть в кодировке UTF-8")
+    except csv.Error as exc:
+        raise InvalidImportFile(f"Некорректный CSV: {exc}")
+    return tasks, consumed < batch_size
+
+
+async def validated_batches(
+    stream: TextIO,
+    task_format: TaskFormat,
+    report: ImportReport,
+    batch_size: int,
+    max_rows: int
+) -> AsyncGenerator[List[TaskImport], None]:
+    """Пачки валидных задач из файла импорта
+
+    Чтение файла и валидация - синхронная работа, поэтому каждая пачка
+    обрабатывается в пуле потоков; невалидные строки попадают в report.
+    """
+    records = task_format.parse(stream)
+    finished = False
+    while not finished:
+        tasks, finished = await run_in_threadpool(_validate_batch, records, batch_size, report, max_rows)
+        if tasks:
+            yield tasks
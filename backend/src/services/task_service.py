@@ -1,26 +1,257 @@
+import asyncio
+import base64
+import json
+from uuid import uuid4
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_, func, desc
-from sqlalchemy.orm import selectinload
-from typing import List, Optional, Tuple
+from sqlalchemy import select, insert, update, delete, and_, or_, not_, true, func, desc, case, cast, column, literal, null, union_all, values, Date, CTE, RowMapping, Select
+from sqlalchemy.dialects.postgresql import TSRANGE, Range, insert as pg_insert
+from sqlalchemy.orm import aliased, selectinload
+from typing import AsyncGenerator, AsyncIterator, Dict, List, Optional, Tuple
 from datetime import date, datetime, timedelta
-from src.models.models import Task, User
-from src.schemas.task import TaskCreate, TaskUpdate
+from src.models.models import Task, TaskOccurrence, TaskTombstone, User, TASK_COLUMNS
+from src.schemas.task import TaskCreate, TaskImport, TaskUpdate
+from src.services.cache import ALL_USERS_TAG, create_cache, user_tag
+from src.services.change_locks import lock_user_changes, user_changes_locked
+from src.services.metrics import register_cache
+from src.services.periods import DateRange, PeriodError, resolve_period
+from src.services.read_routing import read_routing
+from src.services.recurrence import occurrence_condition, occurs_on, parse_rule, recurrence_values
+from src.services.search import search_backend
+from src.services.task_events import change_event, change_feed
+from config import settings
 
-async def create_task(db: AsyncSession, task: TaskCreate, user_id: int) -> Task:
-    """Создание новой задачи"""
-    db_task = Task(
-        title=task.title,
-        description=task.description,
-        start_date=task.start_date,
-        end_date=task.end_date,
-        start_time=task.start_time,
-        end_time=task.end_time,
-        category=task.category,
-        user_id=user_id
+# Кэш статистики и количества задач в списках: записи помечены тегами
+# пользователя и всех пользователей (_user_tags) и сбрасываются при
+# изменении его задач
+task_cache = create_cache(
+    "tasks",
+    maxsize=settings.STATS_CACHE_SIZE,
+    ttl=settings.STATS_CACHE_TTL_SECONDS
+)
+register_cache("tasks", task_cache)
+_user_versions: Dict[int, int] = {}
+
+# Без общего хранилища кэша версии живут в памяти процесса и начинаются
+# с нуля при запуске, поэтому во внешние идентификаторы (ETag)
+# добавляется id запуска
+BOOT_ID = uuid4().hex[:12]
+# Эпоха сбрасывает версии всех пользователей, если события других
+# воркеров могли быть пропущены (переподключение LISTEN)
+_epoch = 0
+
+def _user_tags(user_id: int) -> tuple:
+    return user_tag(user_id), ALL_USERS_TAG
+
+def _bump_data_version(user_id: int) -> None:
+    _user_versions[user_id] = _user_versions.get(user_id, 0) + 1
+
+async def _invalidate_user_cache(db: AsyncSession, user_id: int) -> None:
+    """Сброс кэшированных данных пользователя после коммита изменения его задач
+
+    Чтения пользователя на время закрепляются за primary, клиент получает
+    позицию коммита (read-your-writes).
+    """
+    _bump_data_version(user_id)
+    await read_routing.note_commit(db, user_id)
+    await task_cache.invalidate(user_tag(user_id))
+
+async def get_data_version(user_id: int) -> str:
+    """Версия данных пользователя; меняется при любом изменении его задач
+
+    С общим хранилищем кэша это версии тегов пользователя в нем - одна
+    для всех воркеров; иначе (и если хранилище недоступно) - версия процесса.
+    """
+    if task_cache.shared:
+        versions = await task_cache.versions(*_user_tags(user_id))
+        if versions is not None:
+            return "{}.{}".format(*versions)
+    return f"{BOOT_ID}.{_epoch}.{_user_versions.get(user_id, 0)}"
+
+async def publish_data_reset(db: AsyncSession, user_id: Optional[int]) -> None:
+    """Событие о пересчете данных в обход изменений задач (до коммита)
+
+    Для одного пользователя - изменение без задач, для всех - resync:
+    воркеры сбрасывают версии данных и кэши.
+    """
+    if user_id is None:
+        await change_feed.publish(db, {"type": "resync"})
+    else:
+        await _publish(db, "updated", user_id)
+
+async def invalidate_data(db: AsyncSession, user_id: Optional[int]) -> None:
+    """Сброс версий данных в общем хранилище после коммита пересчета
+
+    Версии процессов сбрасывает событие publish_data_reset.
+    """
+    if user_id is not None:
+        await _invalidate_user_cache(db, user_id)
+    else:
+        await task_cache.invalidate(ALL_USERS_TAG)
+
+@change_feed.add_handler
+def _on_change(payload: dict) -> None:
+    """Изменения из других воркеров сбрасывают кэши этого процесса
+
+    Общее хранилище кэша уже сброшено воркером, изменившим задачи.
+    """
+    global _epoch
+    if payload["type"] == "resync":
+        _epoch += 1
+        task_cache.clear()
+        read_routing.note_write()
+    elif payload.get("origin") != BOOT_ID:
+        _bump_data_version(payload["user_id"])
+        read_routing.note_write(payload["user_id"])
+        if not task_cache.shared:
+            task_cache.invalidate_nowait(user_tag(payload["user_id"]))
+
+async def _publish(db: AsyncSession, change: str, user_id: int, task_ids=(), task=None, **extra) -> None:
+    """Событие изменения в транзакции сессии (подписчики получат его после коммита)"""
+    await change_feed.publish(db, change_event(change, user_id, BOOT_ID, task_ids, task, **extra))
+
+async def _write(db: AsyncSession, changed: CTE, entity, ids, change: str, user_id: int, with_task: bool = False) -> list:
+    """Изменение (CTE с RETURNING) и его событие одним запросом
+
+    Блокировку журнала изменений берет сам CTE (user_changes_locked).
+    Возвращает entity по строкам changed в порядке ids.
+    """
+    event = change_feed.notify_cte(changed, change_event(change, user_id, BOOT_ID), ids, with_task)
+    result = await db.execute(
+        select(entity, event.c.payload)
+        .join_from(changed, event, true())
+        .order_by(ids)
+        .execution_options(populate_existing=True)
+    )
+    rows = result.all()
+    if rows:
+        change_feed.published(db, rows[0].payload)
+    return [row[0] for row in rows]
+
+async def _write_tasks(db: AsyncSession, changed: CTE, change: str, user_id: int, with_task: bool = False) -> List[Task]:
+    """Изменение задач одним запросом (см. _write); задачи - в порядке id"""
+    return await _write(db, changed, aliased(Task, changed), changed.c.id, change, user_id, with_task)
+
+def _inserted_tasks(rows: List[dict], user_id: int) -> CTE:
+    """CTE вставки задач (значения колонок rows) с RETURNING
+
+    id выдаются в порядке строк rows, поэтому порядок id - порядок вставки.
+    NULL в VALUES не типизирован, поэтому колонки приводятся к типам tasks.
+    """
+    names = list(rows[0])
+    types = [Task.__table__.c[name].type for name in names]
+    new_tasks = values(
+        *[column(name, type_) for name, type_ in zip(names, types)],
+        name="new_tasks"
+    ).data([tuple(row[name] for name in names) for row in rows])
+    new_values = select(*[cast(new_tasks.c[name], type_) for name, type_ in zip(names, types)])
+    return (
+        insert(Task)
+        .from_select(names, new_values.where(user_changes_locked(user_id)))
+        .returning(*Task.__table__.c)
+        .cte("changed_tasks")
+    )
+
+def _updated_tasks(condition, user_id: int, **changes) -> CTE:
+    """CTE изменения задач по условию с RETURNING"""
+    return (
+        update(Task)
+        .where(condition, user_changes_locked(user_id))
+        .values(**changes)
+        .returning(*Task.__table__.c)
+        .cte("changed_tasks")
+    )
+
+class InvalidCursor(ValueError):
+    """Курсор пагинации поврежден или сформирован не этим сервером"""
+
+def encode_cursor(row: RowMapping) -> str:
+    """Непрозрачный курсор по ключу сортировки списка задач"""
+    key = [
+        bool(row["completed"]),
+        row["start_date"].isoformat() if row["start_date"] else None,
+        row["created_at"].isoformat(),
+        row["id"]
+    ]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[bool, Optional[date], datetime, int]:
+    """Разбор курсора, выданного encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        completed, start_date, created_at, task_id = json.loads(base64.urlsafe_b64decode(padded))
+        return (
+            bool(completed),
+            date.fromisoformat(start_date) if start_date else None,
+            datetime.fromisoformat(created_at),
+            int(task_id)
+        )
+    except (ValueError, TypeError):
+        raise InvalidCursor("Некорректный курсор")
+
+def _after_cursor(cursor: str, columns=Task.__table__.c):
+    """Условие "строго после курсора" для сортировки
+    (completed, start_date NULLS LAST, created_at DESC, id DESC)
+
+    columns - колонки tasks или подзапроса с теми же колонками.
+    """
+    completed, start_date, created_at, task_id = decode_cursor(cursor)
+    
+    after_created = or_(
+        columns.created_at < created_at,
+        and_(columns.created_at == created_at, columns.id < task_id)
+    )
+    if start_date is None:
+        # Среди задач без даты дальше идут только более ранние по created_at
+        after_start = and_(columns.start_date.is_(None), after_created)
+    else:
+        after_start = or_(
+            columns.start_date > start_date,
+            columns.start_date.is_(None),
+            and_(columns.start_date == start_date, after_created)
+        )
+    if completed:
+        # Завершенные идут последними: дальше только они же
+        return and_(columns.completed == True, after_start)
+    return or_(
+        columns.completed == True,
+        and_(columns.completed == False, after_start)
     )
-    db.add(db_task)
+
+def _date_range_condition(date_range: DateRange):
+    """Фильтр по дате начала в полуинтервале - использует индекс по start_date"""
+    start, end = date_range
+    return and_(Task.start_date >= start, Task.start_date < end)
+
+def _period_condition(
+    period: Optional[str],
+    today: date,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+):
+    """Условие фильтра по периоду или None, если период не задан"""
+    date_range = resolve_period(period, today, date_from, date_to)
+    return _date_range_condition(date_range) if date_range else None
+
+def _task_values(task: TaskCreate, user_id: int) -> dict:
+    """Значения колонок новой задачи"""
+    return {
+        "title": task.title,
+        "description": task.description,
+        "start_date": task.start_date,
+        "end_date": task.end_date,
+        "start_time": task.start_time,
+        "end_time": task.end_time,
+        "category": task.category,
+        "completed": False,
+        "user_id": user_id,
+        **recurrence_values(task.recurrence, task.start_date)
+    }
+
+async def create_task(db: AsyncSession, task: TaskCreate, user_id: int) -> Task:
+    """Создание новой задачи одним INSERT ... RETURNING (вместе с событием)"""
+    db_task, = await _write_tasks(db, _inserted_tasks([_task_values(task, user_id)], user_id), "created", user_id, True)
     await db.commit()
-    await db.refresh(db_task)
+    await _invalidate_user_cache(db, user_id)
     return db_task
 
 async def get_task(db: AsyncSession, task_id: int, user_id: int) -> Optional[Task]:
@@ -32,239 +263,779 @@ async def get_task(db: AsyncSession, task_id: int, user_id: int) -> Optional[Tas
     )
     return result.scalar_one_or_none()
 
-async def get_tasks(
-    db: AsyncSession, 
+def _list_order(columns=Task.__table__.c) -> tuple:
+    """Порядок списка задач: сначала незавершенные, потом завершенные, затем по дате"""
+    return (
+        columns.completed.asc(),
+        columns.start_date.asc().nullslast(),
+        columns.created_at.desc(),
+        columns.id.desc()
+    )
+
+TASK_LIST_ORDER = _list_order()
+
+# Разовые задачи (не серии повторяющихся)
+ONE_OFF = Task.recurrence_freq.is_(None)
+
+def _occurrences_query(user_id: int, date_range: DateRange, category: Optional[str] = None) -> Select:
+    """Вхождения серий пользователя в периоде - строки с колонками задачи
+
+    Дни периода перебираются generate_series с постоянными границами (число
+    строк известно планировщику, отметки ищутся по первичному ключу
+    task_occurrences); отмененные вхождения пропускаются, выполнение берется
+    из отметки. Дата окончания вхождения сдвигается вместе с началом.
+    """
+    start, end = date_range
+    days = (
+        func.generate_series(0, (end - start).days - 1)
+        .table_valued("day_number")
+        .render_derived()
+        .alias("occurrence_days")
+    )
+    day = literal(start, Date) + days.c.day_number
+    override = TaskOccurrence.__table__.alias("override")
+
+    shift = func.make_interval(0, 0, 0, day - Task.start_date)
+    values = {
+        "start_date": day,
+        "end_date": Task.end_date + (day - Task.start_date),
+        "completed": func.coalesce(override.c.completed, False),
+        "time_range": func.tsrange(
+            func.lower(Task.time_range) + shift,
+            func.upper(Task.time_range) + shift,
+            case((func.upper_inc(Task.time_range), "[]"), else_="[)"),
+            type_=TSRANGE
+        ),
+    }
+    columns = [values.get(column.key, column).label(column.key) for column in TASK_COLUMNS]
+    conditions = [
+        Task.user_id == user_id,
+        Task.recurrence_freq.isnot(None),
+        Task.start_date < end,
+        or_(Task.recurrence_end.is_(None), Task.recurrence_end >= start),
+        day >= Task.start_date,
+        or_(Task.recurrence_end.is_(None), day <= Task.recurrence_end),
+        occurrence_condition(Task, day),
+        not_(func.coalesce(override.c.cancelled, False)),
+    ]
+    if category:
+        conditions.append(Task.category == category)
+    return (
+        select(*columns, day.label("occurrence_date"))
+        .select_from(Task)
+        .join(days, true())
+        .outerjoin(override, and_(override.c.task_id == Task.id, override.c.occurrence_date == day))
+        .where(*conditions)
+    )
+
+async def _series_bounds(db: AsyncSession, user_id: int) -> Optional[Tuple[date, Optional[date]]]:
+    """Первый и последний день серий пользователя (кэшируется до изменения задач)
+
+    None - серий нет; последний день None - есть серия без окончания.
+    """
+    async def load() -> list:
+        first, last, open_ended = (await db.execute(
+            select(
+                func.min(Task.start_date),
+                func.max(Task.recurrence_end),
+                func.bool_or(Task.recurrence_end.is_(None))
+            ).where(Task.user_id == user_id, Task.recurrence_freq.isnot(None))
+        )).one()
+        if first is None:
+            # Пустой список, а не None: None не кэшируется
+            return []
+        return [first.isoformat(), None if open_ended else last.isoformat()]
+
+    bounds = await task_cache.get_or_set(f"series:{user_id}", load, tags=_user_tags(user_id))
+    if not bounds:
+        return None
+    first, last = bounds
+    return date.fromisoformat(first), date.fromisoformat(last) if last else None
+
+async def _series_days(db: AsyncSession, user_id: int, date_range: DateRange) -> Optional[DateRange]:
+    """Дни периода, за которые разворачиваются вхождения серий
+
+    Период сужается до дней между началом первой серии и окончанием
+    последней; None - серий в периоде нет. Разворачивать больше
+    SERIES_WINDOW_MAX_DAYS дней нельзя (PeriodError).
+    """
+    bounds = await _series_bounds(db, user_id)
+    if bounds is None:
+        return None
+    first, last = bounds
+    start = max(date_range[0], first)
+    end = date_range[1] if last is None else min(date_range[1], last + timedelta(days=1))
+    if start >= end:
+        return None
+    if (end - start).days > settings.SERIES_WINDOW_MAX_DAYS:
+        raise PeriodError(
+            f"Период с повторяющимися задачами не может быть длиннее {settings.SERIES_WINDOW_MAX_DAYS} дней"
+        )
+    return start, end
+
+async def _window_rows(db: AsyncSession, user_id: int, date_range: DateRange, category: Optional[str] = None):
+    """Задачи периода: разовые задачи и развернутые вхождения серий (подзапрос)"""
+    conditions = [Task.user_id == user_id, ONE_OFF, _date_range_condition(date_range)]
+    if category:
+        conditions.append(Task.category == category)
+    one_off = select(*TASK_COLUMNS, cast(null(), Date).label("occurrence_date")).where(*conditions)
+    series_days = await _series_days(db, user_id, date_range)
+    if series_days is None:
+        return one_off.subquery("window_tasks")
+    return union_all(one_off, _occurrences_query(user_id, series_days, category)).subquery("window_tasks")
+
+def _task_filters(
     user_id: int,
-    skip: int = 0,
-    limit: int = 100,
     period: Optional[str] = None,
     category: Optional[str] = None,
-    completed: Optional[bool] = None
-) -> Tuple[List[Task], int]:
-    """Получение списка задач с фильтрацией и пагинацией"""
-    
-    # Базовый запрос
-    query = select(Task).where(Task.user_id == user_id)
-    count_query = select(func.count(Task.id)).where(Task.user_id == user_id)
+    completed: Optional[bool] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    today: Optional[date] = None
+) -> list:
+    """Условия фильтрации списка задач пользователя"""
+    conditions = [Task.user_id == user_id]
     
     # Фильтрация по периоду
-    if period:
-        today = date.today()
-        
-        if period == "day":
-            query = query.where(Task.start_date == today)
-            count_query = count_query.where(Task.start_date == today)
-            
-        elif period == "week":
-            # Неделя начинается с понедельника
-            week_start = today - timedelta(days=today.weekday())
-            week_end = week_start + timedelta(days=6)
-            query = query.where(
-                and_(
-                    Task.start_date >= week_start,
-                    Task.start_date <= week_end
-                )
-            )
-            count_query = count_query.where(
-                and_(
-                    Task.start_date >= week_start,
-                    Task.start_date <= week_end
-                )
-            )
-            
-        elif period == "month":
-            query = query.where(
-                and_(
-                    func.extract('year', Task.start_date) == today.year,
-                    func.extract('month', Task.start_date) == today.month
-                )
-            )
-            count_query = count_query.where(
-                and_(
-                    func.extract('year', Task.start_date) == today.year,
-                    func.extract('month', Task.start_date) == today.month
-                )
-            )
+    period_condition = _period_condition(period, today or date.today(), date_from, date_to)
+    if period_condition is not None:
+        conditions.append(period_condition)
     
     # Фильтрация по категории
     if category:
-        query = query.where(Task.category == category)
-        count_query = count_query.where(Task.category == category)
+        conditions.append(Task.category == category)
     
     # Фильтрация по статусу выполнения
     if completed is not None:
-        query = query.where(Task.completed == completed)
-        count_query = count_query.where(Task.completed == completed)
-    
-    # Сортировка: сначала незавершенные, потом завершенные, затем по дате
-    query = query.order_by(
-        Task.completed.asc(),
-        Task.start_date.asc().nullslast(),
-        Task.created_at.desc()
-    )
+        conditions.append(Task.completed == completed)
+    return conditions
+
+async def get_tasks(
+    db: AsyncSession, 
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    period: Optional[str] = None,
+    category: Optional[str] = None,
+    completed: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    with_total: bool = True,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    today: Optional[date] = None
+) -> Tuple[List[RowMapping], Optional[int], Optional[str]]:
+    """Получение списка задач с фильтрацией и пагинацией
+
+    Период (см. periods.resolve_period) считается от today - текущей даты
+    пользователя. Если передан cursor, страница выбирается по ключу
+    сортировки (keyset) и skip игнорируется. Возвращает задачи (строки-словари,
+    только для чтения), общее количество (None при with_total=False, кэшируется
+    до изменения задач пользователя) и курсор следующей страницы (None на последней).
+
+    В списке за период серии повторяющихся задач развернуты во вхождения
+    (occurrence_date), без периода серия - одна строка.
+    """
+    today = today or date.today()
+    date_range = resolve_period(period, today, date_from, date_to)
+    if date_range:
+        rows = await _window_rows(db, user_id, date_range, category)
+        columns = rows.c
+        conditions = [] if completed is None else [columns.completed == completed]
+        query = select(rows).where(*conditions).order_by(*_list_order(columns))
+        count_query = select(func.count()).select_from(rows).where(*conditions)
+    else:
+        columns = Task.__table__.c
+        conditions = _task_filters(user_id, None, category, completed)
+        # Колонки вместо ORM сущностей - список только отдается клиенту
+        query = select(*TASK_COLUMNS).where(*conditions).order_by(*TASK_LIST_ORDER)
+        count_query = select(func.count(Task.id)).where(*conditions)
     
-    # Пагинация
-    query = query.offset(skip).limit(limit)
+    # Пагинация: курсор или смещение; лишняя строка показывает наличие следующей страницы
+    if cursor:
+        query = query.where(_after_cursor(cursor, columns))
+    else:
+        query = query.offset(skip)
+    query = query.limit(limit + 1)
     
     # Выполнение запросов
     result = await db.execute(query)
-    tasks = result.scalars().all()
+    tasks = result.mappings().all()
+    next_cursor = None
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        next_cursor = encode_cursor(tasks[-1])
     
-    count_result = await db.execute(count_query)
-    total = count_result.scalar()
-    
-    return tasks, total
+    total = None
+    if with_total:
+        async def count() -> int:
+            count_result = await db.execute(count_query)
+            return count_result.scalar()
 
-async def update_task(db: AsyncSession, task_id: int, task_update: TaskUpdate, user_id: int) -> Optional[Task]:
-    """Обновление задачи"""
-    db_task = await get_task(db, task_id, user_id)
-    if not db_task:
-        return None
+        total = await task_cache.get_or_set(
+            f"count:{user_id}:{date_range}:{category}:{completed}", count, tags=_user_tags(user_id)
+        )
     
+    return tasks, total, next_cursor
+
+def export_tasks_query(
+    user_id: int,
+    period: Optional[str] = None,
+    category: Optional[str] = None,
+    completed: Optional[bool] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    today: Optional[date] = None
+) -> Select:
+    """Запрос всех задач пользователя для выгрузки (те же фильтры, что у get_tasks)
+
+    Строится заранее, чтобы ошибки фильтров (PeriodError) возникали до начала
+    потоковой отдачи ответа.
+    """
+    conditions = _task_filters(user_id, period, category, completed, date_from, date_to, today)
+    return select(*TASK_COLUMNS).where(*conditions).order_by(*TASK_LIST_ORDER)
+
+async def stream_tasks(
+    db: AsyncSession,
+    query: Select,
+    batch_size: int = 1000
+) -> AsyncIterator[List[RowMapping]]:
+    """Потоковое чтение задач пачками через серверный курсор
+
+    В памяти одновременно находится не больше batch_size строк, а БД
+    читает результат одним проходом по индексу без OFFSET.
+    """
+    result = await db.stream(query.execution_options(yield_per=batch_size))
+    async for rows in result.mappings().partitions():
+        yield rows
+
+def _owned_task(task_id: int, user_id: int):
+    """Условие: задача с данным id принадлежит пользователю"""
+    return and_(Task.id == task_id, Task.user_id == user_id)
+
+def _update_values(task_update: TaskUpdate) -> dict:
+    """Изменяемые колонки; пустое правило повторения снимает его"""
     update_data = task_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_task, field, value)
+    if "recurrence" in update_data:
+        update_data["recurrence"] = update_data["recurrence"] or None
+    return update_data
+
+async def _refresh_recurrence(db: AsyncSession, tasks: List[Task], update_data: dict) -> None:
+    """Пересчет производных колонок правила после изменения правила или даты начала
+
+    Значения зависят от start_date каждой задачи, поэтому считаются по
+    строкам RETURNING; RecurrenceError (серия без даты начала) - до коммита.
+    Объекты tasks перечитываются на месте.
+    """
+    if "recurrence" not in update_data and "start_date" not in update_data:
+        return
+    changed = [
+        {"id": task.id, **recurrence_values(task.recurrence, task.start_date)}
+        for task in tasks
+        if task.recurrence is not None or "recurrence" in update_data
+    ]
+    if not changed:
+        return
+    await db.execute(update(Task), changed)
+    await db.execute(
+        select(Task)
+        .where(Task.id.in_([values["id"] for values in changed]))
+        .execution_options(populate_existing=True)
+    )
+
+async def update_task(db: AsyncSession, task_id: int, task_update: TaskUpdate, user_id: int) -> Optional[Task]:
+    """Обновление задачи одним UPDATE ... RETURNING (вместе с событием)"""
+    update_data = _update_values(task_update)
+    if not update_data:
+        return await get_task(db, task_id, user_id)
     
+    updated = await _write_tasks(
+        db, _updated_tasks(_owned_task(task_id, user_id), user_id, **update_data), "updated", user_id, True
+    )
+    db_task = updated[0] if updated else None
+    if db_task:
+        await _refresh_recurrence(db, [db_task], update_data)
     await db.commit()
-    await db.refresh(db_task)
+    if db_task:
+        await _invalidate_user_cache(db, user_id)
     return db_task
 
+async def _delete_tasks(db: AsyncSession, condition, user_id: int) -> List[int]:
+    """Удаление задач с записью tombstone и событием в одном запросе
+
+    DELETE ... RETURNING выполняется в CTE, из которого тот же запрос
+    вставляет tombstones; возвращает id удаленных задач.
+    """
+    deleted = (
+        delete(Task)
+        .where(condition, user_changes_locked(user_id))
+        .returning(Task.id, Task.user_id)
+        .cte("deleted_tasks")
+    )
+    tombstones = (
+        insert(TaskTombstone)
+        .from_select(["task_id", "user_id"], select(deleted.c.id, deleted.c.user_id))
+        .returning(TaskTombstone.task_id)
+        .cte("tombstones")
+    )
+    return await _write(db, tombstones, tombstones.c.task_id, tombstones.c.task_id, "deleted", user_id)
+
 async def delete_task(db: AsyncSession, task_id: int, user_id: int) -> bool:
-    """Удаление задачи"""
-    db_task = await get_task(db, task_id, user_id)
-    if not db_task:
-        return False
-    
-    await db.delete(db_task)
+    """Удаление задачи (с tombstone для синхронизации)"""
+    deleted = await _delete_tasks(db, _owned_task(task_id, user_id), user_id)
     await db.commit()
+    if not deleted:
+        return False
+    await _invalidate_user_cache(db, user_id)
     return True
 
-async def toggle_task_completion(db: AsyncSession, task_id: int, user_id: int) -> Optional[Task]:
-    """Переключение статуса выполнения задачи"""
-    db_task = await get_task(db, task_id, user_id)
-    if not db_task:
-        return None
-    
-    db_task.completed = not db_task.completed
+async def toggle_task_completion(
+    db: AsyncSession,
+    task_id: int,
+    user_id: int,
+    occurrence_date: Optional[date] = None
+):
+    """Переключение статуса выполнения задачи
+
+    Инверсия выполняется в самом UPDATE, поэтому одновременные переключения
+    не теряют друг друга (нет чтения-изменения-записи в приложении).
+    С occurrence_date переключается вхождение серии (см. update_occurrence).
+    """
+    if occurrence_date is not None:
+        return await update_occurrence(db, task_id, user_id, occurrence_date, toggle=True)
+    toggled = await _write_tasks(
+        db,
+        _updated_tasks(_owned_task(task_id, user_id), user_id, completed=not_(Task.completed)),
+        "toggled", user_id, True
+    )
+    db_task = toggled[0] if toggled else None
     await db.commit()
-    await db.refresh(db_task)
+    if db_task:
+        await _invalidate_user_cache(db, user_id)
     return db_task
 
-async def get_task_stats(db: AsyncSession, user_id: int, period: Optional[str] = None) -> dict:
-    """Получение статистики по задачам"""
-    today = date.today()
-    
-    # Базовый запрос
-    base_query = select(Task).where(Task.user_id == user_id)
-    
-    # Фильтрация по периоду
-    if period:
-        if period == "day":
-            base_query = base_query.where(Task.start_date == today)
-        elif period == "week":
-            week_start = today - timedelta(days=today.weekday())
-            week_end = week_start + timedelta(days=6)
-            base_query = base_query.where(
-                and_(
-                    Task.start_date >= week_start,
-                    Task.start_date <= week_end
-                )
-            )
-        elif period == "month":
-            base_query = base_query.where(
-                and_(
-                    func.extract('year', Task.start_date) == today.year,
-                    func.extract('month', Task.start_date) == today.month
-                )
-            )
-    
-    # Общее количество
-    total_result = await db.execute(
-        select(func.count(Task.id)).select_from(base_query.subquery())
+def _is_occurrence(series: Task, day: date) -> bool:
+    """День day - вхождение серии с учетом COUNT/UNTIL"""
+    return (
+        occurs_on(parse_rule(series.recurrence), series.start_date, day)
+        and (series.recurrence_end is None or day <= series.recurrence_end)
     )
-    total = total_result.scalar()
-    
-    # Завершенные
-    completed_result = await db.execute(
-        select(func.count(Task.id)).select_from(
-            base_query.where(Task.completed == True).subquery()
+
+def _occurrence_row(series: Task, occurrence_date: date, completed: bool) -> dict:
+    """Вхождение серии в виде строки задачи (как в списке за период)"""
+    row = {column.key: getattr(series, column.key) for column in TASK_COLUMNS}
+    if series.end_date is not None:
+        row["end_date"] = series.end_date + (occurrence_date - series.start_date)
+    row.update(start_date=occurrence_date, completed=completed, occurrence_date=occurrence_date)
+    return row
+
+async def update_occurrence(
+    db: AsyncSession,
+    task_id: int,
+    user_id: int,
+    occurrence_date: date,
+    completed: Optional[bool] = None,
+    cancelled: Optional[bool] = None,
+    toggle: bool = False
+) -> Optional[dict]:
+    """Отметка вхождения серии: выполнение (toggle - инверсия) и отмена
+
+    Отметка хранится в task_occurrences; серия при этом получает новый
+    change_seq, и дельта-синхронизация возвращает ее вместе с отметками
+    (см. get_changes). Возвращает
+    вхождение в виде строки задачи или None, если серии нет или день не
+    является ее вхождением.
+    """
+    # UPDATE блокирует серию и выдает ей новый change_seq; если день не
+    # вхождение, транзакция откатывается
+    series = await db.scalar(
+        update(Task)
+        .where(_owned_task(task_id, user_id), Task.recurrence_freq.isnot(None), user_changes_locked(user_id))
+        .values(updated_at=func.now())
+        .returning(Task)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    if series is None or not _is_occurrence(series, occurrence_date):
+        await db.rollback()
+        return None
+
+    changes = {"updated_at": func.now()}
+    if toggle:
+        changes["completed"] = not_(TaskOccurrence.completed)
+    elif completed is not None:
+        changes["completed"] = completed
+    if cancelled is not None:
+        changes["cancelled"] = cancelled
+    statement = pg_insert(TaskOccurrence).values(
+        task_id=task_id,
+        occurrence_date=occurrence_date,
+        completed=True if toggle else bool(completed),
+        cancelled=bool(cancelled)
+    )
+    result = await db.execute(
+        statement
+        .on_conflict_do_update(index_elements=[TaskOccurrence.task_id, TaskOccurrence.occurrence_date], set_=changes)
+        .returning(TaskOccurrence.completed, TaskOccurrence.cancelled)
+    )
+    occurrence_completed, occurrence_cancelled = result.one()
+    row = _occurrence_row(series, occurrence_date, occurrence_completed)
+    await _publish(
+        db, "updated", user_id, [task_id], row,
+        occurrence_date=occurrence_date.isoformat(), cancelled=occurrence_cancelled
+    )
+    await db.commit()
+    await _invalidate_user_cache(db, user_id)
+    return row
+
+async def bulk_create_tasks(db: AsyncSession, tasks: List[TaskCreate], user_id: int) -> List[Task]:
+    """Создание пакета задач одним INSERT ... RETURNING (порядок как во входном списке)"""
+    if not tasks:
+        return []
+    rows = [_task_values(task, user_id) for task in tasks]
+    created = await _write_tasks(db, _inserted_tasks(rows, user_id), "created", user_id)
+    await db.commit()
+    await _invalidate_user_cache(db, user_id)
+    return created
+
+# Колонки, заполняемые при импорте; остальные берут DEFAULT таблицы
+IMPORT_COLUMNS = (
+    "title", "description", "start_date", "end_date",
+    "start_time", "end_time", "category", "completed", "user_id",
+    "recurrence", "recurrence_freq", "recurrence_interval", "recurrence_weekdays", "recurrence_end"
+)
+
+def _import_record(task: TaskImport, user_id: int) -> tuple:
+    """Значения колонок IMPORT_COLUMNS для импортируемой задачи"""
+    return (
+        task.title, task.description, task.start_date, task.end_date,
+        task.start_time, task.end_time, task.category, task.completed, user_id,
+        *recurrence_values(task.recurrence, task.start_date).values()
+    )
+
+async def _copy_tasks(db: AsyncSession, records: List[tuple]) -> None:
+    """Загрузка строк в tasks: COPY для asyncpg, иначе пакетный INSERT"""
+    connection = await db.connection()
+    if connection.dialect.driver == "asyncpg":
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            Task.__tablename__, records=records, columns=IMPORT_COLUMNS
         )
+    else:
+        await db.execute(insert(Task), [dict(zip(IMPORT_COLUMNS, record)) for record in records])
+
+async def import_tasks(
+    db: AsyncSession,
+    batches: AsyncGenerator[List[TaskImport], None],
+    user_id: int
+) -> int:
+    """Импорт провалидированных пачек задач в одной транзакции
+
+    Следующая пачка разбирается, пока текущая загружается в БД. Коммит -
+    после последней пачки: при ошибке чтения файла не остается частично
+    загруженных данных. Возвращает количество загруженных задач; при
+    ошибке возвращается только после того, как чтение файла остановлено.
+    """
+    # COPY не принимает условий - блокировка берется отдельным запросом
+    await lock_user_changes(db, user_id)
+    imported = 0
+    next_batch = asyncio.ensure_future(anext(batches))
+    try:
+        while True:
+            try:
+                tasks = await next_batch
+            except StopAsyncIteration:
+                break
+            next_batch = asyncio.ensure_future(anext(batches))
+            records = [_import_record(task, user_id) for task in tasks]
+            await _copy_tasks(db, records)
+            imported += len(records)
+    finally:
+        # Пачка читается в пуле потоков, и отмена ее не прерывает: файл
+        # нельзя отдавать вызывающему, пока чтение не закончилось
+        if not next_batch.done():
+            await asyncio.wait([next_batch])
+        if not next_batch.cancelled():
+            next_batch.exception()
+        await batches.aclose()
+    
+    if imported:
+        # Идентификаторы не передаются: их могут быть десятки тысяч
+        await _publish(db, "imported", user_id, count=imported)
+        await db.commit()
+        await _invalidate_user_cache(db, user_id)
+    return imported
+
+async def bulk_update_tasks(
+    db: AsyncSession,
+    task_ids: List[int],
+    task_update: TaskUpdate,
+    user_id: int
+) -> List[Task]:
+    """Одинаковое изменение пакета задач одним UPDATE ... RETURNING
+
+    Возвращает обновленные задачи; чужие и несуществующие id пропускаются.
+    """
+    update_data = _update_values(task_update)
+    updated = await _write_tasks(
+        db, _updated_tasks(and_(Task.user_id == user_id, Task.id.in_(task_ids)), user_id, **update_data), "updated", user_id
     )
-    completed = completed_result.scalar()
+    if updated:
+        await _refresh_recurrence(db, updated, update_data)
+    await db.commit()
+    await _invalidate_user_cache(db, user_id)
+    return updated
+
+async def bulk_toggle_tasks(
+    db: AsyncSession,
+    task_ids: List[int],
+    user_id: int,
+    completed: Optional[bool] = None
+) -> List[Task]:
+    """Установка (или инверсия при completed=None) статуса пакета задач"""
+    new_value = not_(Task.completed) if completed is None else completed
+    toggled = await _write_tasks(
+        db, _updated_tasks(and_(Task.user_id == user_id, Task.id.in_(task_ids)), user_id, completed=new_value), "toggled", user_id
+    )
+    await db.commit()
+    await _invalidate_user_cache(db, user_id)
+    return toggled
+
+async def bulk_delete_tasks(db: AsyncSession, task_ids: List[int], user_id: int) -> List[int]:
+    """Удаление пакета задач одним запросом (с tombstones для синхронизации)"""
+    deleted = await _delete_tasks(db, and_(Task.user_id == user_id, Task.id.in_(task_ids)), user_id)
+    await db.commit()
+    await _invalidate_user_cache(db, user_id)
+    return deleted
+
+async def get_changes(
+    db: AsyncSession,
+    user_id: int,
+    since: int = 0,
+    limit: int = 500
+) -> Tuple[List[RowMapping], List[int], List[RowMapping], int, bool]:
+    """Изменения задач пользователя после водяного знака since
+
+    Возвращает созданные/измененные задачи и id удаленных в порядке номеров
+    change_seq (не больше limit записей суммарно), все отметки вхождений
+    измененных серий (отметка вхождения меняет change_seq серии), новый
+    водяной знак и признак того, что изменения еще остались. since=0 -
+    полная выгрузка.
+    """
+    await lock_user_changes(db, user_id, exclusive=True)
     
-    # Активные
-    pending = total - completed
+    tasks_result = await db.execute(
+        select(*TASK_COLUMNS)
+        .where(and_(Task.user_id == user_id, Task.change_seq > since))
+        .order_by(Task.change_seq)
+        .limit(limit + 1)
+    )
+    tombstones_result = await db.execute(
+        select(TaskTombstone.task_id, TaskTombstone.change_seq)
+        .where(and_(TaskTombstone.user_id == user_id, TaskTombstone.change_seq > since))
+        .order_by(TaskTombstone.change_seq)
+        .limit(limit + 1)
+    )
+    entries = sorted(
+        [(row["change_seq"], row, None) for row in tasks_result.mappings().all()] +
+        [(change_seq, None, task_id) for task_id, change_seq in tombstones_result.all()],
+        key=lambda entry: entry[0]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
     
-    # Просроченные (дата окончания в прошлом и не завершены)
-    overdue_result = await db.execute(
-        select(func.count(Task.id)).select_from(
-            base_query.where(
-                and_(
-                    Task.end_date < today,
-                    Task.completed == False
-                )
-            ).subquery()
+    changed = [row for _, row, _ in entries if row is not None]
+    deleted = [task_id for _, _, task_id in entries if task_id is not None]
+    series_ids = [row["id"] for row in changed if row["recurrence_freq"] is not None]
+    occurrences = []
+    if series_ids:
+        occurrences_result = await db.execute(
+            select(
+                TaskOccurrence.task_id,
+                TaskOccurrence.occurrence_date,
+                TaskOccurrence.completed,
+                TaskOccurrence.cancelled
+            )
+            .where(TaskOccurrence.task_id.in_(series_ids))
+            .order_by(TaskOccurrence.task_id, TaskOccurrence.occurrence_date)
         )
+        occurrences = occurrences_result.mappings().all()
+    # Блокировка нужна только на время чтения
+    await db.commit()
+    
+    watermark = entries[-1][0] if entries else since
+    return changed, deleted, occurrences, watermark, has_more
+
+async def get_task_stats(
+    db: AsyncSession,
+    user_id: int,
+    period: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    today: Optional[date] = None
+) -> dict:
+    """Получение статистики по задачам
+
+    Все счетчики считаются одним запросом с условной агрегацией; результат
+    кэшируется до ближайшего изменения задач пользователя.
+    """
+    today = today or date.today()
+    date_range = resolve_period(period, today, date_from, date_to)
+    stats = await task_cache.get_or_set(
+        f"stats:{user_id}:{date_range}:{today}",
+        lambda: _load_task_stats(db, user_id, date_range, today),
+        tags=_user_tags(user_id)
     )
-    overdue = overdue_result.scalar()
+    return dict(stats)
+
+async def _load_task_stats(db: AsyncSession, user_id: int, date_range: Optional[DateRange], today: date) -> dict:
+    # Фильтрация по периоду: в периоде считаются вхождения серий
+    if date_range:
+        rows = await _window_rows(db, user_id, date_range)
+        columns = rows.c
+        conditions = []
+    else:
+        rows = Task.__table__
+        columns = rows.c
+        conditions = [Task.user_id == user_id]
     
-    # На сегодня
-    today_result = await db.execute(
-        select(func.count(Task.id)).select_from(
-            base_query.where(
-                or_(
-                    Task.start_date == today,
-                    Task.end_date == today
-                )
-            ).subquery()
+    query = select(
+        # Общее количество
+        func.count(),
+        # Завершенные
+        func.count().filter(columns.completed == True),
+        # Просроченные (дата окончания в прошлом и не завершены)
+        func.count().filter(
+            and_(
+                columns.end_date < today,
+                columns.completed == False
+            )
+        ),
+        # На сегодня
+        func.count().filter(
+            or_(
+                columns.start_date == today,
+                columns.end_date == today
+            )
         )
-    )
-    today_count = today_result.scalar()
+    ).select_from(rows).where(and_(*conditions))
+    
+    result = await db.execute(query)
+    total, completed, overdue, today_count = result.one()
     
     return {
         "total": total,
         "completed": completed,
-        "pending": pending,
+        "pending": total - completed,
         "overdue": overdue,
         "today": today_count
     }
 
+def occurrence_time_range(task: Task, occurrence_date: Optional[date] = None) -> Optional[Range]:
+    """Интервал задачи или вхождения серии occurrence_date
+
+    None - у задачи нет даты или день не является вхождением серии.
+    """
+    if task.time_range is None:
+        return None
+    if occurrence_date is None:
+        return task.time_range
+    if not task.recurrence or not _is_occurrence(task, occurrence_date):
+        return None
+    shift = occurrence_date - task.start_date
+    return Range(task.time_range.lower + shift, task.time_range.upper + shift, bounds=task.time_range.bounds)
+
+async def _series_span(db: AsyncSession, user_id: int) -> Optional[int]:
+    """Наибольшая длительность серии пользователя в днях (None - серий нет)
+
+    Не больше AGENDA_MAX_DAYS: вхождения длиннее находятся, только если
+    начались не раньше чем за AGENDA_MAX_DAYS дней до интервала.
+    """
+    span = await db.scalar(
+        select(func.max(func.coalesce(Task.end_date, Task.start_date) - Task.start_date))
+        .where(Task.user_id == user_id, Task.recurrence_freq.isnot(None))
+    )
+    return None if span is None else min(span, settings.AGENDA_MAX_DAYS)
+
+async def _overlapping_rows(db: AsyncSession, user_id: int, window: Range, category: Optional[str] = None):
+    """Задачи и вхождения серий, пересекающиеся с интервалом window (подзапрос)
+
+    Разовые задачи выбираются по GiST индексу (user_id, time_range).
+    Вхождения разворачиваются за дни интервала и предшествующие дни, в
+    которые могло начаться вхождение самой длинной серии пользователя, в
+    пределах дней серий (_series_days, PeriodError для слишком длинного).
+    """
+    window_range = literal(window, TSRANGE)
+    conditions = [Task.user_id == user_id, ONE_OFF, Task.time_range.op("&&")(window_range)]
+    if category:
+        conditions.append(Task.category == category)
+    one_off = select(*TASK_COLUMNS, cast(null(), Date).label("occurrence_date")).where(*conditions)
+
+    span = await _series_span(db, user_id)
+    if span is None:
+        return one_off.subquery("overlapping_tasks")
+    days = await _series_days(
+        db, user_id, (window.lower.date() - timedelta(days=span), window.upper.date() + timedelta(days=1))
+    )
+    if days is None:
+        return one_off.subquery("overlapping_tasks")
+    occurrences = _occurrences_query(user_id, days, category).subquery("occurrences")
+    series = select(occurrences).where(occurrences.c.time_range.op("&&")(window_range))
+    return union_all(one_off, series).subquery("overlapping_tasks")
+
+async def get_agenda(
+    db: AsyncSession,
+    user_id: int,
+    window: Range,
+    category: Optional[str] = None,
+    completed: Optional[bool] = None,
+    limit: int = 100
+) -> List[RowMapping]:
+    """Повестка: задачи и вхождения серий, пересекающиеся с window, по времени начала"""
+    rows = await _overlapping_rows(db, user_id, window, category)
+    conditions = [] if completed is None else [rows.c.completed == completed]
+    result = await db.execute(
+        select(rows)
+        .where(*conditions)
+        .order_by(func.lower(rows.c.time_range), rows.c.id, rows.c.start_date)
+        .limit(limit)
+    )
+    return result.mappings().all()
+
+async def get_conflicts(
+    db: AsyncSession,
+    user_id: int,
+    window: Range,
+    exclude_task_id: Optional[int] = None,
+    limit: int = 100
+) -> List[RowMapping]:
+    """Задачи, занимающие время в интервале window
+
+    Учитываются только незавершенные задачи со временем начала: задачи на
+    весь день слоты не занимают. exclude_task_id - проверяемая задача (или
+    серия целиком).
+    """
+    rows = await _overlapping_rows(db, user_id, window)
+    conditions = [rows.c.start_time.isnot(None), rows.c.completed == False]
+    if exclude_task_id is not None:
+        conditions.append(rows.c.id != exclude_task_id)
+    result = await db.execute(
+        select(rows)
+        .where(*conditions)
+        .order_by(func.lower(rows.c.time_range), rows.c.id, rows.c.start_date)
+        .limit(limit)
+    )
+    return result.mappings().all()
+
 async def search_tasks(
     db: AsyncSession, 
     user_id: int, 
     search_query: str,
     skip: int = 0,
-    limit: int = 100
-) -> Tuple[List[Task], int]:
-    """Поиск задач по названию и описанию"""
-    query = select(Task).where(
-        and_(
-            Task.user_id == user_id,
-            or_(
-                Task.title.ilike(f"%{search_query}%"),
-                Task.description.ilike(f"%{search_query}%")
-            )
-        )
-    ).order_by(Task.created_at.desc())
-    
-    count_query = select(func.count(Task.id)).where(
-        and_(
-            Task.user_id == user_id,
-            or_(
-                Task.title.ilike(f"%{search_query}%"),
-                Task.description.ilike(f"%{search_query}%")
-            )
-        )
-    )
-    
-    # Пагинация
-    query = query.offset(skip).limit(limit)
-    
-    # Выполнение запросов
-    result = await db.execute(query)
-    tasks = result.scalars().all()
-    
-    count_result = await db.execute(count_query)
-    total = count_result.scalar()
-    
-    return tasks, total
+    limit: int = 100,
+    with_total: bool = True
+) -> Tuple[List[RowMapping], Optional[int]]:
+    """Поиск задач по названию и описанию
+
+    Слова запроса ищутся по префиксу, результаты упорядочены по
+    релевантности (см. src/services/search.py).
+    """
+    return await search_backend.search(db, user_id, search_query, skip, limit, with_total)
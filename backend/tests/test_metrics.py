@@ -0,0 +1,38 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI
+from config import settings
+from src.routers import metrics
+
+
+@pytest.fixture
+def get():
+    app = FastAPI()
+    app.include_router(metrics.router)
+
+    async def send(url: str, headers: dict) -> httpx.Response:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(url, headers=headers)
+
+    return lambda url, headers={}: asyncio.run(send(url, headers))
+
+
+def test_metrics_disabled_by_default():
+    assert type(settings).model_fields["METRICS_ENABLED"].default is False
+
+
+@pytest.mark.parametrize("url", ["/metrics", "/health/db"])
+def test_token_required(get, monkeypatch, url):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "s3cret")
+    assert get(url).status_code == 401
+    assert get(url, {"Authorization": "Bearer wrong"}).status_code == 401
+    assert get(url, {"Authorization": "Bearer s3cret"}).status_code == 200
+
+
+def test_no_token_configured(get, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", None)
+    response = get("/metrics")
+    assert response.status_code == 200
+    assert "# TYPE" in response.text
@@ -0,0 +1,35 @@
+import asyncio
+import pytest
+from pydantic import ValidationError
+from config import Settings
+from src.middleware.rate_limit import RateLimitMiddleware
+from src.services.rate_limit import MemoryRateLimitBackend, TokenBucket
+
+
+def test_negative_rate_rejected():
+    with pytest.raises(ValidationError, match="не может быть отрицательным"):
+        Settings(RATE_LIMIT_READS_PER_MINUTE=-1)
+
+
+def test_memory_backend_refills():
+    decision = asyncio.run(MemoryRateLimitBackend(maxsize=10).take("key", TokenBucket(60, 2)))
+    assert decision.allowed
+    assert decision.remaining == 1
+    assert decision.reset_after == 1
+
+
+def test_zero_rate_denies_all():
+    limits = {"auth": TokenBucket(0, 10), "reads": TokenBucket(0, 10), "writes": TokenBucket(0, 10)}
+    sent = []
+
+    async def app(scope, receive, send):
+        raise AssertionError("запрос закрытой группы не должен доходить до приложения")
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/api/tasks/", "headers": [], "client": ("127.0.0.1", 1)}
+    middleware = RateLimitMiddleware(app, MemoryRateLimitBackend(maxsize=10), limits)
+    asyncio.run(middleware(scope, None, send))
+    assert sent[0]["status"] == 429
+    assert (b"retry-after", b"60") in sent[0]["headers"]
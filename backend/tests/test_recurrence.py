@@ -0,0 +1,121 @@
+from datetime import date, timedelta
+from itertools import islice
+import pytest
+from src.services.recurrence import (
+    Recurrence,
+    RecurrenceError,
+    format_rule,
+    iter_occurrences,
+    occurs_on,
+    parse_rule,
+    recurrence_values,
+)
+
+
+def test_parse_rule_canonical_form():
+    recurrence = parse_rule("rrule:freq=weekly;interval=2;byday=we,mo;until=20261231")
+    assert recurrence == Recurrence("WEEKLY", 2, 0b101, None, date(2026, 12, 31))
+    assert format_rule(recurrence) == "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE;UNTIL=20261231"
+
+
+def test_parse_rule_defaults():
+    assert parse_rule("FREQ=DAILY") == Recurrence("DAILY")
+    assert format_rule(parse_rule("FREQ=DAILY;INTERVAL=1")) == "FREQ=DAILY"
+
+
+@pytest.mark.parametrize("rule", [
+    "",
+    "INTERVAL=2",
+    "FREQ=HOURLY",
+    "FREQ=DAILY;INTERVAL=0",
+    "FREQ=DAILY;INTERVAL=1001",
+    "FREQ=DAILY;INTERVAL=x",
+    "FREQ=DAILY;COUNT=1001",
+    "FREQ=DAILY;COUNT=2;UNTIL=20261231",
+    "FREQ=DAILY;UNTIL=2026",
+    "FREQ=DAILY;BYDAY=MO",
+    "FREQ=WEEKLY;BYDAY=XX",
+    "FREQ=DAILY;FREQ=WEEKLY",
+    "FREQ=DAILY;BYMONTH=1",
+    "FREQ",
+])
+def test_parse_rule_rejects(rule):
+    with pytest.raises(RecurrenceError):
+        parse_rule(rule)
+
+
+def test_iter_occurrences_weekly_byday():
+    # 2026-10-07 - среда
+    recurrence = parse_rule("FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE;COUNT=4")
+    assert list(iter_occurrences(recurrence, date(2026, 10, 7))) == [
+        date(2026, 10, 7), date(2026, 10, 19), date(2026, 10, 21), date(2026, 11, 2)
+    ]
+
+
+def test_iter_occurrences_weekly_defaults_to_start_weekday():
+    recurrence = parse_rule("FREQ=WEEKLY;COUNT=3")
+    assert list(iter_occurrences(recurrence, date(2026, 10, 8))) == [
+        date(2026, 10, 8), date(2026, 10, 15), date(2026, 10, 22)
+    ]
+
+
+def test_iter_occurrences_skips_missing_days():
+    monthly = parse_rule("FREQ=MONTHLY;COUNT=3")
+    assert list(iter_occurrences(monthly, date(2026, 1, 31))) == [
+        date(2026, 1, 31), date(2026, 3, 31), date(2026, 5, 31)
+    ]
+    yearly = parse_rule("FREQ=YEARLY;COUNT=2")
+    assert list(iter_occurrences(yearly, date(2024, 2, 29))) == [date(2024, 2, 29), date(2028, 2, 29)]
+
+
+def test_iter_occurrences_until_is_inclusive():
+    recurrence = parse_rule("FREQ=DAILY;INTERVAL=3;UNTIL=20261007")
+    assert list(iter_occurrences(recurrence, date(2026, 10, 1))) == [
+        date(2026, 10, 1), date(2026, 10, 4), date(2026, 10, 7)
+    ]
+
+
+@pytest.mark.parametrize("rule, dtstart, last", [
+    ("FREQ=WEEKLY;INTERVAL=1000;COUNT=1000", date(2026, 1, 1), date(9998, 10, 15)),
+    ("FREQ=DAILY;COUNT=10", date(9999, 12, 28), date(9999, 12, 31)),
+    ("FREQ=WEEKLY;BYDAY=MO,FR,SA;COUNT=10", date(9999, 12, 28), date(9999, 12, 31)),
+    ("FREQ=MONTHLY;INTERVAL=1000;COUNT=1000", date(2026, 1, 1), date(9942, 9, 1)),
+    ("FREQ=YEARLY;COUNT=10", date(9995, 6, 1), date(9999, 6, 1)),
+])
+def test_iter_occurrences_stops_at_date_max(rule, dtstart, last):
+    occurrences = list(iter_occurrences(parse_rule(rule), dtstart))
+    assert occurrences[-1] == last
+    assert recurrence_values(rule, dtstart)["recurrence_end"] == last
+
+
+@pytest.mark.parametrize("rule, dtstart", [
+    ("FREQ=DAILY;INTERVAL=3", date(2026, 10, 1)),
+    ("FREQ=WEEKLY", date(2026, 10, 8)),
+    ("FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE,SU", date(2026, 10, 7)),
+    ("FREQ=MONTHLY;INTERVAL=2", date(2026, 1, 31)),
+    ("FREQ=YEARLY", date(2024, 2, 29)),
+])
+def test_occurs_on_matches_iter_occurrences(rule, dtstart):
+    recurrence = parse_rule(rule)
+    expected = set(islice(iter_occurrences(recurrence, dtstart), 200))
+    last = max(expected)
+    day = dtstart - timedelta(days=3)
+    while day <= last:
+        assert occurs_on(recurrence, dtstart, day) == (day in expected), day
+        day += timedelta(days=1)
+
+
+def test_recurrence_values():
+    values = recurrence_values("FREQ=WEEKLY;BYDAY=MO,WE;COUNT=3", date(2026, 10, 7))
+    assert values == {
+        "recurrence": "FREQ=WEEKLY;BYDAY=MO,WE;COUNT=3",
+        "recurrence_freq": "WEEKLY",
+        "recurrence_interval": 1,
+        "recurrence_weekdays": 0b101,
+        "recurrence_end": date(2026, 10, 14),
+    }
+    assert recurrence_values(None, None)["recurrence_freq"] is None
+    with pytest.raises(RecurrenceError):
+        recurrence_values("FREQ=DAILY", None)
+    with pytest.raises(RecurrenceError):
+        recurrence_values("FREQ=DAILY;UNTIL=20260101", date(2026, 10, 1))
@@ -0,0 +1,22 @@
+from sqlalchemy import create_mock_engine
+from src.models.models import Base
+
+
+def _postgres_ddl() -> str:
+    """DDL схемы из метаданных моделей для диалекта PostgreSQL"""
+    statements = []
+    engine = create_mock_engine(
+        "postgresql+asyncpg://",
+        lambda sql, *args, **kwargs: statements.append(str(sql.compile(dialect=engine.dialect)))
+    )
+    Base.metadata.create_all(engine, checkfirst=False)
+    return "\n".join(statements)
+
+
+def test_schema_builds_for_postgres():
+    ddl = _postgres_ddl()
+    for table in ("users", "tasks", "task_tombstones", "task_occurrences", "task_day_counts"):
+        assert f"CREATE TABLE {table} " in ddl
+    assert "CREATE SEQUENCE task_change_seq" in ddl
+    assert "time_range TSRANGE GENERATED ALWAYS AS" in ddl
+    assert "USING gist" in ddl
@@ -0,0 +1,88 @@
+import asyncio
+import uuid
+from pathlib import Path
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from config import settings
+from src.services.task_service import get_tasks
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+# Ревизия до миграции completed NOT NULL
+BEFORE_COMPLETED_NOT_NULL = "c3d9a0e5f6b1"
+
+
+async def _execute(url, *statements, **engine_options):
+    engine = create_async_engine(url, **engine_options)
+    try:
+        async with engine.begin() as connection:
+            for statement in statements:
+                await connection.execute(text(statement))
+    finally:
+        await engine.dispose()
+
+
+async def _scalar(url, statement):
+    engine = create_async_engine(url)
+    try:
+        async with engine.connect() as connection:
+            return await connection.scalar(text(statement))
+    finally:
+        await engine.dispose()
+
+
+@pytest.fixture
+def scratch_url():
+    """Временная пустая база на сервере DATABASE_URL (без PostgreSQL тест пропускается)"""
+    url = make_url(settings.DATABASE_URL)
+    name = f"{url.database}_test_{uuid.uuid4().hex[:8]}"
+    try:
+        asyncio.run(_execute(url, f'CREATE DATABASE "{name}"', isolation_level="AUTOCOMMIT"))
+    except (OSError, SQLAlchemyError) as exc:
+        pytest.skip(f"PostgreSQL недоступен: {exc}")
+    scratch = url.set(database=name)
+    available = asyncio.run(_scalar(scratch, "SELECT count(*) FROM pg_available_extensions WHERE name = 'btree_gist'"))
+    if not available:
+        asyncio.run(_execute(url, f'DROP DATABASE "{name}"', isolation_level="AUTOCOMMIT"))
+        pytest.skip("Для миграций нужно расширение btree_gist")
+    yield scratch
+    asyncio.run(_execute(url, f'DROP DATABASE "{name}" WITH (FORCE)', isolation_level="AUTOCOMMIT"))
+
+
+def _migrate(url, revision: str) -> None:
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    config.set_main_option("sqlalchemy.url", url.render_as_string(hide_password=False).replace("%", "%%"))
+    command.upgrade(config, revision)
+
+
+def test_cursor_pages_include_null_completed(scratch_url):
+    _migrate(scratch_url, BEFORE_COMPLETED_NOT_NULL)
+    asyncio.run(_execute(
+        scratch_url,
+        "INSERT INTO users (id, name, email, hashed_password) VALUES (1, 'Test', 'test@example.com', '-')",
+        "INSERT INTO tasks (id, title, user_id, completed) VALUES (1, 'Без статуса', 1, NULL),"
+        " (2, 'Открытая', 1, false), (3, 'Завершенная', 1, true)",
+    ))
+    _migrate(scratch_url, "head")
+
+    async def pages():
+        engine = create_async_engine(scratch_url)
+        ids, cursor = [], None
+        try:
+            async with AsyncSession(engine) as db:
+                while True:
+                    tasks, _, cursor = await get_tasks(db, 1, limit=1, cursor=cursor, with_total=False)
+                    ids += [task["id"] for task in tasks]
+                    if cursor is None:
+                        return ids
+        finally:
+            await engine.dispose()
+
+    ids = asyncio.run(pages())
+    assert sorted(ids[:2]) == [1, 2]
+    assert ids[2:] == [3]
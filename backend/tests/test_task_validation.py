@@ -0,0 +1,99 @@
+import asyncio
+import io
+from datetime import date, datetime
+import httpx
+import pytest
+from pydantic import ValidationError
+from database import get_db
+from main import app
+from src.routers.auth import get_current_user
+from src.schemas.task import TaskCreate
+from src.schemas.user import UserResponse
+from src.services.periods import PeriodError, resolve_period
+from src.services.task_formats import ImportReport, NDJSONFormat, validated_batches
+
+UNTIL_BEFORE_START = {"title": "Серия", "start_date": "2026-10-10", "recurrence": "FREQ=DAILY;UNTIL=20260101"}
+
+
+@pytest.fixture
+def post():
+    """POST в приложение в процессе; запросы с невалидными задачами не доходят до базы"""
+    async def no_db():
+        yield None
+
+    async def send(url: str, payload: dict) -> httpx.Response:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(url, json=payload)
+
+    app.dependency_overrides[get_current_user] = lambda: UserResponse(
+        id=1, name="Test", email="test@example.com", is_active=True, created_at=datetime(2026, 1, 1)
+    )
+    app.dependency_overrides[get_db] = no_db
+    yield lambda url, payload: asyncio.run(send(url, payload))
+    app.dependency_overrides.clear()
+
+
+def test_create_schema_rejects_until_before_start():
+    with pytest.raises(ValidationError, match="UNTIL не может быть раньше даты начала"):
+        TaskCreate.model_validate(UNTIL_BEFORE_START)
+
+
+def test_create_schema_normalizes_rule():
+    task = TaskCreate.model_validate({**UNTIL_BEFORE_START, "recurrence": "freq=daily;until=20261231"})
+    assert task.recurrence == "FREQ=DAILY;UNTIL=20261231"
+
+
+def test_create_returns_422(post):
+    response = post("/api/tasks/", UNTIL_BEFORE_START)
+    assert response.status_code == 422
+    assert "UNTIL" in response.text
+
+
+def test_bulk_create_reports_invalid_item(post):
+    response = post("/api/tasks/bulk", {"tasks": [UNTIL_BEFORE_START]})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["failed"] == 1
+    assert body["results"][0]["status"] == "invalid"
+    assert "UNTIL" in body["results"][0]["error"]
+
+
+def test_import_reports_row_error():
+    ndjson = '{"title": "Разовая"}\n{"title": "Серия", "start_date": "2026-10-10", "recurrence": "FREQ=DAILY;UNTIL=20260101"}\n'
+    report = ImportReport(max_errors=10)
+
+    async def collect():
+        return [task async for batch in validated_batches(io.StringIO(ndjson), NDJSONFormat(), report, 100, 1000) for task in batch]
+
+    tasks = asyncio.run(collect())
+    assert [task.title for task in tasks] == ["Разовая"]
+    assert report.failed == 1
+    assert report.errors[0].line == 2
+    assert "UNTIL" in report.errors[0].error
+
+
+def test_period_beyond_max_date_rejected():
+    with pytest.raises(PeriodError, match="за пределы"):
+        resolve_period("custom", date(2026, 10, 17), date(2026, 1, 1), date.max)
+
+
+def test_list_period_beyond_max_date_returns_400():
+    async def no_db():
+        yield None
+
+    async def get():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/api/tasks/", params={"date_from": "2026-01-01", "date_to": "9999-12-31"})
+
+    app.dependency_overrides[get_current_user] = lambda: UserResponse(
+        id=1, name="Test", email="test@example.com", is_active=True, created_at=datetime(2026, 1, 1)
+    )
+    app.dependency_overrides[get_db] = no_db
+    try:
+        response = asyncio.run(get())
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 400
+    assert "за пределы" in response.text
@@ -22,8 +22,15 @@ const Dashboard = ({ user, onLogout }) => {
     loadTasks();
   }, [selectedPeriod]);
 
-  const loadTasks = async () => {
-    setLoading(true);
+  // Изменения из других вкладок и устройств приходят из потока событий
+  // вместо периодического опроса; список перезагружается без индикатора
+  useEffect(() => {
+    const unsubscribe = taskApi.subscribeToChanges(() => loadTasks({ silent: true }));
+    return unsubscribe;
+  }, [selectedPeriod]);
+
+  const loadTasks = async ({ silent = false } = {}) => {
+    if (!silent) setLoading(true);
     setError(null);
     try {
       const response = await taskApi.getTasks({ period: selectedPeriod });
@@ -32,7 +39,7 @@ const Dashboard = ({ user, onLogout }) => {
       console.error('Ошибка при загрузке задач:', error);
       setError('Не удалось загрузить задачи. Проверьте подключение к серверу.');
     } finally {
-      setLoading(false);
+      if (!silent) setLoading(false);
     }
   };
 
@@ -33,14 +33,29 @@ class TaskApiService {
   // Создание заголовков с авторизацией
   getAuthHeaders() {
     const token = this.getAuthToken();
-    return {
+    const headers = {
       'Content-Type': 'application/json',
       'Authorization': `Bearer ${token}`
     };
+    // Позиция последнего изменения: чтения не увидят данные старше него
+    const commitLsn = localStorage.getItem('commitLsn');
+    if (commitLsn) {
+      headers['X-Read-After-LSN'] = commitLsn;
+    }
+    return headers;
+  }
+
+  // Запоминание позиции коммита из ответа на изменение
+  rememberCommit(response) {
+    const commitLsn = response.headers.get('X-Commit-LSN');
+    if (commitLsn) {
+      localStorage.setItem('commitLsn', commitLsn);
+    }
   }
 
   // Обработка ответа от API
   async handleResponse(response) {
+    this.rememberCommit(response);
     if (!response.ok) {
       // Если получили 401 Unauthorized, очищаем localStorage и перенаправляем на авторизацию
       if (response.status === 401) {
@@ -147,6 +162,7 @@ class TaskApiService {
         method: 'DELETE',
         headers: this.getAuthHeaders()
       });
+      this.rememberCommit(response);
       
       if (!response.ok) {
         const errorData = await response.json().catch(() => ({}));
@@ -232,6 +248,65 @@ class TaskApiService {
       throw error;
     }
   }
+
+  // Короткий токен для открытия потока изменений
+  async getStreamToken() {
+    const response = await fetch(`${this.baseURL}/auth/stream-token`, {
+      method: 'POST',
+      headers: this.getAuthHeaders()
+    });
+    const data = await this.handleResponse(response);
+    return data ? data.stream_token : null;
+  }
+
+  // Подписка на изменения задач (Server-Sent Events); возвращает функцию отписки.
+  // EventSource не передает заголовки, поэтому в адресе - короткий токен потока,
+  // а не токен доступа. Токен годен только для открытия, поэтому при обрыве
+  // поток открывается заново с новым токеном, а не повтором того же адреса
+  subscribeToChanges(onChange) {
+    const eventTypes = ['created', 'updated', 'toggled', 'deleted', 'imported', 'resync'];
+    let source = null;
+    let retryTimer = null;
+    let closed = false;
+
+    const connect = async () => {
+      let streamToken;
+      try {
+        streamToken = await this.getStreamToken();
+      } catch (error) {
+        // Токен доступа истек - поток не переоткрывается до нового входа
+        console.error('Error opening task stream:', error);
+        return;
+      }
+      if (closed || !streamToken) {
+        return;
+      }
+      source = new EventSource(`${this.baseURL}/tasks/stream?stream_token=${encodeURIComponent(streamToken)}`);
+      eventTypes.forEach(type => {
+        source.addEventListener(type, (event) => {
+          onChange(type, JSON.parse(event.data));
+        });
+      });
+      const reconnect = () => {
+        source.close();
+        if (!closed) {
+          retryTimer = setTimeout(connect, 3000);
+        }
+      };
+      source.addEventListener('expired', reconnect);
+      source.onerror = reconnect;
+    };
+
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (source) {
+        source.close();
+      }
+    };
+  }
 }
 
 // Создаем экземпляр сервиса